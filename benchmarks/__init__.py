@@ -0,0 +1 @@
+# Benchmarks for the box rendering hot paths. Run them from the top of the repo, ie. python -m benchmarks.notches
@@ -0,0 +1,30 @@
+# Compares file size and render time of the LINE-per-segment DXF output against the POLYLINE one.
+#   python -m benchmarks.dxf_size
+
+import timeit
+
+import boxmaker
+
+# width, height, depth, thickness, cut width, notch length (all mm)
+BOXES = [
+    (101.6, 127.0, 152.4, 4.7625, 0.0, 11.90625),
+    (300.0, 200.0, 150.0, 3.0, 0.1, 7.5),
+    (1000.0, 800.0, 600.0, 1.0, 0.1, 2.0),
+]
+
+
+def main():
+    print("{:>26} {:>12} {:>12} {:>7} {:>10} {:>10}".format("box", "line bytes", "poly bytes", "ratio",
+                                                            "line (ms)", "poly (ms)"))
+    for params in BOXES:
+        sizes, times = {}, {}
+        for file_type in ['dxf', 'dxf_polyline']:
+            sizes[file_type] = len(boxmaker.render_bytes(*params, file_type=file_type))
+            times[file_type] = timeit.timeit(lambda: boxmaker.render_bytes(*params, file_type=file_type), number=3)/3
+        print("{:>26} {:>12} {:>12} {:>6.2f}x {:>10.1f} {:>10.1f}".format(
+            "{:g}x{:g}x{:g}".format(*params[:3]), sizes['dxf'], sizes['dxf_polyline'],
+            float(sizes['dxf'])/sizes['dxf_polyline'], times['dxf']*1000, times['dxf_polyline']*1000))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+# Measures cold start: how long a fresh interpreter takes to import boxmaker and render its first small box, and
+# whether reportlab got loaded along the way. "all backends" imports every writer up front, the way boxmaker did
+# before DOC_CLASSES became lazy.
+#   python -m benchmarks.import_time
+
+import os
+import statistics
+import subprocess
+import sys
+
+SCENARIOS = [
+    ('import boxmaker', "import boxmaker"),
+    ('import all backends', "import boxmaker; from boxmaker.box import DOC_CLASSES; "
+                            "[DOC_CLASSES[t] for t in DOC_CLASSES]"),
+    ('svg render', "import boxmaker; boxmaker.render_bytes(100, 100, 100, 3, 0, 7.5, file_type='svg')"),
+    ('dxf render', "import boxmaker; boxmaker.render_bytes(100, 100, 100, 3, 0, 7.5, file_type='dxf')"),
+    ('pdf render', "import boxmaker; boxmaker.render_bytes(100, 100, 100, 3, 0, 7.5, file_type='pdf')"),
+    ('native pdf render', "import boxmaker; boxmaker.render_bytes(100, 100, 100, 3, 0, 7.5, file_type='pdf_native')"),
+]
+
+# runs in the child: time the statement and report whether reportlab is loaded
+CHILD = """
+import sys, time
+start = time.perf_counter()
+{}
+elapsed = time.perf_counter() - start
+print(elapsed, any(name.startswith('reportlab') for name in sys.modules))
+"""
+
+
+def cold_start(statement, runs):
+    times, loaded = [], False
+    for _ in range(runs):
+        output = subprocess.check_output([sys.executable, '-c', CHILD.format(statement)], cwd=os.getcwd())
+        elapsed, loaded = output.split()
+        times.append(float(elapsed))
+    return statistics.median(times), loaded == b'True'
+
+
+def main():
+    runs = 9
+    print("{:>20} {:>12} {:>10}".format("scenario", "median (ms)", "reportlab"))
+    for name, statement in SCENARIOS:
+        seconds, loaded = cold_start(statement, runs)
+        print("{:>20} {:>12.1f} {:>10}".format(name, seconds*1000, 'loaded' if loaded else '-'))
+
+
+if __name__ == "__main__":
+    main()
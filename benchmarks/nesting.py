@@ -0,0 +1,38 @@
+# Times packing box panels onto sheets, and how much of each sheet gets used, at increasing numbers of panels.
+#   python -m benchmarks.nesting
+
+import random
+import timeit
+
+from boxmaker.nesting import box_panels, pack
+
+SHEET = (600.0, 400.0)
+
+
+def random_panels(box_count, seed=42):
+    # a mix of small and medium boxes, some of them trays, in 3mm material
+    rng = random.Random(seed)
+    panels = []
+    for i in range(box_count):
+        panels += box_panels(rng.uniform(30, 200), rng.uniform(30, 150), rng.uniform(30, 150), 3.0, 0.1, 8.0,
+                             rng.random() < 0.25, 'box-{}'.format(i))
+    return panels
+
+
+def main():
+    print("{:>7} {:>7} {:>12} {:>7} {:>12} {:>12}".format("boxes", "panels", "pack (ms)", "sheets", "mean used",
+                                                          "lower bound"))
+    for box_count in [20, 50, 100, 200, 500]:
+        panels = random_panels(box_count)
+        number = 3
+        seconds = timeit.timeit(lambda: pack(panels, *SHEET), number=number) / number
+        sheets = pack(panels, *SHEET)
+        used = sum([sheet.utilization() for sheet in sheets]) / len(sheets)
+        # no packing can do better than the total panel area over one sheet's area
+        lower_bound = sum([panel.area() for panel in panels]) / (SHEET[0] * SHEET[1])
+        print("{:>7} {:>7} {:>12.1f} {:>7} {:>11.0%} {:>12.1f}".format(box_count, len(panels), seconds*1000,
+                                                                       len(sheets), used, lower_bound))
+
+
+if __name__ == "__main__":
+    main()
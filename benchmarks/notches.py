@@ -0,0 +1,54 @@
+# Times notched_edge against the step-at-a-time loop it replaced, and notched_edge scaling to points as it goes against
+# scaling its result afterwards, at increasing notch counts.
+#   python -m benchmarks.notches
+
+import timeit
+
+from boxmaker.notches import notched_edge
+from boxmaker.units import mm
+
+
+def stepwise_edge(x0, y0, notch_width, notch_count, notch_height, cut_width, flip, smallside):
+    # the original per-step loop from Box._draw_horizontal_line, kept here as the reference
+    coords = []
+    x = x0
+    for step in range(0, int(notch_count)):
+        y = y0 if (((step % 2) == 0) ^ flip) else y0+notch_height
+        if step == 0:
+            if smallside:
+                coords += (x+notch_height, y, x+notch_width+cut_width, y)
+            else:
+                coords += (x, y, x+notch_width+cut_width, y)
+        elif step == (notch_count-1):
+            coords += (x-cut_width, y, x+notch_width-notch_height, y)
+        elif step % 2 == 0:
+            coords += (x-cut_width, y, x+notch_width+cut_width, y)
+        else:
+            coords += (x+cut_width, y, x+notch_width-cut_width, y)
+        if step < (notch_count-1):
+            if step % 2 == 0:
+                coords += (x+notch_width+cut_width, y0+notch_height, x+notch_width+cut_width, y0)
+            else:
+                coords += (x+notch_width-cut_width, y0+notch_height, x+notch_width-cut_width, y0)
+        x = x + notch_width
+    return coords
+
+
+def main():
+    print("{:>8} {:>12} {:>12} {:>8} {:>13} {:>12} {:>8}".format("notches", "loop (ms)", "edge (ms)", "speedup",
+                                                                "after (ms)", "during (ms)", "speedup"))
+    for count in [11, 101, 1001, 10001]:
+        args = (10.0, 10.0, 1000.0/count, float(count), 3.0, 0.1, False, True)
+        assert stepwise_edge(*args) == notched_edge(*args)
+        assert notched_edge(*args, scale=mm) == [c*mm for c in notched_edge(*args)]
+        number = max(1, 100000 // count)
+        loop = timeit.timeit(lambda: stepwise_edge(*args), number=number) / number
+        edge = timeit.timeit(lambda: notched_edge(*args), number=number) / number
+        scaled = timeit.timeit(lambda: [c*mm for c in notched_edge(*args)], number=number) / number
+        during = timeit.timeit(lambda: notched_edge(*args, scale=mm), number=number) / number
+        print("{:>8} {:>12.4f} {:>12.4f} {:>7.1f}x {:>13.4f} {:>12.4f} {:>7.1f}x".format(
+            count, loop*1000, edge*1000, loop/edge, scaled*1000, during*1000, scaled/during))
+
+
+if __name__ == "__main__":
+    main()
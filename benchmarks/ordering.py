@@ -0,0 +1,38 @@
+# Times ordering cut paths for short laser travel, and how much travel it saves, at thousands of paths.
+#   python -m benchmarks.ordering
+
+import random
+import time
+
+from boxmaker.ordering import order_paths, travel_distance
+
+
+def random_paths(count, seed=42):
+    # small closed squares and open zig-zags scattered over a sheet about 3m square, in points
+    rng = random.Random(seed)
+    paths = []
+    for _ in range(count):
+        x, y = rng.uniform(0, 8500), rng.uniform(0, 8500)
+        size = rng.uniform(10, 100)
+        if rng.random() < 0.5:
+            paths.append([(x, y), (x + size, y), (x + size, y + size), (x, y + size), (x, y)])
+        else:
+            paths.append([(x + size * k / 4.0, y + (size if k % 2 else 0.0)) for k in range(5)])
+    return paths
+
+
+def main():
+    print("{:>7} {:>14} {:>14} {:>8} {:>10}".format("paths", "before (m)", "after (m)", "ratio", "time (s)"))
+    for count in [100, 1000, 5000, 20000]:
+        paths = random_paths(count)
+        start = time.perf_counter()
+        ordered = order_paths(paths)
+        seconds = time.perf_counter() - start
+        # points to meters
+        before = travel_distance(paths) / 72.0 * 0.0254
+        after = travel_distance(ordered) / 72.0 * 0.0254
+        print("{:>7} {:>14.1f} {:>14.1f} {:>7.1f}x {:>10.2f}".format(count, before, after, before / after, seconds))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+# Compares the built-in PDF writer with the reportlab one: render time, peak memory and file size.
+#   python -m benchmarks.pdf_writer
+
+import timeit
+import tracemalloc
+
+import boxmaker
+from boxmaker.box import DOC_CLASSES
+from boxmaker.native_pdf import NativePDFDoc
+
+# width, height, depth, thickness, cut width, notch length (all mm)
+BOXES = [
+    (101.6, 127.0, 152.4, 4.7625, 0.0, 11.90625),
+    (300.0, 200.0, 150.0, 3.0, 0.1, 7.5),
+    (1000.0, 800.0, 600.0, 1.0, 0.1, 2.0),
+]
+
+
+class UncompressedPDFDoc(NativePDFDoc):
+
+    def __init__(self, filename):
+        super(UncompressedPDFDoc, self).__init__(filename, compress=False)
+
+
+WRITERS = [('reportlab', 'pdf'), ('native', 'pdf_native'), ('native, no flate', 'pdf_native_uncompressed')]
+
+
+def peak_memory(fn):
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def main():
+    DOC_CLASSES.register('pdf_native_uncompressed', __name__ + '.UncompressedPDFDoc')
+    print("{:>26} {:>18} {:>10} {:>12} {:>10}".format("box", "writer", "time (ms)", "peak (KB)", "bytes"))
+    for params in BOXES:
+        for name, file_type in WRITERS:
+            def render():
+                return boxmaker.render_bytes(*params, draw_bounding_box=True, file_type=file_type)
+            size = len(render())
+            number = 5 if params[0] < 500 else 2
+            seconds = min(timeit.repeat(render, number=number, repeat=3)) / number
+            print("{:>26} {:>18} {:>10.1f} {:>12.0f} {:>10}".format(
+                "{:g}x{:g}x{:g}".format(*params[:3]), name, seconds*1000, peak_memory(render)/1024.0, size))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+# Times each stage of a render, for every output format, across a sweep from small boxes to very large ones with tiny
+# notches. Results are written as JSON so runs can be compared to catch regressions in the hot paths.
+#   python -m benchmarks.suite --output bench.json
+#   python -m benchmarks.suite --quick --baseline bench.json
+
+import argparse
+import io
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+import boxmaker
+from boxmaker.box import Box
+from boxmaker.metrics import STAGES
+
+# name, (width, height, depth, thickness, cut width, notch length) in mm
+SWEEP = [
+    ('small', (50.8, 50.8, 50.8, 3.0, 0.0, 7.5)),
+    ('default', (101.6, 152.4, 127.0, 4.7625, 0.0, 11.90625)),
+    ('medium', (300.0, 200.0, 150.0, 3.0, 0.1, 7.5)),
+    ('large', (600.0, 400.0, 300.0, 3.0, 0.1, 3.0)),
+    ('huge-tiny-notches', (1000.0, 800.0, 600.0, 1.0, 0.1, 2.0)),
+]
+
+FILE_TYPES = ['pdf', 'svg', 'dxf']
+
+
+def run_stages(params, file_type, clock=time.perf_counter):
+    """ Render one box, returning the seconds each stage took plus segment/path counts and the output size. """
+    output = io.BytesIO()
+    box = Box(output, *params, bounding_box=False, file_type=file_type, tray=False)
+    steps = [
+        box._compute_dimensions,
+        box._initialize_document,
+        box._draw_faces,
+        box.paths.join_paths,
+        lambda: box.paths.emit_paths(box._doc),
+        lambda: box._doc.save(),
+    ]
+    result = {'segments': 0, 'paths': 0}
+    for stage, step in zip(STAGES, steps):
+        start = clock()
+        step()
+        result[stage] = clock() - start
+        if stage == 'draw_faces':
+            result['segments'] = box.paths.segment_count()
+        elif stage == 'join_paths':
+            result['paths'] = len(box.paths.paths)
+    result['total'] = sum([result[stage] for stage in STAGES])
+    result['output_bytes'] = len(output.getvalue())
+    return result
+
+
+def peak_memory(params, file_type):
+    # measured on a separate run, since tracing allocations slows everything down
+    tracemalloc.start()
+    try:
+        run_stages(params, file_type)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def benchmark(sweep, file_types, repeat):
+    results = []
+    for name, params in sweep:
+        for file_type in file_types:
+            runs = [run_stages(params, file_type) for _ in range(repeat)]
+            # report the fastest run of each stage, which is the least noisy estimate
+            timings = {stage: min([run[stage] for run in runs]) for stage in STAGES + ['total']}
+            results.append({
+                'box': name,
+                'params': dict(zip(['width', 'height', 'depth', 'thickness', 'cut_width', 'notch_length'], params)),
+                'file_type': file_type,
+                'seconds': timings,
+                'segments': runs[0]['segments'],
+                'paths': runs[0]['paths'],
+                'output_bytes': runs[0]['output_bytes'],
+                'peak_memory_bytes': peak_memory(params, file_type),
+            })
+            print("{:>18} {:>4} {:>8} segments {:>6} paths {:>9.1f} ms".format(
+                name, file_type, runs[0]['segments'], runs[0]['paths'], timings['total']*1000), file=sys.stderr)
+    return results
+
+
+def regressions(results, baseline, threshold):
+    """ List the stages that got more than threshold times slower than in a previous report. """
+    previous = {(r['box'], r['file_type']): r['seconds'] for r in baseline['results']}
+    slower = []
+    for result in results:
+        before = previous.get((result['box'], result['file_type']))
+        if before is None:
+            continue
+        for stage, seconds in result['seconds'].items():
+            # ignore stages too quick to time reliably
+            if stage in before and seconds > 0.001 and seconds > before[stage] * threshold:
+                slower.append("{} {} {}: {:.1f}ms -> {:.1f}ms".format(result['box'], result['file_type'], stage,
+                                                                      before[stage]*1000, seconds*1000))
+    return slower
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark each stage of box rendering.")
+    parser.add_argument('-o', '--output', help="write JSON results here (default: stdout)")
+    parser.add_argument('-r', '--repeat', type=int, default=3, help="runs per box and format (default 3)")
+    parser.add_argument('--quick', action='store_true', help="skip the largest boxes")
+    parser.add_argument('--baseline', help="a previous JSON report to compare against")
+    parser.add_argument('--threshold', type=float, default=1.25,
+                        help="how many times slower a stage can get before it counts as a regression")
+    args = parser.parse_args(argv)
+    sweep = SWEEP[:3] if args.quick else SWEEP
+    report = {
+        'boxmaker_version': boxmaker.APP_VERSION,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'repeat': args.repeat,
+        'results': benchmark(sweep, FILE_TYPES, args.repeat),
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            slower = regressions(report['results'], json.load(f), args.threshold)
+        for line in slower:
+            print("REGRESSION " + line, file=sys.stderr)
+        return 1 if slower else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,3 +1,4 @@
+import io
 import os
 
 from boxmaker.box import Box
@@ -10,7 +11,21 @@ base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
 
 def render(file_path, width, height, depth, thickness, cut_width, notch_length, draw_bounding_box=False,
-           file_type='pdf', tray=False):
+           file_type='pdf', tray=False, timestamp=None, common_line=False, order_paths=False):
+    """
+    Render a box to file_path, which can be a file name or a binary file-like object. Sizes are in mm. With
+    common_line the pieces share the edges where they join, so those lines are only cut once. With order_paths the
+    cuts are put in an order that keeps the laser head's travel between them short.
+    """
     the_box = Box(file_path, width, height, depth, thickness, cut_width, notch_length, draw_bounding_box,
-                  file_type, tray)
+                  file_type, tray, timestamp, common_line, order_paths)
     the_box.render()
+
+
+def render_bytes(width, height, depth, thickness, cut_width, notch_length, draw_bounding_box=False, file_type='pdf',
+                 tray=False, timestamp=None, common_line=False, order_paths=False):
+    """ Render a box in memory and return the file contents, without touching the disk. """
+    output = io.BytesIO()
+    render(output, width, height, depth, thickness, cut_width, notch_length, draw_bounding_box, file_type, tray,
+           timestamp, common_line, order_paths)
+    return output.getvalue()
@@ -6,19 +6,25 @@ from boxmaker import base_dir
 
 logger = logging.getLogger(__name__)
 
-
-# load ads from config file
 ad_config_file_path = os.path.join(base_dir, 'config', 'ads.json')
-ad_config = []
-with open(ad_config_file_path, 'r') as f:
-    ad_config = json.load(f)
-logging.info("Loaded {} ads".format(len(ad_config)))
+_ad_config = None
+
 
-# clean up text
-for ad in ad_config:
-    ad['text'] = ad['text'].replace('URL', ad['url'])
+def _load_ads():
+    # load ads from config file
+    with open(ad_config_file_path, 'r') as f:
+        ad_config = json.load(f)
+    logging.info("Loaded {} ads".format(len(ad_config)))
+    # clean up text
+    for ad in ad_config:
+        ad['text'] = ad['text'].replace('URL', ad['url'])
+    return ad_config
 
 
 def visible_ads():
     # TODO: respect start and end dates
-    return ad_config
+    global _ad_config
+    if _ad_config is None:
+        # read lazily, so processes that never show the web page don't pay for it
+        _ad_config = _load_ads()
+    return _ad_config
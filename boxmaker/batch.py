@@ -0,0 +1,145 @@
+# Batch rendering of many boxes at once
+
+# Reads a list of box specs from a CSV or JSON-lines file and renders each one to its own file, spreading the work
+# across a pool of processes. Each spec has the same fields as the web form:
+#   width, height, depth, material_thickness, cut_width, notch_length (in units; default mm)
+#   units (mm, cm or in), file_type (default pdf), bounding_box, tray, common_line and order_paths (default false),
+#   and an optional name, which the output file is named after (with anything but letters, digits, dots, dashes and
+#   underscores replaced by dashes, and any directories dropped, so it always lands in the output directory)
+# From the command line:
+#   python -m boxmaker.batch specs.csv --output-dir tmp/catalog --workers 8
+
+import argparse
+import csv
+import json
+import logging
+import os
+import re
+import sys
+from collections import namedtuple
+from concurrent.futures import Future, ProcessPoolExecutor, as_completed
+
+import boxmaker
+from boxmaker.box import FILE_EXTENSIONS
+
+logger = logging.getLogger(__name__)
+
+UNIT_CONVERSIONS = {'mm': 1.0, 'cm': 10.0, 'in': 25.4}
+
+MEASUREMENTS = ['width', 'height', 'depth', 'material_thickness', 'cut_width', 'notch_length']
+
+UNSAFE_NAME_CHARACTERS = re.compile(r'[^A-Za-z0-9._-]+')
+
+# index is the spec's position in the input, and exactly one of file_path and error is set
+BatchResult = namedtuple('BatchResult', ['index', 'spec', 'file_path', 'error'])
+
+
+def read_specs(file_path):
+    """ Load box specs from a .csv file (with a header row) or a .jsonl file (one JSON object per line). """
+    with open(file_path, 'r', newline='') as f:
+        if file_path.endswith('.csv'):
+            return [dict(row) for row in csv.DictReader(f)]
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def render_batch(specs, output_dir, workers=None, ordered=True):
+    """
+    Render every spec into output_dir using a pool of worker processes (os.cpu_count() of them by default), yielding
+    a BatchResult for each one. With ordered=False results are yielded as soon as they finish rather than in input
+    order. A spec that fails to render, or that would be written to the same file as an earlier one, yields a result
+    with the error message instead of stopping the batch.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    file_names = set()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = []
+        for index, spec in enumerate(specs):
+            file_name = _file_name(index, spec)
+            if file_name.lower() in file_names:
+                # compared without case, since two names differing only in case are the same file on some systems
+                future = Future()
+                future.set_result(BatchResult(index, spec, None, "ValueError: More than one spec would be written to "
+                                                                 "{}".format(file_name)))
+            else:
+                file_names.add(file_name.lower())
+                future = executor.submit(_render_spec, index, spec, os.path.join(output_dir, file_name))
+            futures.append(future)
+        for future in (futures if ordered else as_completed(futures)):
+            yield future.result()
+
+
+def spec_params(spec):
+    """ Convert a spec into the keyword arguments boxmaker.render takes, with measurements in mm. """
+    units = spec.get('units') or 'mm'
+    # checked to be text first, since a list or object from a JSON spec can't be looked up
+    if not isinstance(units, str) or units not in UNIT_CONVERSIONS:
+        raise ValueError("Unknown units '{}'".format(units))
+    conversion = UNIT_CONVERSIONS[units]
+    params = {}
+    for key in MEASUREMENTS:
+        if spec.get(key) in (None, ''):
+            raise ValueError("Missing {}".format(key))
+        try:
+            params[key] = float(spec[key]) * conversion
+        except (TypeError, ValueError):
+            raise ValueError("{} must be a number".format(key))
+    params['file_type'] = spec.get('file_type') or 'pdf'
+    if not isinstance(params['file_type'], str) or params['file_type'] not in FILE_EXTENSIONS:
+        raise ValueError("Unknown file type '{}'".format(params['file_type']))
+    params['bounding_box'] = flag(spec.get('bounding_box'))
+    params['tray'] = flag(spec.get('tray'))
+    params['common_line'] = flag(spec.get('common_line'))
+    params['order_paths'] = flag(spec.get('order_paths'))
+    return params
+
+
+def _file_name(index, spec):
+    # a spec with an unknown file type fails when it's rendered, so its extension here doesn't matter
+    name = UNSAFE_NAME_CHARACTERS.sub('-', os.path.basename(str(spec.get('name') or '').replace('\\', '/')))
+    file_type = spec.get('file_type') or 'pdf'
+    extension = FILE_EXTENSIONS.get(file_type) if isinstance(file_type, str) else None
+    return (name.strip('.-') or 'box-{:05d}'.format(index)) + '.' + (extension or str(file_type))
+
+
+def _render_spec(index, spec, file_path):
+    # runs in a worker process; errors are returned as text since arbitrary exceptions might not pickle
+    try:
+        params = spec_params(spec)
+        boxmaker.render(file_path, params['width'], params['height'], params['depth'],
+                        params['material_thickness'], params['cut_width'], params['notch_length'],
+                        params['bounding_box'], params['file_type'], params['tray'],
+                        common_line=params['common_line'], order_paths=params['order_paths'])
+        return BatchResult(index, spec, file_path, None)
+    except Exception as e:
+        return BatchResult(index, spec, None, "{}: {}".format(type(e).__name__, e))
+
+
+def flag(value):
+    """ Read a yes/no field of a spec, which is text in a CSV file but may be a boolean or number in JSON. """
+    if isinstance(value, str):
+        return value.strip().lower() in ('1', 'true', 'yes', 'y')
+    return bool(value)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render many boxes from a CSV or JSON-lines file of specs.")
+    parser.add_argument('specs', help="a .csv file with a header row, or a .jsonl file")
+    parser.add_argument('-o', '--output-dir', default=os.path.join('tmp', 'batch'))
+    parser.add_argument('-j', '--workers', type=int, default=None, help="number of processes (default: all cores)")
+    parser.add_argument('--unordered', action='store_true', help="report results as they finish")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    specs = read_specs(args.specs)
+    failures = 0
+    for result in render_batch(specs, args.output_dir, args.workers, ordered=not args.unordered):
+        if result.error:
+            failures += 1
+            logger.error("#{} failed: {}".format(result.index, result.error))
+        else:
+            logger.info("#{} -> {}".format(result.index, result.file_path))
+    logger.info("Rendered {} of {} boxes".format(len(specs) - failures, len(specs)))
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
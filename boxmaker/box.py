@@ -1,17 +1,65 @@
+import importlib
 import logging
+import os
 import time
-from reportlab.lib.units import mm
-from reportlab.lib.colors import black
-from boxmaker.dxf import DXFDoc
-from boxmaker.svg import SVGDoc
-from boxmaker.pdf import PDFDoc
-from boxmaker.pathbuilder import PathBuilder, Point
+from collections.abc import Mapping
+from boxmaker.units import mm
+from boxmaker.colors import black
+from boxmaker.notches import notched_edge
+from boxmaker.pathbuilder import PathBuilder
+from boxmaker import metrics
 import boxmaker
 
-DOC_CLASSES = {
-    'pdf': PDFDoc,
-    'dxf': DXFDoc,
-    'svg': SVGDoc,
+
+class DocClassRegistry(Mapping):
+    """
+    Maps file types to document writer classes, given as 'module.ClassName' strings that are only imported the first
+    time they are looked up. That way a process that only makes SVGs never has to load reportlab.
+    """
+
+    def __init__(self, class_paths):
+        self._class_paths = dict(class_paths)
+        self._classes = {}
+
+    def register(self, file_type, class_path):
+        self._class_paths[file_type] = class_path
+        self._classes.pop(file_type, None)
+
+    def __getitem__(self, file_type):
+        if file_type not in self._classes:
+            module_name, class_name = self._class_paths[file_type].rsplit('.', 1)
+            self._classes[file_type] = getattr(importlib.import_module(module_name), class_name)
+        return self._classes[file_type]
+
+    def __iter__(self):
+        return iter(self._class_paths)
+
+    def __len__(self):
+        return len(self._class_paths)
+
+
+DOC_CLASSES = DocClassRegistry({
+    'pdf': 'boxmaker.pdf.PDFDoc',
+    'pdf_native': 'boxmaker.native_pdf.NativePDFDoc',
+    'dxf': 'boxmaker.dxf.DXFDoc',
+    'dxf_polyline': 'boxmaker.dxf.DXFPolylineDoc',
+    'svg': 'boxmaker.svg.SVGDoc',
+    'svg_compact': 'boxmaker.svg.CompactSVGDoc',
+    'svgz': 'boxmaker.svg.SVGZDoc',
+})
+
+# the six sides, in the order they are drawn: back and front are W x H, left and right are D x H, and bottom and top
+# are W x D
+FACES = ['back', 'left', 'bottom', 'right', 'front', 'top']
+
+FILE_EXTENSIONS = {
+    'pdf': 'pdf',
+    'pdf_native': 'pdf',
+    'dxf': 'dxf',
+    'dxf_polyline': 'dxf',
+    'svg': 'svg',
+    'svg_compact': 'svg',
+    'svgz': 'svgz',
 }
 
 
@@ -49,10 +97,25 @@ class Box:
                 |        |
                 7========8
     </pre>
+
+    With common_line set the pieces are instead laid out so that edges which join are drawn on top of each other,
+    and each shared line is only cut once (see PathBuilder.remove_overlaps). Left, front and right sit side by side,
+    with back, bottom, front and top stacked up the middle:
+
+                 5--------6
+                 |  w x d |
+     4-------1  5========6  2-------3
+     | d x h |  |  w x h |  | d x h |
+     8=======5  1--------2  6=======7
+                 3--------4
+                 |  w x d |
+                 1--------2
+                 |  w x h |
+                 7========8
     '''
 
     def __init__(self, file_path, width, height, depth, thickness, cut_width, notch_length, bounding_box,
-                 file_type, tray):
+                 file_type, tray, timestamp=None, common_line=False, order_paths=False):
         self._logger = logging.getLogger(__name__)
         self._file_path = file_path
         self._desired_size = {'w': float(width), 'h': float(height), 'd': float(depth)}
@@ -62,36 +125,151 @@ class Box:
         self._cut_width = float(cut_width)
         self._desired_notch_length = float(notch_length)
         self._bounding_box = bounding_box
-        self._doc_cls = DOC_CLASSES[file_type]
+        self._file_type = file_type
+        # no file type means no document, for when only the geometry is wanted (see geometry)
+        self._doc_cls = DOC_CLASSES[file_type] if file_type else None
         self._tray = tray
+        # the time printed on the document and recorded as its creation date; pass one in (a time.struct_time) to get
+        # reproducible output, or False to leave the time out altogether
+        self._timestamp = timestamp
+        self._common_line = common_line
+        # how much shorter (in mm) sharing cuts made the job, when common_line is set
+        self.cut_length_saved = 0.0
+        self._order_paths = order_paths
+        # how far (in mm) the laser head moves between paths, before and after ordering them, when order_paths is set
+        self.travel_distance = None
         self.paths = PathBuilder()
 
     def render(self):
+        stats = metrics.start_render(self._file_type)
         # set things up
+        with stats.stage('compute_dimensions'):
+            self._compute_dimensions()
+        with stats.stage('initialize_document'):
+            self._initialize_document()
+        # the writer closes its output if anything goes wrong before it's saved
+        with self._doc:
+            with stats.stage('draw_faces'):
+                if self._bounding_box:
+                    self._draw_bounding_box()
+                self._draw_faces()
+            # and write out the file
+            with stats.stage('join_paths'):
+                self._join_cuts()
+                if self._common_line:
+                    self._doc.drawString(15*mm, 40*mm, "Common-Line Cutting Saves: %.2fmm" % self.cut_length_saved)
+            with stats.stage('emit_paths'):
+                self.paths.emit_paths(self._doc)
+            with stats.stage('save'):
+                self._doc.save(self._created)
+        if stats.enabled:
+            stats.segments = self.paths.segment_count()
+            stats.paths = len(self.paths.paths)
+            stats.output_bytes = self._output_size()
+        stats.finish()
+
+    def face_segments(self):
+        """
+        Draw each face on its own, returning a dict from face name to its segments (a flat array of x0, y0, x1, y1
+        values in points, as in PathBuilder) at its place in the usual layout.
+        """
         self._compute_dimensions()
-        self._initialize_document()
+        origins = self._face_origins()
+        faces = {}
+        paths = self.paths
+        for face in self._faces():
+            self.paths = PathBuilder()
+            self._draw_face(face, *origins[face])
+            faces[face] = self.paths.segments
+        self.paths = paths
+        return faces
+
+    def geometry(self):
+        """
+        Do everything render does short of writing a document, and return what would be drawn as a dict (sizes in
+        mm): the page size, the box's actual size, notch counts and notch lengths (each keyed by w, h and d), the
+        bounding box as x, y, width, height (or None), and the joined paths as lists of (x, y) points. The
+        file_type can be None, in which case no document writer is ever loaded.
+        """
+        geometry = self.dimensions()
+        self._draw_faces()
+        self._join_cuts()
+        bounding_box = None
         if self._bounding_box:
-            self._draw_bounding_box()
-        # 1. a W x H side (the back)
-        self._draw_back()
-        # 2. a D x H side (the left side)
-        self._draw_left()
-        # 3. a W X D side (the bottom)
-        self._draw_bottom()
-        # 4. a D x H side (the right side)
-        self._draw_right()
-        # 5. a W x H side (the front)
-        self._draw_front()
-        # 6. a W X D side (the top)
-        if not self._tray:
-            self._draw_top()        # and write out the file
+            bounding_box = (self._margin, self._margin, self._bounding_box_size['w'], self._bounding_box_size['h'])
+        geometry.update({
+            'page_size': (self._doc_size['w'], self._doc_size['h']),
+            'thickness': self._thickness,
+            'bounding_box': bounding_box,
+            'paths': [[(x / mm, y / mm) for x, y in path] for path in self.paths.paths],
+            'cut_length_saved': self.cut_length_saved,
+            'travel_distance': self.travel_distance,
+        })
+        return geometry
+
+    def dimensions(self):
+        """
+        Work out the box's actual size, notch counts and notch lengths (in mm, each keyed by w, h and d) without
+        drawing anything.
+        """
+        self._compute_dimensions()
+        return {
+            'size': dict(self._size),
+            'notch_count': dict([(side, int(count)) for side, count in self._num_notches.items()]),
+            'notch_length': dict(self._notch_length),
+        }
+
+    def _faces(self):
+        # a tray has no top
+        return FACES[:-1] if self._tray else FACES
+
+    def _face_origins(self):
+        # where each face is drawn from in the cross-shaped layout, in mm
+        d, w, h, margin = self._size['d'], self._size['w'], self._size['h'], self._margin
+        if self._common_line:
+            # each face starts a thickness before the one it joins ends, so their notched edges coincide
+            t = self._thickness
+            x0 = margin + d - t
+            return {
+                'back': (x0, margin),
+                'left': (margin, margin + h + d - t*2.0),
+                'bottom': (x0, margin + h - t),
+                'right': (x0 + w - t, margin + h + d - t*2.0),
+                'front': (x0, margin + h + d - t*2.0),
+                'top': (x0, margin + h*2.0 + d - t*3.0),
+            }
+        return {
+            'back': (d + margin*2.0, margin),
+            'left': (margin, h + margin*2.0),
+            'bottom': (d + margin*2.0, h + margin*2.0),
+            'right': (d + w + margin*3.0, h + margin*2.0),
+            'front': (d + margin*2.0, h + d + margin*3.0),
+            'top': (d + margin*2.0, h*2.0 + d + margin*4.0),
+        }
+
+    def _draw_faces(self):
+        # draw every face at its place in the layout
+        origins = self._face_origins()
+        for face in self._faces():
+            self._draw_face(face, *origins[face])
+
+    def _draw_face(self, face, x0, y0):
+        getattr(self, '_draw_'+face)(x0, y0)
+
+    def _join_cuts(self):
+        # turn the segments drawn into the paths to cut, sharing and ordering the cuts if asked to
+        if self._common_line:
+            self._remove_shared_cuts()
         self.paths.join_paths()
-        self.paths.emit_paths(self._doc)
-        self._doc.save()
+        if self._order_paths:
+            self._order_cuts()
 
-    def _draw_top(self):
-        x0 = self._size['d'] + self._margin*2.0
-        y0 = self._size['h']*2.0 + self._size['d'] + self._margin*4.0
+    def _output_size(self):
+        if hasattr(self._file_path, 'tell'):
+            return self._file_path.tell()
+        return os.path.getsize(self._file_path)
+
+    def _draw_top(self, x0, y0):
         self._draw_horizontal_line(x0, y0,
                                    self._notch_length['w'], self._num_notches['w'],
                                    self._thickness, -1*self._cut_width/2.0, True, True)
@@ -105,8 +283,7 @@ class Box:
                                  self._notch_length['d'], self._num_notches['d'],
                                  self._thickness, -1*self._cut_width/2.0, False, True)
 
-    def _draw_back(self):
-        x0, y0 = self._size['d'] + self._margin*2.0, self._margin
+    def _draw_back(self, x0, y0):
         if self._tray:
             self._draw_line(x0, y0, x0+self._size['w']-self._thickness, y0)
         else:
@@ -123,8 +300,7 @@ class Box:
                                  self._notch_length['h'], self._num_notches['h'],
                                  self._thickness, -1*self._cut_width/2.0, False, False)
 
-    def _draw_left(self):
-        x0, y0 = self._margin, self._size['h'] + self._margin*2.0
+    def _draw_left(self, x0, y0):
         if self._tray:
             self._draw_line(x0, y0, x0+self._size['d']-self._thickness, y0)
         else:
@@ -140,9 +316,7 @@ class Box:
                                  self._notch_length['h'], self._num_notches['h'],
                                  self._thickness, -1*self._cut_width/2.0, False, False)
 
-    def _draw_bottom(self):
-        x0 = self._size['d'] + self._margin*2.0
-        y0 = self._size['h'] + self._margin*2.0
+    def _draw_bottom(self, x0, y0):
         self._draw_horizontal_line(x0, y0,
                                    self._notch_length['w'], self._num_notches['w'],
                                    self._thickness, -1*self._cut_width/2.0, True, True)
@@ -156,9 +330,7 @@ class Box:
                                  self._notch_length['d'], self._num_notches['d'],
                                  self._thickness, -1*self._cut_width/2.0, False, True)
 
-    def _draw_right(self):
-        x0 = self._size['d'] + self._size['w'] + self._margin*3.0
-        y0 = self._size['h'] + self._margin*2.0
+    def _draw_right(self, x0, y0):
         if self._tray:
             self._draw_line(x0, y0, x0+self._size['d']-self._thickness, y0)
         else:
@@ -174,9 +346,7 @@ class Box:
                                  self._notch_length['h'], self._num_notches['h'],
                                  self._thickness, -1*self._cut_width/2.0, False, False)
 
-    def _draw_front(self):
-        x0 = self._size['d'] + self._margin*2.0
-        y0 = self._size['h'] + self._size['d'] + self._margin*3.0
+    def _draw_front(self, x0, y0):
         self._draw_horizontal_line(x0, y0,
                                    self._notch_length['w'], self._num_notches['w'],
                                    self._thickness, self._cut_width/2.0, False, False)
@@ -224,6 +394,10 @@ class Box:
         # compute how big the document will be based on the layout of the pieces
         self._box_pieces_size = {'w': self._size['d']*2.0 + self._size['w'],
                                  'h': self._size['h']*2.0 + self._size['d']*2.0}
+        if self._common_line:
+            # the pieces overlap by a thickness wherever they join
+            self._box_pieces_size['w'] -= self._thickness*2.0
+            self._box_pieces_size['h'] -= self._thickness*3.0
         self._doc_size = {'w': self._box_pieces_size['w']+self._margin*4,
                           'h': self._box_pieces_size['h']+self._margin*5}
         # compute a bounding box size, in case we need to render it
@@ -238,12 +412,15 @@ class Box:
         self._doc.setStrokeColor(black)
         self._doc.setLineWidth(0.1)
         # print out some summary info for good record keeping purposes
+        self._created = None if self._timestamp is False else self._timestamp or time.localtime()
         self._doc.drawString(15*mm, 35*mm, "Cut Width: %.4fmm" % self._cut_width)
         self._doc.drawString(15*mm, 30*mm, "Material Thickness: %.4fmm" % self._thickness)
         self._doc.drawString(15*mm, 25*mm, "W x D x H: %.2fmm x %.2fmm x %.2fmm" %
                              (self._size['w'], self._size['d'], self._size['h']))
-        self._doc.drawString(15*mm, 20*mm, "Produced by "+boxmaker.APP_NAME+" v"+boxmaker.APP_VERSION +
-                             " on "+time.strftime("%m/%d/%Y")+" at "+time.strftime("%H:%M:%S"))
+        produced = "Produced by "+boxmaker.APP_NAME+" v"+boxmaker.APP_VERSION
+        if self._created is not None:
+            produced += " on "+time.strftime("%m/%d/%Y", self._created)+" at "+time.strftime("%H:%M:%S", self._created)
+        self._doc.drawString(15*mm, 20*mm, produced)
         self._doc.drawString(15*mm, 15*mm, boxmaker.WEBSITE_URL)
 
     def _draw_bounding_box(self):
@@ -253,52 +430,27 @@ class Box:
         self._doc.drawString(15*mm, self._doc_size['h']*mm - 20*mm, "Bounding Box: %.2fmm x %.2fmm" %
                              (self._bounding_box_size['w'], self._bounding_box_size['h']))
 
+    def _remove_shared_cuts(self):
+        self.cut_length_saved = self.paths.remove_overlaps() / mm
+        self._logger.debug(" common-line cutting saves %.2fmm" % self.cut_length_saved)
+
+    def _order_cuts(self):
+        before, after = self.paths.order_paths()
+        self.travel_distance = (before / mm, after / mm)
+        self._logger.debug(" travel between cuts: %.2fmm -> %.2fmm" % self.travel_distance)
+
     def _draw_horizontal_line(self, x0, y0, notch_width, notch_count, notch_height, cut_width, flip, smallside):
-        x = x0
-        for step in range(0, int(notch_count)):
-            y = y0 if (((step % 2) == 0) ^ flip) else y0+notch_height
-            if step == 0:  # start first edge in the right place
-                if smallside:
-                    self._draw_line(x+notch_height, y, x+notch_width+cut_width, y)
-                else:
-                    self._draw_line(x, y, x+notch_width+cut_width, y)
-            elif step == (notch_count-1):  # shorter last edge
-                self._draw_line(x-cut_width, y, x+notch_width-notch_height, y)
-            elif step % 2 == 0:
-                self._draw_line(x-cut_width, y, x+notch_width+cut_width, y)
-            else:
-                self._draw_line(x+cut_width, y, x+notch_width-cut_width, y)
-            if step < (notch_count-1):
-                if step % 2 == 0:
-                    self._draw_line(x+notch_width+cut_width, y0+notch_height, x+notch_width+cut_width, y0)
-                else:
-                    self._draw_line(x+notch_width-cut_width, y0+notch_height, x+notch_width-cut_width, y0)
-            x = x + notch_width
+        if self._common_line:
+            # a shared line is cut once for both pieces, so there's no per-piece kerf to offset the notches by
+            cut_width = 0.0
+        self.paths.add_segments(notched_edge(x0, y0, notch_width, notch_count, notch_height, cut_width, flip,
+                                             smallside, scale=mm))
 
     def _draw_vertical_line(self, x0, y0, notch_width, notch_count, notch_height, cut_width, flip, smallside):
-        y = y0
-        for step in range(0, int(notch_count)):
-            x = x0 if (((step % 2) == 0) ^ flip) else x0+notch_height
-            if step == 0:
-                if smallside:
-                    self._draw_line(x, y+notch_height, x, y+notch_width+cut_width)
-                else:
-                    self._draw_line(x, y, x, y+notch_width+cut_width)
-            elif step == (notch_count-1):
-                if smallside:
-                    self._draw_line(x, y-cut_width, x, y+notch_width-notch_height)
-                else:
-                    self._draw_line(x, y-cut_width, x, y+notch_width)
-            elif step % 2 == 0:
-                self._draw_line(x, y-cut_width, x, y+notch_width+cut_width)
-            else:
-                self._draw_line(x, y+cut_width, x, y+notch_width-cut_width)
-            if step < (notch_count-1):
-                if step % 2 == 0:
-                    self._draw_line(x0+notch_height, y+notch_width+cut_width, x0, y+notch_width+cut_width)
-                else:
-                    self._draw_line(x0+notch_height, y+notch_width-cut_width, x0, y+notch_width-cut_width)
-            y = y+notch_width
+        if self._common_line:
+            cut_width = 0.0
+        self.paths.add_segments(notched_edge(x0, y0, notch_width, notch_count, notch_height, cut_width, flip,
+                                             smallside, vertical=True, scale=mm))
 
     def _draw_line(self, from_x, from_y, to_x, to_y):
         self.paths.add_segment(from_x*mm, from_y*mm, to_x*mm, to_y*mm)
@@ -0,0 +1,151 @@
+# In-memory cache of rendered box files
+
+# Most renders are for a handful of popular sizes (the form defaults especially), so it is worth keeping the bytes of
+# recent renders around. Entries are keyed on a hash of the normalized box parameters and file type (and the version of
+# the code that drew them, so the on-disk BoxStore never serves a file an older version rendered), and the least
+# recently used ones are evicted once the cache holds more than max_bytes. SingleFlight makes sure that when several
+# requests for the same uncached box arrive together, only one of them renders it.
+
+import hashlib
+import threading
+from collections import OrderedDict
+
+import boxmaker
+
+# measurements are rounded to this many decimal places of a millimeter before hashing, so unit conversion noise
+# (ie. 4in * 25.4) doesn't split one box into several cache entries
+KEY_PRECISION = 6
+
+# bump this whenever a change to the drawing code or the document writers changes what a box renders to, even if
+# APP_VERSION stays the same, so stored renders from before the change aren't served
+RENDER_FORMAT_VERSION = 1
+
+
+def render_key(width, height, depth, thickness, cut_width, notch_length, bounding_box=False, file_type='pdf',
+               tray=False, common_line=False, order_paths=False):
+    """ Return a hex digest identifying the output of boxmaker.render for these parameters (all sizes in mm). """
+    measurements = [width, height, depth, thickness, cut_width, notch_length]
+    normalized = 'v{}.{},'.format(boxmaker.APP_VERSION, RENDER_FORMAT_VERSION)
+    normalized += ','.join(["{:.{}f}".format(float(m), KEY_PRECISION) for m in measurements])
+    normalized += ',bounding_box={},tray={},file_type={}'.format(bool(bounding_box), bool(tray), file_type)
+    if common_line:
+        # only added when set, so the keys of everything else stay the same
+        normalized += ',common_line=True'
+    if order_paths:
+        normalized += ',order_paths=True'
+    return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+
+class RenderCache(object):
+    """
+    A thread-safe LRU cache from render_key digests to rendered file bytes, bounded by total size and entry count.
+    """
+
+    def __init__(self, max_bytes=64*1024*1024, max_entries=1024):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """ Return the cached bytes for key, or None (counting a miss) if it isn't cached. """
+        with self._lock:
+            data = self._entries.get(key)
+            if data is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return data
+
+    def put(self, key, data):
+        with self._lock:
+            if key in self._entries:
+                self._size -= len(self._entries.pop(key))
+            if len(data) > self.max_bytes:
+                return
+            self._entries[key] = data
+            self._size += len(data)
+            while self._size > self.max_bytes or len(self._entries) > self.max_entries:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+                self.evictions += 1
+
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return float(self.hits) / lookups if lookups else 0.0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._size,
+                'max_bytes': self.max_bytes,
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hit_rate(),
+            }
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+
+class CallInterrupted(Exception):
+    """ Raised to the callers waiting on a SingleFlight call that ended without returning or raising an Exception. """
+    pass
+
+
+class SingleFlight(object):
+    """
+    Coalesces concurrent calls for the same key: while one thread is computing a key's value, any other thread asking
+    for it waits and gets the same result (or exception) instead of computing it again.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.coalesced = 0
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self.coalesced += 1
+        if not leader:
+            call.done.wait()
+        else:
+            # if fn is interrupted by something other than an Exception (ie. a worker's SystemExit), that goes on up
+            # the leader's stack, and the waiters get this instead of a result that was never set
+            call.error = CallInterrupted("The call this was waiting on was interrupted")
+            try:
+                call.result = fn()
+                call.error = None
+            except Exception as e:
+                call.error = e
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call.done.set()
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+
+class _Call(object):
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
@@ -0,0 +1,23 @@
+# Colors for the document writers
+
+# A minimal stand-in for reportlab.lib.colors.Color, so that the SVG and DXF writers don't need reportlab at all. The
+# PDF writer hands the components on to reportlab.
+
+
+class Color(object):
+    """ An RGB color with each component between 0 and 1. """
+
+    def __init__(self, red=0.0, green=0.0, blue=0.0):
+        self.red = red
+        self.green = green
+        self.blue = blue
+
+    def rgb(self):
+        return (self.red, self.green, self.blue)
+
+    def hexval(self):
+        # same format as reportlab's Color.hexval, ie. 0xff0000 for red
+        return '0x%02x%02x%02x' % tuple([int(round(255 * c)) for c in self.rgb()])
+
+
+black = Color(0.0, 0.0, 0.0)
@@ -0,0 +1,39 @@
+# Compressing rendered files for sending
+
+# SVG and DXF files are verbose text and shrink to a fraction of their size, so the server compresses them for any
+# client that says it can take it (Accept-Encoding), and offers gzipped downloads. gzip always works; brotli is used
+# too if the brotli package is installed.
+
+import gzip
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# how hard to compress; past these the files barely shrink but compressing takes much longer
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+def gzip_bytes(data):
+    # mtime=0 so the same file always compresses to the same bytes (and so keeps the same ETag)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def brotli_bytes(data):
+    return brotli.compress(data, quality=BROTLI_QUALITY)
+
+
+def available_encodings():
+    """ The content codings we can produce, in order of preference. """
+    return ['br', 'gzip'] if brotli is not None else ['gzip']
+
+
+def encode(data, encoding):
+    """ Compress data with one of available_encodings(). """
+    if encoding == 'gzip':
+        return gzip_bytes(data)
+    if encoding == 'br' and brotli is not None:
+        return brotli_bytes(data)
+    raise ValueError("Unknown content coding '{}'".format(encoding))
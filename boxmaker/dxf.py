@@ -1,18 +1,85 @@
 # By Asher Blum, May 2016
 # Crude DXF writer; outputs lines and text
 
+from boxmaker.output import open_text_output
+
 FONT_SIZE = 8.0
 TEXT_WIDTH_FACTOR = 0.75
 
 
+def _pairs_template(pairs):
+    # Precompile a list of (group code, value) pairs into a format string; a value of None becomes a {} placeholder
+    return ''.join(['%3d\r\n%s\r\n' % (code, '{}' if value is None else value) for code, value in pairs])
+
+
+tmpl_text = _pairs_template([
+        (0, 'TEXT'),
+        (5, '4D'),
+        (8, 0),
+        (6, 'BYBLOCK'),
+        (10, None),
+        (20, None),
+        (30, 0),
+        (40, FONT_SIZE),
+        (41, TEXT_WIDTH_FACTOR),
+        (1, None),
+])
+
+tmpl_line = _pairs_template([
+        (0, 'LINE'),
+        (5, '4D'),
+        (8,    0),
+        (10, None),
+        (20, None),
+        (30, 0.0),
+        (11, None),
+        (21, None),
+        (31, 0.0),
+])
+
+tmpl_polyline = _pairs_template([
+        (0, 'POLYLINE'),
+        (8, 0),
+        (66, 1),
+        (10, 0.0),
+        (20, 0.0),
+        (30, 0.0),
+        (70, None),
+])
+
+tmpl_vertex = _pairs_template([
+        (0, 'VERTEX'),
+        (8, 0),
+        (10, None),
+        (20, None),
+        (30, 0.0),
+])
+
+tmpl_seqend = _pairs_template([
+        (0, 'SEQEND'),
+        (8, 0),
+])
+
+
 class DXFDoc(object):
+    """
+    Writes entities straight to the output as they are drawn, rather than holding the whole document in memory until
+    save() (which just adds the footer and closes the output). Since the output is open from the start, use it as a
+    context manager so it gets closed even if drawing fails.
+    """
 
     def __init__(self, filename):
-        self.chunks = []
         self.filename = filename
+        self.ofh = open_text_output(filename)
         self.add_head()
         self.has_tail = False
 
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
     def setPageSize(self, _):
         pass
 
@@ -27,19 +94,7 @@ class DXFDoc(object):
 
     def drawString(self, x, y, st):
         # String must be free of metacharacters
-        pairs = [
-                (0, 'TEXT'),
-                (5, '4D'),
-                (8, 0),
-                (6, 'BYBLOCK'),
-                (10, x),
-                (20, y),
-                (30, 0),
-                (40, FONT_SIZE),
-                (41, TEXT_WIDTH_FACTOR),
-                (1, st),
-        ]
-        self._add_ent(pairs)
+        self.ofh.write(tmpl_text.format(x, y, st))
 
     def rect(self, x, y, w, h):
         points = [(x, y), (x+w, y), (x+w, y+h), (x, y+h)]
@@ -48,45 +103,31 @@ class DXFDoc(object):
 
     def drawClosedPath(self, p):
         # just draw all the segments
-        start = p[0]
-        for end in p[1:]:
-            self._line((start, end))
-            start = end
+        self.ofh.write(''.join([tmpl_line.format(start[0], start[1], end[0], end[1])
+                                for start, end in zip(p, p[1:])]))
 
     def drawOpenPath(self, p):
         # same as the closed path ones since we're just drawing segments
         self.drawClosedPath(p)
 
-    def save(self):
+    def save(self, timestamp=None):
+        # DXF has no creation date to record, so timestamp is ignored
         if not self.has_tail:
             self.add_tail()
             self.has_tail = True
-        ofh = open(self.filename, 'w')
-        for chunk in self.chunks:
-            ofh.write(chunk)
+        self.close()
+
+    def close(self):
+        self.ofh.close()
 
     # end public API
 
     def _line(self, line):
         # Given line=((x,y), (x,y)) add line
-        pairs = [
-                (0, 'LINE'),
-                (5, '4D'),
-                (8,    0),
-                (10, line[0][0]),
-                (20, line[0][1]),
-                (30, 0.0),
-                (11, line[1][0]),
-                (21, line[1][1]),
-                (31, 0.0),
-        ]
-        self._add_ent(pairs)
+        self.ofh.write(tmpl_line.format(line[0][0], line[0][1], line[1][0], line[1][1]))
 
     def _add_ent(self, pairs):
-        pairs = [('%3d' % a, str(b)) for a, b in pairs]
-        lines = ["\r\n".join(p) for p in pairs]
-        obuf = "\r\n".join(lines) + "\r\n"
-        self.chunks.append(obuf)
+        self.ofh.write(_pairs_template(pairs))
 
     def add_tail(self):
         # DXF footer; place after last entity
@@ -207,3 +248,23 @@ class DXFDoc(object):
             (2, 'ENTITIES'),
         ]
         self._add_ent(pairs)
+
+
+class DXFPolylineDoc(DXFDoc):
+    """
+    Writes each joined path as one POLYLINE entity (closed if the path is) instead of a LINE per segment, which makes
+    for much smaller files that CAM software imports faster. POLYLINE is part of the AC1009 (R12) format the header
+    declares; LWPOLYLINE would need a newer version with a lot more required structure.
+    """
+
+    def drawClosedPath(self, p):
+        # the last point repeats the first one, which the closed flag takes care of
+        self._polyline(p[:-1], 1)
+
+    def drawOpenPath(self, p):
+        self._polyline(p, 0)
+
+    def _polyline(self, points, flags):
+        self.ofh.write(tmpl_polyline.format(flags))
+        self.ofh.write(''.join([tmpl_vertex.format(pt[0], pt[1]) for pt in points]))
+        self.ofh.write(tmpl_seqend)
@@ -0,0 +1,172 @@
+# Opt-in timing of renders
+
+# Box.render reports how long each of its stages took, along with how many segments and paths it produced and how
+# big the output was, to every listener registered here. When nobody is listening nothing is timed. PrometheusMetrics
+# is a listener that aggregates those reports into histograms and renders them in the Prometheus text format.
+
+import threading
+import time
+from contextlib import contextmanager
+
+STAGES = ['compute_dimensions', 'initialize_document', 'draw_faces', 'join_paths', 'emit_paths', 'save']
+
+_listeners = []
+
+
+def add_listener(listener):
+    """ Call listener(stats) with a RenderStats after every render from now on. """
+    _listeners.append(listener)
+
+
+def remove_listener(listener):
+    _listeners.remove(listener)
+
+
+@contextmanager
+def collecting():
+    """ Collect the RenderStats of every render done inside the with block into the list it yields. """
+    collected = []
+    add_listener(collected.append)
+    try:
+        yield collected
+    finally:
+        remove_listener(collected.append)
+
+
+class RenderStats(object):
+    """ What one render did: seconds spent in each stage, segment and path counts, and output size in bytes. """
+    enabled = True
+
+    def __init__(self, file_type):
+        self.file_type = file_type
+        self.stages = {}
+        self.segments = 0
+        self.paths = 0
+        self.output_bytes = None
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - start
+
+    def total_seconds(self):
+        return sum(self.stages.values())
+
+    def finish(self):
+        for listener in list(_listeners):
+            listener(self)
+
+
+class _NoStats(object):
+    # stands in for RenderStats when nobody is listening, so Box.render can skip the bookkeeping
+    enabled = False
+
+    @contextmanager
+    def stage(self, name):
+        yield
+
+    def finish(self):
+        pass
+
+
+_no_stats = _NoStats()
+
+
+def start_render(file_type):
+    """ Return a RenderStats to fill in for a new render, or a stand-in that records nothing if nobody is listening. """
+    return RenderStats(file_type) if _listeners else _no_stats
+
+
+# bucket upper bounds, in seconds and in bytes
+SECONDS_BUCKETS = [0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0]
+BYTES_BUCKETS = [4096, 16384, 65536, 262144, 1048576, 4194304, 16777216]
+
+
+class _Histogram(object):
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.count += 1
+        self.sum += value
+
+
+class PrometheusMetrics(object):
+    """
+    A render listener that keeps per-file_type histograms of stage durations, total render time and output size,
+    plus counters of segments and paths drawn. Note that each process (ie. each gunicorn worker) has its own.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stage_seconds = {}  # (file_type, stage) -> _Histogram
+        self._render_seconds = {}  # file_type -> _Histogram
+        self._output_bytes = {}  # file_type -> _Histogram
+        self._segments = {}  # file_type -> count
+        self._paths = {}  # file_type -> count
+
+    def __call__(self, stats):
+        with self._lock:
+            for stage, seconds in stats.stages.items():
+                self._histogram(self._stage_seconds, (stats.file_type, stage), SECONDS_BUCKETS).observe(seconds)
+            self._histogram(self._render_seconds, stats.file_type, SECONDS_BUCKETS).observe(stats.total_seconds())
+            if stats.output_bytes is not None:
+                self._histogram(self._output_bytes, stats.file_type, BYTES_BUCKETS).observe(stats.output_bytes)
+            self._segments[stats.file_type] = self._segments.get(stats.file_type, 0) + stats.segments
+            self._paths[stats.file_type] = self._paths.get(stats.file_type, 0) + stats.paths
+
+    def exposition(self):
+        """ Return all the metrics in the Prometheus text exposition format. """
+        lines = []
+        with self._lock:
+            lines += _histogram_lines('boxmaker_render_stage_seconds', "Time spent in each stage of a render.",
+                                      {'file_type': 0, 'stage': 1}, self._stage_seconds)
+            lines += _histogram_lines('boxmaker_render_seconds', "Total time spent rendering a box.",
+                                      {'file_type': None}, self._render_seconds)
+            lines += _histogram_lines('boxmaker_render_output_bytes', "Size of the rendered file.",
+                                      {'file_type': None}, self._output_bytes)
+            lines += _counter_lines('boxmaker_render_segments_total', "Line segments drawn.", self._segments)
+            lines += _counter_lines('boxmaker_render_paths_total', "Joined paths emitted.", self._paths)
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def _histogram(histograms, key, buckets):
+        if key not in histograms:
+            histograms[key] = _Histogram(buckets)
+        return histograms[key]
+
+
+def _labels(label_positions, key):
+    # label_positions maps label names to their index in a tuple key, or None if the key is the value itself
+    values = [(name, key if position is None else key[position]) for name, position in label_positions.items()]
+    return ','.join(['{}="{}"'.format(name, value) for name, value in values])
+
+
+def _histogram_lines(name, help_text, label_positions, histograms):
+    lines = ['# HELP {} {}'.format(name, help_text), '# TYPE {} histogram'.format(name)]
+    for key in sorted(histograms):
+        histogram = histograms[key]
+        labels = _labels(label_positions, key)
+        for bound, count in zip(histogram.buckets, histogram.counts):
+            lines.append('{}_bucket{{{},le="{}"}} {}'.format(name, labels, bound, count))
+        lines.append('{}_bucket{{{},le="+Inf"}} {}'.format(name, labels, histogram.count))
+        lines.append('{}_sum{{{}}} {}'.format(name, labels, histogram.sum))
+        lines.append('{}_count{{{}}} {}'.format(name, labels, histogram.count))
+    return lines
+
+
+def _counter_lines(name, help_text, counts):
+    lines = ['# HELP {} {}'.format(name, help_text), '# TYPE {} counter'.format(name)]
+    for file_type in sorted(counts):
+        lines.append('{}{{file_type="{}"}} {}'.format(name, file_type, counts[file_type]))
+    return lines
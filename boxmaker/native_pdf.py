@@ -0,0 +1,123 @@
+# A small PDF writer that doesn't need reportlab
+
+# A box only needs a page of straight lines, maybe a rectangle, and a few lines of Helvetica text, which is a tiny
+# corner of what reportlab does. This writer produces that directly: one page whose content stream draws the text and
+# then strokes every cut as a single path, optionally Flate-compressed, with just enough objects around it (catalog,
+# page tree, page, font and document info) to make a valid PDF 1.4 file. Nothing is written until save, since the file
+# ends with a table of where each object starts.
+
+import time
+import zlib
+
+# the same text size reportlab uses by default (the font is Helvetica)
+FONT_SIZE = 12
+
+
+class NativePDFDoc(object):
+
+    def __init__(self, filename, compress=True):
+        self.filename = filename
+        self.compress = compress
+        self.page_size = [0, 0]
+        self.author = ''
+        self._ops = []  # content stream operators, apart from the path being built
+        self._path = []  # operators for the path being built, which is stroked in one go
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        # everything is written in save(), so there's nothing to close
+        pass
+
+    def setPageSize(self, page_size):
+        self.page_size = page_size
+
+    def setAuthor(self, author):
+        self.author = author
+
+    def setStrokeColor(self, col):
+        self._stroke()
+        self._ops.append('%s %s %s RG\n' % tuple([_num(c) for c in col.rgb()]))
+
+    def setLineWidth(self, lw):
+        self._stroke()
+        self._ops.append('%s w\n' % _num(lw))
+
+    def drawString(self, x, y, st):
+        self._ops.append('BT /F1 %d Tf %.2f %.2f Td (%s) Tj ET\n' % (FONT_SIZE, x, y, _escape(st)))
+
+    def rect(self, x, y, w, h):
+        self._path.append('%.2f %.2f %.2f %.2f re\n' % (x, y, w, h))
+
+    def drawClosedPath(self, p):
+        self._path.append(_path_ops(p[:-1]) + 'h\n')
+
+    def drawOpenPath(self, p):
+        self._path.append(_path_ops(p))
+
+    def save(self, timestamp=None):
+        # timestamp (a time.struct_time) is recorded as the creation date; without one there's none, which PDF allows
+        info = '' if timestamp is None else ' /CreationDate (%s)' % _pdf_date(timestamp)
+        self._stroke()
+        content = ''.join(self._ops).encode('latin-1', 'replace')
+        stream_dict = '/Length %d' % len(content)
+        if self.compress:
+            content = zlib.compress(content)
+            stream_dict = '/Filter /FlateDecode /Length %d' % len(content)
+        objects = [
+            b'<< /Type /Catalog /Pages 2 0 R >>',
+            b'<< /Type /Pages /Kids [3 0 R] /Count 1 >>',
+            ('<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %.4f %.4f] /Resources << /Font << /F1 4 0 R >> >> '
+             '/Contents 5 0 R >>' % (self.page_size[0], self.page_size[1])).encode('latin-1'),
+            b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>',
+            ('<< %s >>\nstream\n' % stream_dict).encode('latin-1') + content + b'\nendstream',
+            ('<< /Author (%s)%s >>' % (_escape(self.author), info)).encode('latin-1', 'replace'),
+        ]
+        # a binary comment after the header tells transfer tools the file isn't plain text
+        chunks = [b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n']
+        offset = len(chunks[0])
+        offsets = []
+        for number, body in enumerate(objects, 1):
+            chunk = b'%d 0 obj\n' % number + body + b'\nendobj\n'
+            offsets.append(offset)
+            offset += len(chunk)
+            chunks.append(chunk)
+        xref = ['xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1)]
+        xref += ['%010d 00000 n \n' % o for o in offsets]
+        xref.append('trailer\n<< /Size %d /Root 1 0 R /Info 6 0 R >>\nstartxref\n%d\n%%%%EOF\n' %
+                    (len(objects) + 1, offset))
+        chunks.append(''.join(xref).encode('latin-1'))
+        if hasattr(self.filename, 'write'):
+            self.filename.write(b''.join(chunks))
+        else:
+            with open(self.filename, 'wb') as f:
+                f.write(b''.join(chunks))
+
+    # end public API
+
+    def _stroke(self):
+        # paint everything drawn so far as one path, before anything changes how it would look
+        if self._path:
+            self._ops += self._path
+            self._ops.append('S\n')
+            self._path = []
+
+
+def _path_ops(points):
+    # a move to the first point and lines to the rest, formatted all at once
+    coords = tuple([c for pt in points for c in pt])
+    return ('%.2f %.2f m\n' + '%.2f %.2f l\n' * (len(points)-1)) % coords
+
+
+def _num(v):
+    return ('%.4f' % v).rstrip('0').rstrip('.')
+
+
+def _escape(text):
+    # PDF string literals need backslashes and parentheses escaped
+    return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+
+def _pdf_date(t):
+    return time.strftime('D:%Y%m%d%H%M%S', t)
@@ -0,0 +1,348 @@
+# Packing the panels of many boxes onto shared sheets of material
+
+# Box.render lays each box out on its own page in a fixed cross shape, which leaves a lot of the sheet empty. For a
+# laser job with many boxes it is better to pull every box apart into its panels and pack those onto as few sheets as
+# possible. Packing uses the skyline bottom-left heuristic: each sheet keeps its "skyline", the top edge of the panels
+# placed so far as a list of horizontal steps, and each panel goes wherever it would sit lowest (and then furthest
+# left). Panels are placed tallest first and may be turned sideways, each onto the first sheet with room for it. Every
+# sheet keeps the largest empty rectangles resting on its skyline, and the sheets are kept in a segment tree of the
+# widest and tallest of those under each node, so finding the first sheet with room skips whole runs of full sheets at
+# once rather than checking each one; the search on a sheet only looks at the skyline (which stays short) rather than
+# every panel placed.
+# From the command line:
+#   python -m boxmaker.nesting specs.csv --sheet 600x400 --output-dir tmp/sheets
+
+import argparse
+import logging
+import os
+import sys
+from array import array
+from bisect import bisect_left
+
+import boxmaker
+from boxmaker.box import Box, DOC_CLASSES, FILE_EXTENSIONS
+from boxmaker.colors import black
+from boxmaker.pathbuilder import PathBuilder
+from boxmaker.units import mm
+
+logger = logging.getLogger(__name__)
+
+
+class Panel(object):
+    """
+    One face of one box: its segments (as in PathBuilder, in points) moved so their bounding box starts at the origin,
+    and that bounding box's width and height in mm.
+    """
+
+    def __init__(self, name, segments):
+        self.name = name
+        xs, ys = segments[0::2], segments[1::2]
+        min_x, min_y = min(xs), min(ys)
+        self.width = (max(xs) - min_x) / mm
+        self.height = (max(ys) - min_y) / mm
+        self.segments = _transformed(segments, lambda x, y: (x - min_x, y - min_y))
+
+    def area(self):
+        return self.width * self.height
+
+
+class Placement(object):
+    """ Where a panel went on a sheet: its lower left corner in mm, and whether it was turned a quarter turn. """
+
+    def __init__(self, panel, x, y, rotated):
+        self.panel = panel
+        self.x = x
+        self.y = y
+        self.rotated = rotated
+
+    def segments(self):
+        dx, dy = self.x * mm, self.y * mm
+        if self.rotated:
+            # turn counter-clockwise about the origin, which puts the panel left of it, then slide it back into place
+            height = self.panel.height * mm
+            return _transformed(self.panel.segments, lambda x, y: (height - y + dx, x + dy))
+        return _transformed(self.panel.segments, lambda x, y: (x + dx, y + dy))
+
+
+class Sheet(object):
+    """ A sheet of material (sizes in mm) that panels are packed onto, keeping margin clear around its edges. """
+
+    def __init__(self, width, height, margin=5.0, spacing=2.0):
+        self.width = width
+        self.height = height
+        self.margin = margin
+        self.spacing = spacing
+        self.placements = []
+        # each step is [x, y, width]: panels are placed above height y from x to x+width; the steps cover the sheet
+        # inside the margins from left to right, and each panel is padded by spacing on its top and right
+        self._skyline = [[margin, margin, width - margin*2.0 + spacing]]
+        self._top = height - margin + spacing
+        # (width, height) of the largest empty rectangles resting on the skyline, so a sheet a panel can't fit on is
+        # skipped with a few comparisons rather than a search
+        self._free = [(self._skyline[0][2], self._top - margin)]
+
+    def find_position(self, width, height):
+        """ Return the (x, y) where a width x height panel would sit lowest on this sheet, or None if it won't fit. """
+        width, height = width + self.spacing, height + self.spacing
+        if not self._has_room(width, height):
+            return None
+        best = None
+        for i in range(len(self._skyline)):
+            y = self._fit(i, width)
+            if y is None or y + height > self._top:
+                continue
+            x = self._skyline[i][0]
+            if best is None or (y, x) < best:
+                best = (y, x)
+        return None if best is None else (best[1], best[0])
+
+    def place(self, panel, x, y, rotated=False):
+        width, height = (panel.height, panel.width) if rotated else (panel.width, panel.height)
+        self._raise_skyline(x, y + height + self.spacing, width + self.spacing)
+        placement = Placement(panel, x, y, rotated)
+        self.placements.append(placement)
+        return placement
+
+    def utilization(self):
+        """ The fraction of the sheet's area covered by panels. """
+        return sum([p.panel.area() for p in self.placements]) / (self.width * self.height)
+
+    def render(self, file_path, file_type='pdf', order_paths=False):
+        """
+        Draw every panel on this sheet into one document, using the same writers as Box. With order_paths the cuts are
+        ordered to keep the laser head's travel short, and the travel before and after (in mm) is returned.
+        """
+        with DOC_CLASSES[file_type](file_path) as doc:
+            doc.setPageSize([self.width*mm, self.height*mm])
+            doc.setAuthor(boxmaker.APP_NAME+" "+boxmaker.APP_VERSION)
+            doc.setStrokeColor(black)
+            doc.setLineWidth(0.1)
+            paths = PathBuilder()
+            for placement in self.placements:
+                paths.add_segments(placement.segments())
+            paths.join_paths()
+            travel = None
+            if order_paths:
+                travel = tuple([distance / mm for distance in paths.order_paths()])
+            paths.emit_paths(doc)
+            doc.save()
+        return travel
+
+    def _fit(self, i, width):
+        # the height a panel width wide would rest at if its left edge is at step i, or None if it runs off the sheet
+        skyline = self._skyline
+        x = skyline[i][0]
+        if x + width > skyline[-1][0] + skyline[-1][2] + 1e-9:
+            return None
+        y = 0.0
+        right = x + width
+        while i < len(skyline) and skyline[i][0] < right - 1e-9:
+            y = max(y, skyline[i][1])
+            i += 1
+        return y
+
+    def _raise_skyline(self, x, y, width):
+        # the new step replaces whatever the panel covers, keeping the parts of steps that stick out either side
+        right = x + width
+        left_steps, right_steps = [], []
+        for step_x, step_y, step_width in self._skyline:
+            step_right = step_x + step_width
+            if step_x < x - 1e-9:
+                left_steps.append([step_x, step_y, min(step_right, x) - step_x])
+            if step_right > right + 1e-9:
+                start = max(step_x, right)
+                right_steps.append([start, step_y, step_right - start])
+        steps = left_steps + [[x, y, width]] + right_steps
+        # merge neighbouring steps at the same height
+        self._skyline = []
+        for step in steps:
+            if self._skyline and abs(self._skyline[-1][1] - step[1]) < 1e-9:
+                self._skyline[-1][2] = step[0] + step[2] - self._skyline[-1][0]
+            else:
+                self._skyline.append(step)
+        # every empty rectangle on the skyline rests on some step and spreads over its neighbours that are lower
+        skyline = self._skyline
+        self._free = []
+        for i, (_, y, _) in enumerate(skyline):
+            left = right = i
+            while left > 0 and skyline[left-1][1] <= y:
+                left -= 1
+            while right < len(skyline) - 1 and skyline[right+1][1] <= y:
+                right += 1
+            self._free.append((skyline[right][0] + skyline[right][2] - skyline[left][0], self._top - y))
+
+    def _has_room(self, width, height):
+        for free_width, free_height in self._free:
+            if width <= free_width + 1e-9 and height <= free_height + 1e-9:
+                return True
+        return False
+
+
+def box_panels(width, height, depth, thickness, cut_width, notch_length, tray=False, name='box'):
+    """ Return the Panels of one box (sizes in mm), named like 'box/front'. """
+    box = Box(None, width, height, depth, thickness, cut_width, notch_length, False, 'svg', tray)
+    return [Panel(name+'/'+face, segments) for face, segments in box.face_segments().items()]
+
+
+def pack(panels, sheet_width, sheet_height, margin=5.0, spacing=2.0, rotate=True):
+    """
+    Pack panels onto as few sheet_width x sheet_height sheets as the heuristic manages, returning the list of Sheets.
+    Raises ValueError if a panel is too big for an empty sheet.
+    """
+    sheets = _SheetIndex()
+    for panel in sorted(panels, key=lambda panel: _packing_order(panel, rotate), reverse=True):
+        # sheets pad each panel by spacing
+        sizes = [(panel.width + spacing, panel.height + spacing)]
+        if rotate:
+            sizes.append((panel.height + spacing, panel.width + spacing))
+        for i in sheets.candidates(sizes):
+            if _place(sheets.sheets[i], panel, rotate):
+                sheets.update(i)
+                break
+        else:
+            sheet = Sheet(sheet_width, sheet_height, margin, spacing)
+            if not _place(sheet, panel, rotate):
+                raise ValueError("{} ({:.1f}mm x {:.1f}mm) doesn't fit on a {}mm x {}mm sheet".format(
+                    panel.name, panel.width, panel.height, sheet_width, sheet_height))
+            sheets.append(sheet)
+    return sheets.sheets
+
+
+class _SheetIndex(object):
+    """
+    The sheets in the order they were started, in a segment tree holding, under each node, the empty rectangles on its
+    sheets that no other one there is both at least as wide and at least as tall as. Those are sorted by width (and so
+    taller first), so whether any of a node's sheets has room for a panel is one binary search, and candidates goes
+    straight down to the first sheet that does.
+    """
+
+    def __init__(self):
+        self.sheets = []
+        self._leaves = 1
+        self._free = [([], [])] * 2  # for each node, its (widths, heights), widest last
+
+    def append(self, sheet):
+        self.sheets.append(sheet)
+        if len(self.sheets) > self._leaves:
+            # double the tree, and fill it in again from the sheets
+            self._leaves *= 2
+            self._free = [([], [])] * (self._leaves*2)
+            for i in range(len(self.sheets)):
+                self.update(i)
+        else:
+            self.update(len(self.sheets) - 1)
+
+    def update(self, i):
+        """ Bring the tree up to date after sheet i has had a panel placed on it. """
+        node = i + self._leaves
+        self._free[node] = _largest(self.sheets[i]._free)
+        node //= 2
+        while node:
+            left, right = self._free[node*2], self._free[node*2+1]
+            self._free[node] = _largest(list(zip(*left)) + list(zip(*right)))
+            node //= 2
+
+    def candidates(self, sizes):
+        """
+        Yield the index of each sheet, in order, that has room for a panel of any of sizes ((width, height) pairs,
+        padded as Sheet pads them), skipping the ones that don't.
+        """
+        stack = [1]
+        while stack:
+            node = stack.pop()
+            widths, heights = self._free[node]
+            for width, height in sizes:
+                j = bisect_left(widths, width - 1e-9)
+                if j < len(widths) and heights[j] >= height - 1e-9:
+                    break
+            else:
+                continue
+            if node >= self._leaves:
+                yield node - self._leaves
+            else:
+                stack += (node*2 + 1, node*2)
+
+
+def _largest(rectangles):
+    # the (widths, heights) of the (width, height) rectangles that no other one is both at least as wide and as tall
+    # as, narrowest (and so tallest) first
+    widths, heights = [], []
+    for width, height in sorted(rectangles, reverse=True):
+        if not heights or height > heights[-1]:
+            widths.append(width)
+            heights.append(height)
+    return widths[::-1], heights[::-1]
+
+
+def _packing_order(panel, rotate):
+    # tallest first, where a panel that can be turned counts as lying on its long side
+    if rotate:
+        return sorted((panel.width, panel.height))
+    return (panel.height, panel.width)
+
+
+def _place(sheet, panel, rotate):
+    # put the panel on the sheet whichever way round sits lowest, returning whether it fit at all
+    best = None
+    for rotated in ([False, True] if rotate and panel.width != panel.height else [False]):
+        width, height = (panel.height, panel.width) if rotated else (panel.width, panel.height)
+        position = sheet.find_position(width, height)
+        if position is not None and (best is None or (position[1], position[0]) < (best[1], best[0])):
+            best = (position[0], position[1], rotated)
+    if best is None:
+        return False
+    sheet.place(panel, *best)
+    return True
+
+
+def _transformed(segments, fn):
+    out = array('d', segments)
+    for i in range(0, len(out), 2):
+        out[i], out[i+1] = fn(out[i], out[i+1])
+    return out
+
+
+def main(argv=None):
+    from boxmaker.batch import read_specs, spec_params
+    parser = argparse.ArgumentParser(description="Pack the panels of many boxes onto as few sheets as possible.")
+    parser.add_argument('specs', help="a .csv file with a header row, or a .jsonl file (see boxmaker.batch)")
+    parser.add_argument('--sheet', required=True, help="sheet size in mm, like 600x400")
+    parser.add_argument('-o', '--output-dir', default=os.path.join('tmp', 'sheets'))
+    parser.add_argument('-t', '--file-type', default='pdf', choices=sorted(FILE_EXTENSIONS))
+    parser.add_argument('--margin', type=float, default=5.0, help="mm to leave clear around each sheet's edge")
+    parser.add_argument('--spacing', type=float, default=2.0, help="mm to leave between panels")
+    parser.add_argument('--no-rotate', action='store_true', help="don't turn panels sideways")
+    parser.add_argument('--order-paths', action='store_true', help="order the cuts to keep laser travel short")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    try:
+        sheet_width, sheet_height = [float(v) for v in args.sheet.lower().split('x')]
+    except ValueError:
+        parser.error("--sheet must be a width and height in mm, like 600x400")
+    panels = []
+    for index, spec in enumerate(read_specs(args.specs)):
+        try:
+            params = spec_params(spec)
+        except ValueError as e:
+            logger.error("#{} can't be packed: {}".format(index, e))
+            return 1
+        panels += box_panels(params['width'], params['height'], params['depth'], params['material_thickness'],
+                             params['cut_width'], params['notch_length'], params['tray'],
+                             spec.get('name') or 'box-{:05d}'.format(index))
+    try:
+        sheets = pack(panels, sheet_width, sheet_height, args.margin, args.spacing, not args.no_rotate)
+    except ValueError as e:
+        logger.error(str(e))
+        return 1
+    os.makedirs(args.output_dir, exist_ok=True)
+    for number, sheet in enumerate(sheets, 1):
+        file_path = os.path.join(args.output_dir, 'sheet-{:03d}.{}'.format(number, FILE_EXTENSIONS[args.file_type]))
+        travel = sheet.render(file_path, args.file_type, args.order_paths)
+        logger.info("{} -> {} panels, {:.0%} used".format(file_path, len(sheet.placements), sheet.utilization()))
+        if travel:
+            logger.info("  travel between cuts {:.0f}mm -> {:.0f}mm".format(*travel))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
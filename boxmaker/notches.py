@@ -0,0 +1,61 @@
+# Notched edge geometry
+
+# Every edge of every face is the same square-wave pattern: notch_count steps of notch_width along the edge, alternating
+# between the two sides of a notch_height deep strip, with a connector across the strip between steps. The cut width
+# stretches the steps on one side and shrinks the ones on the other so the notches fit snugly. Rather than walking the
+# steps one at a time, this computes each coordinate column for the whole edge at once and interleaves them with slice
+# assignment. Scaling (ie. to points) is done to each column too, before they're interleaved, which multiplies about
+# half as many numbers as scaling the finished list and gives exactly the same floats.
+
+from itertools import accumulate, repeat
+
+
+def notched_edge(x0, y0, notch_width, notch_count, notch_height, cut_width, flip, smallside, vertical=False,
+                 scale=1.0):
+    """
+    Return the segments of one notched edge as a flat list of from_x, from_y, to_x, to_y values, in the order they
+    are cut, with every coordinate multiplied by scale. A horizontal edge runs along x starting at x0 and a vertical
+    one runs along y starting at y0. If flip is set the first step is on the far side of the strip; if smallside is
+    set the edge starts (and for vertical edges, ends) notch_height in from the corner.
+    """
+    count = int(notch_count)
+    if count <= 0:
+        return []
+    start, across = (y0, x0) if vertical else (x0, y0)
+    near, far = across, across+notch_height
+    # running sum rather than start+i*notch_width, to land on exactly the same floats as stepping along the edge
+    steps = list(accumulate(repeat(notch_width, count-1), initial=start))
+    step_ends = [s+notch_width for s in steps]
+    # even steps are stretched by the cut width at both ends, odd ones are shrunk
+    froms = [s-cut_width for s in steps]
+    froms[1::2] = [s+cut_width for s in steps[1::2]]
+    tos = [e+cut_width for e in step_ends]
+    tos[1::2] = [e-cut_width for e in step_ends[1::2]]
+    # the connectors sit where each step ends, before the first and last steps are trimmed
+    connectors = tos[:-1]
+    froms[0] = steps[0]+notch_height if smallside else steps[0]
+    if count > 1:
+        froms[-1] = steps[-1]-cut_width
+        if vertical and not smallside:
+            tos[-1] = step_ends[-1]
+        else:
+            tos[-1] = step_ends[-1]-notch_height
+    if scale != 1.0:
+        froms = [f*scale for f in froms]
+        tos = [t*scale for t in tos]
+        connectors = [c*scale for c in connectors]
+        near, far = near*scale, far*scale
+    sides = ([far, near] if flip else [near, far]) * ((count+1)//2)
+    del sides[count:]
+    # each step is a line along the edge and (except for the last) a connector across it
+    coords = [0.0] * (8*count-4)
+    if vertical:
+        coords[0::8], coords[1::8], coords[2::8], coords[3::8] = sides, froms, sides, tos
+        coords[4::8], coords[5::8] = repeat(far, count-1), connectors
+        coords[6::8], coords[7::8] = repeat(near, count-1), connectors
+    else:
+        coords[0::8], coords[1::8], coords[2::8], coords[3::8] = froms, sides, tos, sides
+        coords[4::8], coords[5::8] = connectors, repeat(far, count-1)
+        coords[6::8], coords[7::8] = connectors, repeat(near, count-1)
+    return coords
+
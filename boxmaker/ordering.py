@@ -0,0 +1,247 @@
+# Ordering cut paths to cut down on laser head travel
+
+# The joined paths come out in whatever order join_paths happened to build them, so the laser head can spend a lot of
+# time crossing the sheet with the beam off. order_paths picks a better order:
+#   1. Paths inside other closed paths are cut first, since cutting the outside first can let a piece shift.
+#   2. Within that, each next path is the one with the nearest place to start, found with a grid index over every
+#      point a path could start from. Open paths can be cut from either end and closed ones from any corner.
+#   3. A few passes of 2-opt then undo the worst crossings the greedy order leaves, trying only moves that join up
+#      paths that are close to each other (again from the grid) so each pass stays near linear.
+#   4. If that travels further than cutting the paths in the order given (inner ones first), which greedy choices can
+#      do when there are only a few paths, the given order is kept instead.
+#   5. Finally each closed path is started from whichever corner makes the trip in and out of it shortest.
+# Paths are lists of (x, y) tuples, as PathBuilder.join_paths leaves them, and closed ones end where they start.
+
+import math
+
+# how many nearby paths 2-opt considers joining each path to, and how many passes it makes at most
+NEIGHBOURS = 8
+MAX_PASSES = 5
+
+
+def travel_distance(paths, start=(0.0, 0.0)):
+    """ How far the head moves between paths (not along them) cutting paths in order, starting from start. """
+    distance = 0.0
+    x, y = start
+    for path in paths:
+        distance += math.hypot(path[0][0] - x, path[0][1] - y)
+        x, y = path[-1]
+    return distance
+
+
+def order_paths(paths, start=(0.0, 0.0)):
+    """ Return the paths in an order (and direction) that keeps travel between them short. """
+    levels = _nesting_levels(paths)
+    ordered = []
+    position = start
+    for level in levels:
+        level_paths = _nearest_neighbour(level, position)
+        _two_opt(level_paths, position)
+        ordered += level_paths
+        position = ordered[-1][-1]
+    # with only a few paths the greedy order can travel further than the one given, so never do worse than that
+    given = [path for level in levels for path in level]
+    if travel_distance(given, start) < travel_distance(ordered, start):
+        ordered = given
+    _best_start_points(ordered, start)
+    return ordered
+
+
+def _closed(path):
+    return len(path) > 2 and path[0] == path[-1]
+
+
+def _reversed(path):
+    return path[::-1]
+
+
+def _rotated(path, i):
+    # the same closed path, starting and ending at its i-th point
+    return path[i:-1] + path[:i] + [path[i]]
+
+
+def _bounds(path):
+    xs = [p[0] for p in path]
+    ys = [p[1] for p in path]
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+def _nesting_levels(paths):
+    """
+    Group paths by how many closed paths they sit inside (judged by bounding boxes), most deeply nested first. The
+    closed paths are put in a grid by the cells their bounds cover, so each path only checks the ones that could
+    possibly hold it.
+    """
+    if not paths:
+        return []
+    bounds = [_bounds(path) for path in paths]
+    closed = [i for i, path in enumerate(paths) if _closed(path)]
+    cell = _cell_size(bounds)
+    grid = {}
+    for i in closed:
+        x0, y0, x1, y1 = bounds[i]
+        for cx in range(int(x0 // cell), int(x1 // cell) + 1):
+            for cy in range(int(y0 // cell), int(y1 // cell) + 1):
+                grid.setdefault((cx, cy), []).append(i)
+    depths = []
+    for i, (x0, y0, x1, y1) in enumerate(bounds):
+        depth = 0
+        for j in grid.get((int(x0 // cell), int(y0 // cell)), ()):
+            outer = bounds[j]
+            if j != i and outer[0] < x0 and outer[1] < y0 and x1 < outer[2] and y1 < outer[3]:
+                depth += 1
+        depths.append(depth)
+    levels = {}
+    for path, depth in zip(paths, depths):
+        levels.setdefault(depth, []).append(path)
+    return [levels[depth] for depth in sorted(levels, reverse=True)]
+
+
+def _cell_size(bounds):
+    # about one path per cell
+    x0 = min([b[0] for b in bounds])
+    y0 = min([b[1] for b in bounds])
+    x1 = max([b[2] for b in bounds])
+    y1 = max([b[3] for b in bounds])
+    return max(math.sqrt((x1 - x0) * (y1 - y0) / len(bounds)), 1.0)
+
+
+class _Grid(object):
+    """ A uniform grid of points, each tagged with an item, that finds the nearest one and can drop items. """
+
+    def __init__(self, points, cell):
+        self.cell = cell
+        self._cells = {}
+        self._item_cells = {}
+        for x, y, item, tag in points:
+            key = (int(x // cell), int(y // cell))
+            self._cells.setdefault(key, []).append((x, y, item, tag))
+            self._item_cells.setdefault(item, set()).add(key)
+        self._size = len(self._cells)
+        keys = list(self._cells) or [(0, 0)]
+        self._span = max([max(abs(kx), abs(ky)) for kx, ky in keys]) * 2 + 2
+
+    def remove(self, item):
+        for key in self._item_cells.pop(item, ()):
+            remaining = [p for p in self._cells[key] if p[2] != item]
+            if remaining:
+                self._cells[key] = remaining
+            else:
+                del self._cells[key]
+
+    def nearest(self, x, y):
+        """ Return the (x, y, item, tag) nearest to x, y, or None if the grid is empty. """
+        cx, cy = int(x // self.cell), int(y // self.cell)
+        best, best_distance = None, float('inf')
+        radius = 0
+        while self._cells and radius <= self._span + max(abs(cx), abs(cy)):
+            for key in _ring(cx, cy, radius):
+                for point in self._cells.get(key, ()):
+                    distance = (point[0] - x) ** 2 + (point[1] - y) ** 2
+                    if distance < best_distance:
+                        best, best_distance = point, distance
+            # anything outside this ring is at least radius cells away
+            if best is not None and best_distance <= (radius * self.cell) ** 2:
+                break
+            radius += 1
+        return best
+
+    def near(self, x, y, count):
+        """ Return the items of roughly the count points nearest x, y (without removing anything). """
+        cx, cy = int(x // self.cell), int(y // self.cell)
+        found = []
+        radius = 0
+        while self._cells and len(found) < count and radius <= self._span + max(abs(cx), abs(cy)):
+            for key in _ring(cx, cy, radius):
+                found += [point[2] for point in self._cells.get(key, ())]
+            radius += 1
+        return found
+
+
+def _ring(cx, cy, radius):
+    if radius == 0:
+        yield cx, cy
+        return
+    for dx in range(-radius, radius + 1):
+        yield cx + dx, cy - radius
+        yield cx + dx, cy + radius
+    for dy in range(-radius + 1, radius):
+        yield cx - radius, cy + dy
+        yield cx + radius, cy + dy
+
+
+def _nearest_neighbour(paths, position):
+    # greedily cut whichever path can be started closest to where the head is
+    points = []
+    for i, path in enumerate(paths):
+        if _closed(path):
+            points += [(p[0], p[1], i, j) for j, p in enumerate(path[:-1])]
+        else:
+            points += [(path[0][0], path[0][1], i, 0), (path[-1][0], path[-1][1], i, -1)]
+    grid = _Grid(points, _cell_size([_bounds(path) for path in paths]))
+    ordered = []
+    while len(ordered) < len(paths):
+        _, _, i, j = grid.nearest(*position)
+        grid.remove(i)
+        path = paths[i]
+        if _closed(path):
+            path = _rotated(path, j)
+        elif j == -1:
+            path = _reversed(path)
+        ordered.append(path)
+        position = path[-1]
+    return ordered
+
+
+def _two_opt(paths, start):
+    """
+    Improve the order in place by reversing runs of paths (and the direction of each open path in them) wherever that
+    shortens the trip. For each path it only tries runs that would make it lead into one of its nearby paths.
+    """
+    count = len(paths)
+    if count < 3:
+        return
+
+    def exit_of(k):
+        return start if k < 0 else paths[k][-1]
+
+    def entry_of(k):
+        return paths[k][0] if k < count else None
+
+    for _ in range(MAX_PASSES):
+        grid = _Grid([(path[-1][0], path[-1][1], k, None) for k, path in enumerate(paths)],
+                     _cell_size([_bounds(path) for path in paths]))
+        improved = False
+        for i in range(count):
+            # try making the path before position i lead into the path at position j (reversing i..j)
+            a = exit_of(i - 1)
+            for j in grid.near(a[0], a[1], NEIGHBOURS):
+                if j <= i:
+                    continue
+                b, c, d = entry_of(i), exit_of(j), entry_of(j + 1)
+                before = _distance(a, b) + (_distance(c, d) if d is not None else 0.0)
+                after = _distance(a, c) + (_distance(b, d) if d is not None else 0.0)
+                if after < before - 1e-9:
+                    paths[i:j+1] = [path if _closed(path) else _reversed(path) for path in reversed(paths[i:j+1])]
+                    improved = True
+                    break
+        if not improved:
+            break
+
+
+def _best_start_points(paths, start):
+    # start each closed path at the corner closest to both where the head comes from and where it goes next
+    position = start
+    for k, path in enumerate(paths):
+        if _closed(path):
+            following = paths[k+1][0] if k + 1 < len(paths) else None
+            costs = [_distance(position, p) + (_distance(p, following) if following is not None else 0.0)
+                     for p in path[:-1]]
+            best = costs.index(min(costs))
+            if best:
+                paths[k] = path = _rotated(path, best)
+        position = path[-1]
+
+
+def _distance(a, b):
+    return math.hypot(a[0] - b[0], a[1] - b[1])
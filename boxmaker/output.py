@@ -0,0 +1,29 @@
+# Output targets for the document writers
+
+# Every writer can save either to a file name or to a binary file-like object (ie. an io.BytesIO that the web server
+# sends straight back). The text-based writers use open_text_output to get a text stream for either kind of target.
+
+import io
+
+
+def open_text_output(target):
+    """
+    Return a text stream that writes UTF-8 to target, which is a file name or a binary file-like object. Closing the
+    stream closes the file it opened, but leaves a caller's file-like object open so they can read it back.
+    """
+    if hasattr(target, 'write'):
+        return _BorrowedTextOutput(target)
+    return open(target, 'w', encoding='utf-8', newline='')
+
+
+class _BorrowedTextOutput(io.TextIOWrapper):
+
+    def __init__(self, stream):
+        super(_BorrowedTextOutput, self).__init__(stream, encoding='utf-8', newline='', write_through=True)
+        self._released = False
+
+    def close(self):
+        if not self._released:
+            self.flush()
+            self.detach()
+            self._released = True
@@ -1,40 +1,144 @@
-class Point(object):
-    """
-    Point is a class that keeps an x-y pair of possibly-floating-point values and allows approximate comparison of those
-    points by rounding them to only two decimal places without actually affecting their full precision.
-    """
-    def __init__(self, x, y):
-        self.x = x
-        self.y = y
+import math
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import deque
 
-    def __hash__(self):
-        return hash("{:.2f}{:.2f}".format(self.x, self.y))
+from boxmaker import ordering
 
-    def __eq__(self, other):
-        return self.__hash__() == other.__hash__()
+
+def quantize(v):
+    """
+    Round v to an integer number of hundredths, the same way "{:.2f}".format(v) would. Scaling by 100 can nudge a
+    value sitting right on a rounding boundary to the wrong side, so those rare cases fall back to exact rounding.
+    """
+    scaled = v * 100.0
+    q = round(scaled)
+    if abs(abs(scaled - q) - 0.5) < 1e-6:
+        q = round(round(v, 2) * 100.0)
+    return int(q)
 
 
 class PathBuilder(object):
     """
     The PathBuilder object collects a set of add_segment calls and then can reduce those to the
-    smallest set of connected paths, closing them if possible.
+    smallest set of connected paths, closing them if possible. Segments are kept in a flat array of
+    doubles (x0, y0, x1, y1 for each one) rather than as individual objects, so drawing code can fill
+    it in bulk with add_segments.
     """
     def __init__(self):
+        self.segments = array('d')
         self.paths = []
-        self.firsts = set()
 
     def add_segment(self, x0, y0, x1, y1):
-        p1 = Point(x0, y0)
-        p2 = Point(x1, y1)
-        # make a line segment
-        seg = [p1, p2]
-        # but if two segments are known to start with the same value, reverse the new one
-        if p1 in self.firsts:
-            seg = [p2, p1]
-        self.paths.append(seg)
-        # We may still have overlapping firsts but that's OK; we're just using this to
-        # accelerate some decision-making
-        self.firsts.add(seg[0])
+        self.segments.extend((x0, y0, x1, y1))
+
+    def add_segments(self, coords):
+        """ Add many segments at once from a flat sequence of x0, y0, x1, y1 values. """
+        self.segments.extend(coords)
+
+    def segment_count(self):
+        return len(self.segments) // 4
+
+    def remove_overlaps(self):
+        """
+        Drop the stretches of horizontal and vertical segments that lie on top of other collinear segments, so a line
+        shared by two pieces is only cut once, and drop repeats of any other segment. Returns the length removed.
+
+        Segments are grouped by the line they lie on (compared in hundredths, see quantize). Where a line's segments
+        overlap, it is split at every segment end and each piece between neighbouring ends is kept once if any
+        segment covers it. That is a sort per line, so the whole pass is O(n log n).
+        """
+        lines = {}  # ('h', rounded y) or ('v', rounded x) -> [(rounded start, start, rounded end, end, other coord)]
+        seen = set()
+        kept = array('d')
+        removed = 0.0
+        segs = self.segments
+        for i in range(0, len(segs), 4):
+            x0, y0, x1, y1 = segs[i], segs[i+1], segs[i+2], segs[i+3]
+            qx0, qy0, qx1, qy1 = quantize(x0), quantize(y0), quantize(x1), quantize(y1)
+            if qy0 == qy1 and qx0 != qx1:
+                span = (qx0, x0, qx1, x1) if qx0 < qx1 else (qx1, x1, qx0, x0)
+                lines.setdefault(('h', qy0), []).append(span + (y0,))
+            elif qx0 == qx1 and qy0 != qy1:
+                span = (qy0, y0, qy1, y1) if qy0 < qy1 else (qy1, y1, qy0, y0)
+                lines.setdefault(('v', qx0), []).append(span + (x0,))
+            else:
+                key = tuple(sorted(((qx0, qy0), (qx1, qy1))))
+                if key in seen:
+                    removed += math.hypot(x1 - x0, y1 - y0)
+                    continue
+                seen.add(key)
+                kept.extend((x0, y0, x1, y1))
+        for (axis, _), spans in lines.items():
+            pieces, line_removed = _line_pieces(spans)
+            removed += line_removed
+            for start, end, other in pieces:
+                kept.extend((start, other, end, other) if axis == 'h' else (other, start, other, end))
+        self.segments = kept
+        return removed
+
+    def crossings(self):
+        """
+        Count the places where segments cross each other, or lie on top of each other along a line, neither of which a
+        properly drawn box has. Segments meeting end to end, or one ending on another, don't count. Only horizontal
+        and vertical segments are checked, since those are all a box is made of.
+
+        Algorithm:
+            Group the horizontal and vertical segments by the line they lie on (compared in hundredths, see
+            quantize) and sort each line's segments by where they start; any that starts before an earlier one ends
+            overlaps it.
+            Then sweep across x, keeping a count of the horizontal segments the sweep is strictly inside of at each
+            height. At each x, drop the ones that end there, add up how many are strictly between each vertical
+            segment's ends, then add the ones that start there.
+        The counts are kept in a Fenwick tree over the heights, so each step is O(log n) and the whole pass is
+        O(n log n).
+        """
+        lines = {}  # ('h', rounded y) or ('v', rounded x) -> [(rounded start, rounded end)]
+        horizontal = []  # (rounded x0, rounded x1, rounded y) with x0 < x1
+        vertical = []  # (rounded x, rounded y0, rounded y1) with y0 < y1
+        segs = self.segments
+        for i in range(0, len(segs), 4):
+            qx0, qy0, qx1, qy1 = quantize(segs[i]), quantize(segs[i+1]), quantize(segs[i+2]), quantize(segs[i+3])
+            if qy0 == qy1 and qx0 != qx1:
+                span = (qx0, qx1) if qx0 < qx1 else (qx1, qx0)
+                lines.setdefault(('h', qy0), []).append(span)
+                horizontal.append(span + (qy0,))
+            elif qx0 == qx1 and qy0 != qy1:
+                span = (qy0, qy1) if qy0 < qy1 else (qy1, qy0)
+                lines.setdefault(('v', qx0), []).append(span)
+                vertical.append((qx0,) + span)
+        count = 0
+        for spans in lines.values():
+            spans.sort()
+            end = spans[0][1]
+            for start, span_end in spans[1:]:
+                if start < end:
+                    count += 1
+                end = max(end, span_end)
+        heights = sorted(set([y for _, _, y in horizontal]))
+        index = dict([(y, i) for i, y in enumerate(heights)])
+        # at each x, horizontal segments ending there go first (0), then vertical ones (1), then ones starting (2)
+        events = [(x1, 0, y, 0) for _, x1, y in horizontal] + [(x0, 2, y, 0) for x0, _, y in horizontal]
+        events += [(x, 1, y0, y1) for x, y0, y1 in vertical]
+        events.sort()
+        active = _FenwickTree(len(heights))
+        for _, kind, y0, y1 in events:
+            if kind == 0:
+                active.add(index[y0], -1)
+            elif kind == 2:
+                active.add(index[y0], 1)
+            else:
+                count += active.total(bisect_left(heights, y1)) - active.total(bisect_right(heights, y0))
+        return count
+
+    def order_paths(self, start=(0.0, 0.0)):
+        """
+        Reorder the joined paths to keep the laser head's travel between them short (see boxmaker.ordering), and
+        return the travel distance from start before and after.
+        """
+        before = ordering.travel_distance(self.paths, start)
+        self.paths = ordering.order_paths(self.paths, start)
+        return before, ordering.travel_distance(self.paths, start)
 
     def emit_paths(self, doc):
         """
@@ -42,55 +146,125 @@ class PathBuilder(object):
         on if the endpoints are the same point.
         """
         for p in self.paths:
-            pointsonly = [(pt.x, pt.y) for pt in p]
             if p[0] == p[-1]:
-                doc.drawClosedPath(pointsonly)
+                doc.drawClosedPath(p)
             else:
-                doc.drawOpenPath(pointsonly)
+                doc.drawOpenPath(p)
 
     def join_paths(self):
-        """ Call _join_paths_1 repeatedly until it doesn't change any more. """
-        while True:
-            count = len(self.paths)
-            paths = self._join_paths_1()
-            self.paths = paths
-            if len(paths) == count:
-                break
-
-    def _join_paths_1(self):
         """
-        Create a new copy of the paths that concatenates some of them together if they can be joined.
-        This doesn't attempt to find all paths, only to make the output list of paths shorter.
+        Concatenate the segments into the smallest set of connected paths in a single pass, leaving
+        them in self.paths as lists of (x, y) tuples.
 
         Algorithm:
-            While the list is not empty:
-                Pop the last path off the list.
-                Attempt to find a path elsewhere on the list to append it to, either as-is or reversed.
-                If found:
-                    remove the matching path from the input list,
-                    concatenate the other one
-                    put the combined result into the output.
-                Else:
-                    put the popped path into the output.
-            Return the new list
+            Keep an index from each open path end point to the path that ends there.
+            For each segment:
+                Look up both of its end points in the index.
+                If neither is found, start a new path.
+                If one is found, extend that path by the segment.
+                If both are found on the same path, close it (and drop it from the index).
+                If both are found on different paths, splice the shorter one onto the longer one.
+        Points are compared by their coordinates rounded to hundredths (see quantize), so every lookup
+        is a hash of two integers and each segment is merged in amortized constant time.
         """
-        oldpaths = self.paths[:]
-        newpaths = []
-        while len(oldpaths):
-            start = -1
-            it = oldpaths.pop()
-            for pi in range(len(oldpaths)):
-                if oldpaths[pi][-1] == it[0]:
-                    start = pi
-                    break
-                if oldpaths[pi][-1] == it[-1]:
-                    start = pi
-                    it.reverse()
-                    break
-            if start == -1:
-                newpaths.append(it)
+        coords = {}  # rounded point -> the full precision (x, y) first seen there
+        ends = {}  # rounded point -> open path (a deque of rounded points) that has an end there
+        joined = {}  # id(path) -> path, in order of creation so the output order is stable
+        segs = self.segments
+        for i in range(0, len(segs), 4):
+            x0, y0, x1, y1 = segs[i], segs[i+1], segs[i+2], segs[i+3]
+            p1 = (quantize(x0), quantize(y0))
+            p2 = (quantize(x1), quantize(y1))
+            coords.setdefault(p1, (x0, y0))
+            coords.setdefault(p2, (x1, y1))
+            head = ends.pop(p1, None)
+            tail = ends.pop(p2, None)
+            if head is None and tail is None:
+                path = deque((p1, p2))
+                joined[id(path)] = path
+                if p1 != p2:
+                    ends[p1] = path
+                    ends[p2] = path
+            elif head is tail:
+                # both ends meet the same path, so this segment closes it
+                _extend(head, p1, [p2])
+            elif tail is None:
+                _extend(head, p1, [p2])
+                ends[p2] = head
+            elif head is None:
+                _extend(tail, p2, [p1])
+                ends[p1] = tail
             else:
-                newpaths.append(oldpaths[start] + it[1:])
-                del oldpaths[start]
-        return newpaths
+                # bridge two paths; always copy the shorter one into the longer one
+                if len(head) < len(tail):
+                    head, tail, p1, p2 = tail, head, p2, p1
+                far = tail[0] if tail[-1] == p2 else tail[-1]
+                if tail[0] != p2:
+                    tail.reverse()
+                _extend(head, p1, tail)
+                ends[far] = head
+                del joined[id(tail)]
+        self.paths = [[coords[pt] for pt in path] for path in joined.values()]
+
+
+def _extend(path, end, points):
+    """ Add points onto whichever end of the path is at end, so points[0] is adjacent to it. """
+    if path[-1] == end:
+        path.extend(points)
+    else:
+        path.extendleft(points)
+
+
+def _line_pieces(spans):
+    """
+    Given (rounded start, start, rounded end, end, other coord) spans along one line, return the (start, end, other
+    coord) pieces that cover the same stretches of it just once, and how much overlapping length was dropped.
+    """
+    if len(spans) == 1:
+        return [(spans[0][1], spans[0][3], spans[0][4])], 0.0
+    coords = {}  # rounded position -> full precision position first seen there
+    depth = {}  # rounded position -> change in how many spans cover the line from there on
+    total = 0.0
+    for q0, v0, q1, v1, _ in spans:
+        coords.setdefault(q0, v0)
+        coords.setdefault(q1, v1)
+        depth[q0] = depth.get(q0, 0) + 1
+        depth[q1] = depth.get(q1, 0) - 1
+        total += v1 - v0
+    other = spans[0][4]
+    points = sorted(coords)
+    pieces = []
+    covered = 0.0
+    cover = 0
+    for q, next_q in zip(points, points[1:]):
+        cover += depth[q]
+        if cover > 0:
+            pieces.append((coords[q], coords[next_q], other))
+            covered += coords[next_q] - coords[q]
+    if total - covered < 1e-9:
+        # nothing overlapped, so keep the spans as they were
+        return [(v0, v1, o) for _, v0, _, v1, o in spans], 0.0
+    return pieces, total - covered
+
+
+class _FenwickTree(object):
+    """ Counts at positions 0..size-1 that can be changed, and summed over a prefix, in O(log n). """
+
+    def __init__(self, size):
+        self._tree = [0] * (size + 1)
+
+    def add(self, i, amount):
+        tree = self._tree
+        i += 1
+        while i < len(tree):
+            tree[i] += amount
+            i += i & -i
 
+    def total(self, end):
+        """ The sum of the counts at positions before end. """
+        tree = self._tree
+        result = 0
+        while end > 0:
+            result += tree[end]
+            end -= end & -end
+        return result
@@ -5,14 +5,24 @@
 # So instead of pdfs rendering directly to canvas.Canvas, we have specific drivers for different file types.
 # This file implements the pdf-specific rendering.
 
+import time
+
 from reportlab.pdfgen import canvas
 import reportlab.lib.colors as colors
-from string import Template
 
 class PDFDoc(object):
 
     def __init__(self, filename):
-        self.canvas = canvas.Canvas(filename)
+        # reportlab accepts either a file name or a binary file-like object here. In invariant mode it doesn't stamp the
+        # file with the time it was written or a random document ID, so the same drawing always gives the same bytes.
+        self.canvas = canvas.Canvas(filename, invariant=1)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        # nothing is written until save(), so there's nothing to close
+        pass
 
     def setPageSize(self, pageSize):
         self.canvas.setPageSize(pageSize)
@@ -21,7 +31,8 @@ class PDFDoc(object):
         self.canvas.setAuthor(author)
 
     def setStrokeColor(self, col):
-        self.canvas.setStrokeColor(col)
+        # col is a boxmaker.colors.Color, so convert it to the reportlab equivalent
+        self.canvas.setStrokeColor(colors.Color(col.red, col.green, col.blue))
 
     def setLineWidth(self, lw):
         self.canvas.setLineWidth(lw)
@@ -47,5 +58,8 @@ class PDFDoc(object):
             path.lineTo(pt[0], pt[1])
         self.canvas.drawPath(path)
 
-    def save(self):
+    def save(self, timestamp=None):
+        # timestamp (a time.struct_time) is recorded as the creation date; without one it's reportlab's fixed date
+        if timestamp is not None:
+            self.canvas.setDateFormatter(lambda *_: time.strftime('D:%Y%m%d%H%M%S', timestamp))
         self.canvas.save()
@@ -0,0 +1,152 @@
+# A bounded pool of processes for rendering boxes in the background
+
+# The web server hands renders off to this pool so a big box doesn't tie up a request worker's interpreter, and so the
+# number of renders in flight is capped. When the pool already has as many renders running or waiting as it allows,
+# submit raises RenderPoolFull right away (the server turns that into a 503) rather than letting requests pile up.
+# Other work that's too slow for a request thread, like working out a preview's geometry, goes through call, which
+# shares the same limits.
+#
+# The worker processes are started with forkserver (or spawn where that isn't available) rather than forked from the
+# server, since a fork of a process with other threads running can inherit a lock one of them held and hang on it. If a
+# worker dies (say the OOM killer takes it), the executor is broken for good and fails everything in flight, so it is
+# thrown away and a new one started.
+
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+import boxmaker
+from boxmaker import metrics
+
+
+class RenderPoolFull(Exception):
+    """ Raised when a render is submitted while the pool's queue is already full. """
+    pass
+
+
+class RenderTimeout(Exception):
+    """ Raised when a render doesn't finish within the pool's timeout. """
+    pass
+
+
+class RenderPool(object):
+    """
+    Renders boxes with boxmaker.render_bytes in up to workers processes, with at most queue_depth more renders
+    waiting for one of them. workers defaults to the number of cores. With workers=0 renders run in the calling thread
+    instead, which is handy for development.
+    """
+
+    def __init__(self, workers=None, queue_depth=8, timeout=30.0):
+        self.workers = workers if workers is not None else (os.cpu_count() or 1)
+        self.queue_depth = queue_depth
+        self.timeout = timeout
+        self._executor = None
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.restarted = 0
+
+    def render(self, *args, **kwargs):
+        """ Render in the pool and return the file contents, with the same arguments as boxmaker.render_bytes. """
+        if self.workers == 0:
+            return boxmaker.render_bytes(*args, **kwargs)
+        box_data, stats = self._run(_render_with_stats, (args, kwargs), {})
+        # the stats were recorded in the worker process, so pass them on to this process's listeners
+        for render_stats in stats:
+            render_stats.finish()
+        return box_data
+
+    def call(self, fn, *args, **kwargs):
+        """
+        Run fn(*args, **kwargs) in the pool and return what it returns, turned away and timed out just like a render.
+        fn, its arguments and what it returns all have to pickle, so fn must be a module-level function.
+        """
+        if self.workers == 0:
+            return fn(*args, **kwargs)
+        return self._run(fn, args, kwargs)
+
+    def submit(self, *args, **kwargs):
+        """ Start a render and return a Future for its (bytes, stats), or raise RenderPoolFull. """
+        return self._submit(_render_with_stats, (args, kwargs), {})
+
+    def stats(self):
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'queue_depth': self.queue_depth,
+                'in_flight': self._in_flight,
+                'rejected': self.rejected,
+                'timed_out': self.timed_out,
+                'restarted': self.restarted,
+            }
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    def _run(self, fn, args, kwargs):
+        try:
+            try:
+                return self._submit(fn, args, kwargs).result(timeout=self.timeout)
+            except BrokenProcessPool:
+                # a worker died while this was in flight, maybe over some other job, so give it one more go on the new
+                # executor _submit starts
+                return self._submit(fn, args, kwargs).result(timeout=self.timeout)
+        except TimeoutError:
+            # the process can't be interrupted, so it will finish this job before taking another one
+            with self._lock:
+                self.timed_out += 1
+            raise RenderTimeout("Rendering took more than {} seconds".format(self.timeout))
+
+    def _submit(self, fn, args, kwargs):
+        with self._lock:
+            if self._in_flight >= self.workers + self.queue_depth:
+                self.rejected += 1
+                raise RenderPoolFull("{} renders are already in progress".format(self._in_flight))
+            self._in_flight += 1
+        try:
+            executor = self._current_executor()
+            try:
+                future = executor.submit(fn, *args, **kwargs)
+            except BrokenProcessPool:
+                future = self._current_executor(broken=executor).submit(fn, *args, **kwargs)
+        except Exception:
+            self._release()
+            raise
+        future.add_done_callback(lambda _: self._release())
+        return future
+
+    def _current_executor(self, broken=None):
+        # the executor to submit to, replacing it if it's the broken one
+        with self._lock:
+            old = self._executor
+            if old is None or old is broken:
+                # started on first use, so that it is created after gunicorn forks its workers
+                self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=_start_context())
+                if old is not None:
+                    self.restarted += 1
+            executor = self._executor
+        if old is not None and old is broken:
+            old.shutdown(wait=False)
+        return executor
+
+    def _release(self):
+        with self._lock:
+            self._in_flight -= 1
+
+
+def _start_context():
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+
+
+def _render_with_stats(args, kwargs):
+    # runs in a worker process
+    with metrics.collecting() as stats:
+        box_data = boxmaker.render_bytes(*args, **kwargs)
+    return box_data, stats
@@ -0,0 +1,80 @@
+# Box geometry for drawing live previews
+
+# Changing a box's dimensions on the page shouldn't mean downloading a whole PDF just to see how it looks. These work
+# out a box's cut paths and notches the same way rendering does (see Box.geometry), without loading any document
+# writer, and pack the result up small for a browser to draw: either as compact JSON, or as one flat array of
+# little-endian 32-bit floats that can be read straight into a Float32Array. All sizes are in mm.
+#
+# The float array starts with the HEADER values, in order, then the number of points in each path, then the x, y
+# coordinates of every path's points one after another. The bounding box values are all zero when it isn't drawn.
+
+import json
+import sys
+from array import array
+
+from boxmaker.box import Box
+
+HEADER = ['page_width', 'page_height',
+          'width', 'height', 'depth',
+          'notch_count_w', 'notch_count_h', 'notch_count_d',
+          'notch_length_w', 'notch_length_h', 'notch_length_d',
+          'thickness',
+          'bounding_box_x', 'bounding_box_y', 'bounding_box_width', 'bounding_box_height',
+          'path_count']
+
+# coordinates are rounded to hundredths of a mm in JSON, which is plenty for drawing on a screen
+JSON_PRECISION = 2
+
+MEDIA_TYPES = {
+    'json': 'application/json',
+    'floats': 'application/octet-stream',
+}
+
+
+def box_geometry(width, height, depth, thickness, cut_width, notch_length, bounding_box=False, tray=False,
+                 common_line=False, order_paths=False):
+    """ Return Box.geometry for a box with these parameters (sizes in mm), as boxmaker.render would draw it. """
+    box = Box(None, width, height, depth, thickness, cut_width, notch_length, bounding_box, None, tray,
+              common_line=common_line, order_paths=order_paths)
+    return box.geometry()
+
+
+def preview_bytes(width, height, depth, thickness, cut_width, notch_length, bounding_box=False, tray=False,
+                  common_line=False, order_paths=False, preview_format='json'):
+    """
+    Return box_geometry encoded in preview_format. The server runs this in its render pool, which only has to pass the
+    bytes back rather than all the points.
+    """
+    return encode(box_geometry(width, height, depth, thickness, cut_width, notch_length, bounding_box, tray,
+                               common_line, order_paths), preview_format)
+
+
+def encode(geometry, preview_format='json'):
+    """ Return geometry as bytes in preview_format, one of MEDIA_TYPES. """
+    if preview_format == 'floats':
+        return geometry_floats(geometry)
+    return geometry_json(geometry)
+
+
+def geometry_json(geometry):
+    """
+    Return geometry as compact JSON, with each path flattened to x0, y0, x1, y1... and its coordinates rounded.
+    """
+    rounded = dict(geometry)
+    rounded['paths'] = [[round(c, JSON_PRECISION) for point in path for c in point] for path in geometry['paths']]
+    return json.dumps(rounded, separators=(',', ':')).encode('utf-8')
+
+
+def geometry_floats(geometry):
+    """ Return geometry as a flat array of little-endian 32-bit floats, laid out as described at the top. """
+    size, counts, lengths = geometry['size'], geometry['notch_count'], geometry['notch_length']
+    paths = geometry['paths']
+    values = array('f', list(geometry['page_size']) +
+                   [size['w'], size['h'], size['d'], counts['w'], counts['h'], counts['d'],
+                    lengths['w'], lengths['h'], lengths['d'], geometry['thickness']] +
+                   list(geometry['bounding_box'] or (0.0, 0.0, 0.0, 0.0)) +
+                   [len(paths)] + [len(path) for path in paths])
+    values.extend([c for path in paths for point in path for c in point])
+    if sys.byteorder != 'little':
+        values.byteswap()
+    return values.tobytes()
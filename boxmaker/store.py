@@ -0,0 +1,187 @@
+# A size- and age-bounded store of rendered box files on disk
+
+# The in-memory RenderCache is per process, so every gunicorn worker would otherwise render its own copy of each
+# popular box. This store keeps rendered files in a directory they all share (tmp/boxes by default). Files are written
+# to a temporary name and renamed into place, so a reader never sees a partial file, and are spread across
+# subdirectories by the first two characters of their key so no one directory gets huge. A background thread
+# periodically deletes files older than max_age and then the least recently used ones until the store fits in
+# max_bytes. Every process can run its own sweeper; they just race harmlessly to delete the same files. The keys include
+# the version of the code that rendered each file (see render_key), so after an upgrade the old files are never read
+# again and age out.
+
+import logging
+import os
+import tempfile
+import threading
+import time
+
+import boxmaker
+
+logger = logging.getLogger(__name__)
+
+TEMP_PREFIX = '.tmp-'
+
+# temporary files older than this were left behind by a writer that died before renaming them
+STALE_TEMP_SECONDS = 600
+
+
+class BoxStore(object):
+    """
+    Stores rendered files on disk keyed by render_key digests. Reads refresh a file's modification time, which the
+    sweeper uses as its last-used time.
+    """
+
+    def __init__(self, directory, max_bytes=256*1024*1024, max_age=7*24*60*60, sweep_interval=60):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.sweep_interval = sweep_interval
+        self._lock = threading.Lock()
+        self._sweeper = None
+        self._stopped = threading.Event()
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+        # as of the last sweep
+        self.files = 0
+        self.bytes = 0
+        self.last_sweep = None
+
+    def path(self, key):
+        return os.path.join(self.directory, key[:2], key)
+
+    def get(self, key):
+        """ Return the stored bytes for key, or None if there aren't any. """
+        self.start()
+        path = self.path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            os.utime(path)
+        except FileNotFoundError:
+            # missing, or evicted by a sweeper between the open and the utime
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return data
+
+    def put(self, key, data):
+        """ Atomically write data as key's file, replacing any earlier one. """
+        self.start()
+        if len(data) > self.max_bytes:
+            return
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(prefix=TEMP_PREFIX, dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        except Exception:
+            _remove(temp_path)
+            raise
+        with self._lock:
+            self.writes += 1
+
+    def __contains__(self, key):
+        return os.path.exists(self.path(key))
+
+    def sweep(self):
+        """ Delete expired files, then the least recently used ones until the store is within max_bytes. """
+        now = time.time()
+        entries = []
+        evicted = 0
+        for path, stat in self._scan():
+            age = now - stat.st_mtime
+            if os.path.basename(path).startswith(TEMP_PREFIX):
+                if age > STALE_TEMP_SECONDS:
+                    _remove(path)
+            elif age > self.max_age:
+                evicted += _remove(path)
+            else:
+                entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum([size for _, size, _ in entries])
+        if total > self.max_bytes:
+            entries.sort()
+            while entries and total > self.max_bytes:
+                _, size, path = entries.pop(0)
+                evicted += _remove(path)
+                total -= size
+        with self._lock:
+            self.evictions += evicted
+            self.files = len(entries)
+            self.bytes = total
+            self.last_sweep = now
+        if evicted:
+            logger.info("Evicted {} files from {}".format(evicted, self.directory))
+
+    def start(self):
+        """ Start the background sweeper thread, if it isn't running already. """
+        with self._lock:
+            if self._sweeper is not None:
+                return
+            # started on first use, so that each gunicorn worker gets its own after forking
+            self._sweeper = threading.Thread(target=self._sweep_periodically, name='box-store-sweeper', daemon=True)
+            self._sweeper.start()
+
+    def stop(self):
+        self._stopped.set()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'directory': self.directory,
+                'files': self.files,
+                'bytes': self.bytes,
+                'max_bytes': self.max_bytes,
+                'max_age': self.max_age,
+                'hits': self.hits,
+                'misses': self.misses,
+                'writes': self.writes,
+                'evictions': self.evictions,
+                'last_sweep': self.last_sweep,
+            }
+
+    def _sweep_periodically(self):
+        while not self._stopped.is_set():
+            try:
+                self.sweep()
+            except Exception:
+                logger.exception("Sweeping {} failed".format(self.directory))
+            self._stopped.wait(self.sweep_interval)
+
+    def _scan(self):
+        try:
+            shards = list(os.scandir(self.directory))
+        except FileNotFoundError:
+            return
+        for shard in shards:
+            if not shard.is_dir():
+                continue
+            try:
+                for entry in os.scandir(shard.path):
+                    try:
+                        yield entry.path, entry.stat()
+                    except FileNotFoundError:
+                        pass
+            except FileNotFoundError:
+                pass
+
+
+def store_from_env():
+    """ The BoxStore the server uses, as set up by BOX_STORE_DIR, BOX_STORE_MAX_BYTES and BOX_STORE_MAX_AGE. """
+    return BoxStore(os.getenv('BOX_STORE_DIR', os.path.join(boxmaker.base_dir, 'tmp', 'boxes')),
+                    max_bytes=int(os.getenv('BOX_STORE_MAX_BYTES', 256*1024*1024)),
+                    max_age=float(os.getenv('BOX_STORE_MAX_AGE', 7*24*60*60)))
+
+
+def _remove(path):
+    # returns how many files it removed, since another process may have beaten us to it
+    try:
+        os.remove(path)
+        return 1
+    except FileNotFoundError:
+        return 0
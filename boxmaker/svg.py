@@ -6,12 +6,17 @@
 
 # This system exists generate SVG files -- in particular to use with the Glowforge laser cutter. One thing that
 # makes using the Glowforge UI work better is for SVGs to use closed paths rather than a semi-random selection of
-# lines. Consequently, what this driver does is collect all of the line commands and record them; on the
-# save call it concatenates them together into a set of paths.
+# lines. Consequently, this driver expects to be handed whole paths (see PathBuilder) and writes each one out as a
+# single path element, straight to the output as it is drawn. The coordinates of a path are formatted together in one
+# go rather than one at a time.
 
+import gzip
 from string import Template
 
-tmpl_svg = Template("""<?xml version="1.0" encoding="UTF-8" standalone="no"?>
+from boxmaker.output import open_text_output
+from boxmaker.pathbuilder import quantize
+
+tmpl_svg_head = Template("""<?xml version="1.0" encoding="UTF-8" standalone="no"?>
 <!DOCTYPE svg PUBLIC "-//W3C//DTD SVG 1.1//EN" "http://www.w3.org/Graphics/SVG/1.1/DTD/svg11.dtd">
 <svg width="${point_width}pt" height="${point_height}pt" version="1.1"
     viewBox="0 0 ${point_width} ${point_height}"
@@ -20,12 +25,15 @@ tmpl_svg = Template("""<?xml version="1.0" encoding="UTF-8" standalone="no"?>
     xml:space="preserve"
     xmlns:serif="http://www.serif.com/"
     style="fill-rule:evenodd;clip-rule:evenodd;stroke-linecap:round;stroke-linejoin:round;stroke-miterlimit:1.5;">
-${contents}
-</svg>
 """)
 
-tmpl_path = Template("""        <path d="${path}" style="fill:none;stroke:${stroke_color};stroke-width:${stroke_pixels}px;"/>
-""")
+tmpl_svg_tail = """
+</svg>
+"""
+
+# plain % formatting, since this is used for every path
+tmpl_path = """        <path d="%s" style="fill:none;stroke:%s;stroke-width:%spx;"/>
+"""
 
 tmpl_rect = Template("""        <rect x="${x}" y="${y}" width="${w}" height="${h}"/>
 """)
@@ -37,15 +45,19 @@ class SVGDoc(object):
 
     def __init__(self, filename):
         self.comments = []
-        self.elements = []
-        self.paths = []
-        self.firsts = set()
         self.filename = filename
+        self.ofh = None
         self.stroke_color = "black"
         self.line_width = 0.5  # default is mm so we need to convert
         self.page_size = [0, 0]
         self.author = ''
 
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
     def setPageSize(self, page_size):
         self.page_size = page_size
 
@@ -63,42 +75,48 @@ class SVGDoc(object):
         self.comments.append((x, y, st))
 
     def rect(self, x, y, w, h):
-        self.elements.append(tmpl_rect.substitute(dict(x=self._sc(x), y=self._sc(y), w=self._sc(w), h=self._sc(h))))
+        self._write(tmpl_rect.substitute(dict(x=self._sc(x), y=self._sc(y), w=self._sc(w), h=self._sc(h))))
 
     def drawClosedPath(self, p):
-        s = "M{},{}".format(self._sc(p[0][0]), self._sc(p[0][1]))
-        s += ''.join(["L{},{}".format(self._sc(pt[0]), self._sc(pt[1])) for pt in p[1:-1]])
-        s += 'Z'
-        self.elements.append(tmpl_path.substitute(dict(
-            path=s,
-            stroke_color=self._col(self.stroke_color),
-            stroke_pixels=self._sc(self.line_width)
-            )))
+        self._write(tmpl_path % (self._path_data(p[:-1]) + 'Z', self._col(self.stroke_color),
+                                 self._sc(self.line_width)))
 
     def drawOpenPath(self, p):
-        s = "M{},{}".format(self._sc(p[0][0]), self._sc(p[0][1]))
-        s += ''.join(["L{},{}".format(self._sc(pt[0]), self._sc(pt[1])) for pt in p[1:]])
-        self.elements.append(tmpl_path.substitute(dict(
-            path=s,
-            stroke_color=self._col(self.stroke_color),
-            stroke_pixels=self._sc(self.line_width)
-            )))
-
-    def save(self):
-        s = ''.join([e for e in self.elements])
-        pgw, pgh = self._sc(self.page_size[0]), self._sc(self.page_size[1])
-        # To support different DPI viewers, we shoudl encode the page size in points, not pixels.  This makes it work
-        #  in both InkScape and Illustrator.
-        svg = tmpl_svg.substitute(dict(
-            point_width=self._pixel_to_point(pgw),
-            point_height=self._pixel_to_point(pgh),
-            contents=s))
-        ofh = open(self.filename, 'w')
-        ofh.write(svg)
-        ofh.close()
+        self._write(tmpl_path % (self._path_data(p), self._col(self.stroke_color), self._sc(self.line_width)))
+
+    def save(self, timestamp=None):
+        # SVG has no creation date to record, so timestamp is ignored
+        self._write(tmpl_svg_tail)
+        self.close()
+
+    def close(self):
+        # the output isn't opened until something is drawn
+        if self.ofh is not None:
+            self.ofh.close()
 
     # end public API
 
+    def _write(self, text):
+        if self.ofh is None:
+            # the page size is known by the time anything is drawn, so now we can start the file
+            self.ofh = self._open_output()
+            pgw, pgh = self._sc(self.page_size[0]), self._sc(self.page_size[1])
+            # To support different DPI viewers, we shoudl encode the page size in points, not pixels.  This makes it
+            #  work in both InkScape and Illustrator.
+            self.ofh.write(tmpl_svg_head.substitute(dict(
+                point_width=self._pixel_to_point(pgw),
+                point_height=self._pixel_to_point(pgh))))
+        self.ofh.write(text)
+
+    def _open_output(self):
+        return open_text_output(self.filename)
+
+    @staticmethod
+    def _path_data(points):
+        # an absolute move to the first point and then absolute lines to the rest, formatted all at once
+        coords = [c for pt in points for c in pt]
+        return ('M%.2f,%.2f' + 'L%.2f,%.2f' * (len(points)-1)) % tuple(coords)
+
     @staticmethod
     def _sc(v):
         # converts from mm to pixels as a numeric string
@@ -106,9 +124,73 @@ class SVGDoc(object):
 
     @staticmethod
     def _col(color):
-        # generates a CSS color from a reportlab color
+        # generates a CSS color from a boxmaker.colors.Color
         return '#'+color.hexval()[2:]
 
     @staticmethod
     def _pixel_to_point(pixels):
         return "{:.2f}".format(float(pixels) * PIXEL_TO_POINT)
+
+
+class CompactSVGDoc(SVGDoc):
+    """
+    Writes smaller path data by using relative line commands (l, or h and v for the horizontal and vertical lines that
+    make up almost all of a box) and dropping trailing zeros. The deltas are taken between the rounded absolute
+    coordinates, so the points land exactly where SVGDoc would put them and rounding never accumulates along a path.
+    """
+
+    @staticmethod
+    def _path_data(points):
+        qx, qy = quantize(points[0][0]), quantize(points[0][1])
+        commands = ['M', _short(qx), ',', _short(qy)]
+        for pt in points[1:]:
+            x, y = quantize(pt[0]), quantize(pt[1])
+            dx, dy = x-qx, y-qy
+            if dy == 0:
+                commands += ('h', _short(dx))
+            elif dx == 0:
+                commands += ('v', _short(dy))
+            else:
+                commands += ('l', _short(dx), ',', _short(dy))
+            qx, qy = x, y
+        return ''.join(commands)
+
+    def drawClosedPath(self, p):
+        self._write(tmpl_path % (self._path_data(p[:-1]) + 'z', self._col(self.stroke_color),
+                                 self._sc(self.line_width)))
+
+
+def _short(hundredths):
+    # format an integer number of hundredths as a decimal with no trailing zeros
+    sign = '-' if hundredths < 0 else ''
+    whole, frac = divmod(abs(hundredths), 100)
+    if frac == 0:
+        return sign + str(whole)
+    return sign + ('%d.%02d' % (whole, frac)).rstrip('0')
+
+
+class SVGZDoc(SVGDoc):
+    """
+    Writes the same SVG gzip-compressed, as an .svgz file. The gzip header's timestamp is left at zero so the same box
+    always gives the same bytes.
+    """
+
+    def __init__(self, filename):
+        super(SVGZDoc, self).__init__(filename)
+        self._gzip = None
+        self._file = None
+
+    def close(self):
+        super(SVGZDoc, self).close()
+        if self._gzip is not None:
+            self._gzip.close()
+        if self._file is not None:
+            self._file.close()
+
+    def _open_output(self):
+        if hasattr(self.filename, 'write'):
+            target = self.filename
+        else:
+            target = self._file = open(self.filename, 'wb')
+        self._gzip = gzip.GzipFile(fileobj=target, mode='wb', mtime=0)
+        return open_text_output(self._gzip)
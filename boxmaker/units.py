@@ -0,0 +1,7 @@
+# Units of measure, in points (1/72 inch), which is what the document writers work in.
+
+# These are computed exactly the way reportlab.lib.units does, so the numbers match to the last bit without having to
+# import reportlab just to get a constant.
+inch = 72.0
+cm = inch / 2.54
+mm = cm * 0.1
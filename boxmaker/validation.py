@@ -0,0 +1,70 @@
+# Checking box parameters before rendering
+
+# Parameters that parse as numbers can still describe a box that can't be cut: a negative size, material thicker than
+# the notches are long, or a cut width so wide that the notches run into each other. Rendering those takes as long as
+# any other box and produces nonsense, so box_errors works out the notch counts and lengths the same way rendering
+# does (see Box.dimensions) and checks them against what each notched edge needs, which takes microseconds. Each
+# edge needs:
+#   - at least three notches, since an edge with only one is a straight line that runs across the corners
+#   - notches longer than the material is thick (plus half the cut width), or the notch at each corner has no length
+#     left once the corner is taken out of it
+#   - notches longer than the cut width, or the cut width widens each notch over its neighbours
+# With check_cuts it also draws the box and sweeps over the cuts for any that cross or overlap (see
+# PathBuilder.crossings), which catches anything these rules miss in O(n log n).
+
+import math
+
+from boxmaker.box import Box
+
+# more notches than this along one edge make a file of many megabytes that takes seconds to render, which is never
+# what was meant
+MAX_NOTCHES = 10000
+
+# an edge with fewer notches than this doesn't hold the corners together; earlier versions rendered such boxes anyway
+# (a 1in side with 15/32in notches came out with a single notch, a plain straight edge), but they're turned away now
+MIN_NOTCHES = 3
+
+SIDE_NAMES = {'w': 'width', 'h': 'height', 'd': 'depth'}
+
+
+def box_errors(width, height, depth, thickness, cut_width, notch_length, tray=False, common_line=False,
+               check_cuts=False):
+    """
+    Return a list of the reasons a box with these parameters (sizes in mm) can't be made, which is empty if it can.
+    """
+    values = [('Width', width), ('Height', height), ('Depth', depth), ('Material thickness', thickness),
+              ('Cut width', cut_width), ('Notch length', notch_length)]
+    errors = []
+    for name, value in values:
+        if not math.isfinite(value):
+            errors.append(name + " must be a number!")
+        elif value < 0 or (value == 0 and name != 'Cut width'):
+            errors.append(name + (" can't be negative!" if name == 'Cut width' else " must be more than zero!"))
+    if errors:
+        return errors
+    box = Box(None, width, height, depth, thickness, cut_width, notch_length, False, None, tray,
+              common_line=common_line)
+    dimensions = box.dimensions()
+    # with common-line cutting the notches aren't offset by the cut width (see Box._draw_horizontal_line)
+    kerf = 0.0 if common_line else cut_width
+    for side in ['w', 'd', 'h']:
+        name = SIDE_NAMES[side]
+        count = dimensions['notch_count'][side]
+        length = dimensions['notch_length'][side]
+        if count < MIN_NOTCHES:
+            errors.append("The {} is too short for notches that long: it only has room for {}, and every side needs "
+                          "at least {} to hold the corners together. Try shorter notches!".format(
+                              name, int(count), MIN_NOTCHES))
+        elif count > MAX_NOTCHES:
+            errors.append("The {} would need more than {} notches; try longer ones!".format(name, MAX_NOTCHES))
+        elif length <= thickness + kerf/2.0:
+            errors.append("The notches along the {} must be longer than the material is thick, plus half the cut "
+                          "width!".format(name))
+        elif length <= kerf:
+            errors.append("The notches along the {} would overlap with a cut width that wide!".format(name))
+    if check_cuts and not errors:
+        box.geometry()
+        crossings = box.paths.crossings()
+        if crossings:
+            errors.append("The cuts would cross or overlap each other in {} places!".format(crossings))
+    return errors
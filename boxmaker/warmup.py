@@ -0,0 +1,144 @@
+# Rendering the most popular boxes ahead of time
+
+# A large share of requests are for the form's default box (4 x 5 x 6 inches in 3/16" material) and a few other
+# standard sizes, and every worker would otherwise render each of them on demand. When gunicorn starts, its when_ready
+# hook (see gunicorn.conf.py) calls start_from_env, which hands a list of specs to a background process that renders
+# each one in every file type into the shared BoxStore, under the same keys the server looks up (and, like the server,
+# leaving the time off them), so requests for them are just a read from disk. Files already in the store are left alone;
+# the keys include the code version, so those were rendered by this version too. A lock file keeps two warm-ups of the
+# same store from doing the same work. It can also be run at deploy time, against the same store directory:
+#   python -m boxmaker.warmup --specs popular.csv --store-dir tmp/boxes
+
+import argparse
+import csv
+import logging
+import multiprocessing
+import os
+import sys
+import time
+
+try:
+    import fcntl
+except ImportError:  # not on Windows, where every worker just warms up the store itself
+    fcntl = None
+
+import boxmaker
+from boxmaker.batch import read_specs, spec_params
+from boxmaker.cache import render_key
+from boxmaker.store import BoxStore, store_from_env
+
+logger = logging.getLogger(__name__)
+
+# the specs as the form submits them (its defaults, with the notch length it fills in from the thickness), so their
+# keys match; width, depth and height are in that order on the form
+DEFAULT_SPECS = [
+    {'units': 'in', 'width': '4', 'depth': '5', 'height': '6', 'material_thickness': '0.1875', 'cut_width': '0',
+     'notch_length': '0.46875'},
+    {'units': 'in', 'width': '4', 'depth': '5', 'height': '6', 'material_thickness': '0.125', 'cut_width': '0',
+     'notch_length': '0.3125'},
+    {'units': 'in', 'width': '4', 'depth': '5', 'height': '6', 'material_thickness': '0.25', 'cut_width': '0',
+     'notch_length': '0.625'},
+    {'units': 'in', 'width': '2', 'depth': '2', 'height': '2', 'material_thickness': '0.1875', 'cut_width': '0',
+     'notch_length': '0.46875'},
+    {'units': 'mm', 'width': '100', 'depth': '100', 'height': '100', 'material_thickness': '3', 'cut_width': '0',
+     'notch_length': '7.5'},
+]
+
+# specs without a file_type are rendered in each of these
+FILE_TYPES = ['pdf', 'svg', 'dxf']
+
+LOCK_FILE = '.warmup.lock'
+
+
+def warm_store(store, specs=None, file_types=None):
+    """
+    Render each spec (see boxmaker.batch) into store, once for each of file_types unless the spec names its own file
+    type, skipping the ones already there. Returns how many files were rendered. A spec that fails is logged and
+    skipped.
+    """
+    specs = DEFAULT_SPECS if specs is None else specs
+    file_types = file_types or FILE_TYPES
+    rendered = 0
+    for spec in specs:
+        for file_type in ([spec['file_type']] if spec.get('file_type') else file_types):
+            try:
+                params = spec_params(dict(spec, file_type=file_type))
+                key = render_key(params['width'], params['height'], params['depth'], params['material_thickness'],
+                                 params['cut_width'], params['notch_length'], params['bounding_box'], file_type,
+                                 params['tray'], params['common_line'], params['order_paths'])
+                if key in store:
+                    continue
+                store.put(key, boxmaker.render_bytes(params['width'], params['height'], params['depth'],
+                                                     params['material_thickness'], params['cut_width'],
+                                                     params['notch_length'], params['bounding_box'], file_type,
+                                                     params['tray'], timestamp=False,
+                                                     common_line=params['common_line'],
+                                                     order_paths=params['order_paths']))
+                rendered += 1
+            except Exception as e:
+                logger.warning("Couldn't pre-render {} as {}: {}".format(spec, file_type, e))
+    return rendered
+
+
+def start(directory, specs=None, file_types=None, max_bytes=256*1024*1024):
+    """
+    Warm up the store in directory from a background process, so startup isn't held up, and return the process.
+    """
+    process = multiprocessing.Process(target=_warm_up, args=(directory, specs, file_types, max_bytes),
+                                      name='box-store-warmup', daemon=True)
+    process.start()
+    return process
+
+
+def start_from_env():
+    """
+    Warm up the store the server uses (see store_from_env) with the specs in BOX_WARMUP_SPECS, or the defaults, unless
+    BOX_WARMUP is 0. Returns the process, or None if it wasn't started. A specs file that can't be read is logged and
+    the warm-up skipped, since the server is fine without it.
+    """
+    if os.getenv('BOX_WARMUP', '1') == '0':
+        return None
+    specs = None
+    if os.getenv('BOX_WARMUP_SPECS'):
+        try:
+            specs = read_specs(os.environ['BOX_WARMUP_SPECS'])
+        except (OSError, ValueError, csv.Error) as e:
+            logger.error("Not warming up the box store, couldn't read {}: {}".format(os.environ['BOX_WARMUP_SPECS'], e))
+            return None
+    store = store_from_env()
+    return start(store.directory, specs, max_bytes=store.max_bytes)
+
+
+def _warm_up(directory, specs=None, file_types=None, max_bytes=256*1024*1024):
+    # runs in the background process; whichever worker gets the lock first does the work and the rest give up
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, LOCK_FILE), 'w') as lock:
+        if fcntl is not None:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                logger.debug("Another process is already warming up {}".format(directory))
+                return
+        start_time = time.time()
+        # the serving processes sweep the store, so this one doesn't need to
+        store = BoxStore(directory, max_bytes=max_bytes)
+        store.stop()
+        rendered = warm_store(store, specs, file_types)
+        logger.info("Pre-rendered {} files into {} in {:.1f}s".format(rendered, directory, time.time() - start_time))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pre-render popular boxes into the on-disk box store.")
+    parser.add_argument('--specs', help="a .csv or .jsonl file of specs (default: the form defaults and a few standard "
+                                        "sizes)")
+    parser.add_argument('--store-dir', default=os.path.join('tmp', 'boxes'))
+    parser.add_argument('-t', '--file-type', action='append', dest='file_types',
+                        help="a file type to render specs without one in (can be repeated; default pdf, svg and dxf)")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    _warm_up(args.store_dir, read_specs(args.specs) if args.specs else None, args.file_types)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
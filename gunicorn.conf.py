@@ -0,0 +1,9 @@
+# gunicorn settings and server hooks (the Procfile runs gunicorn with -c gunicorn.conf.py)
+
+from boxmaker import warmup
+
+
+def when_ready(server):
+    # runs once in the master process before any workers start, so the popular boxes are rendered into the box store
+    # once, in the background, rather than by every worker or whenever something imports the app
+    warmup.start_from_env()
@@ -1 +1 @@
-gunicorn server:app
\ No newline at end of file
+gunicorn -c gunicorn.conf.py --worker-class gthread --threads 8 server:app
\ No newline at end of file
@@ -1,15 +1,43 @@
 import logging
 import os
 import datetime
-from flask import Flask, render_template, request, send_from_directory
+import hashlib
+from flask import Flask, Response, render_template, request, jsonify
 
 import boxmaker
 import boxmaker.ads
+from boxmaker import compression, preview, validation
+from boxmaker.batch import flag, spec_params
+from boxmaker.box import FILE_EXTENSIONS
+from boxmaker.cache import RenderCache, SingleFlight, render_key
+from boxmaker.metrics import PrometheusMetrics, add_listener
+from boxmaker.pool import RenderPool, RenderPoolFull, RenderTimeout
+from boxmaker.store import store_from_env
 
 app = Flask(__name__)
 
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-BOX_TMP_DIR = os.path.join(BASE_DIR, 'tmp', 'boxes')
+# keep recently rendered files in memory, so popular sizes don't get rendered over and over
+render_cache = RenderCache(max_bytes=int(os.getenv('RENDER_CACHE_MAX_BYTES', 64*1024*1024)),
+                           max_entries=int(os.getenv('RENDER_CACHE_MAX_ENTRIES', 1024)))
+# compressed copies of those files, and previews, are cached separately, so render_cache's hit rate still says how
+# often a rendered file is reused
+compressed_cache = RenderCache(max_bytes=int(os.getenv('COMPRESSED_CACHE_MAX_BYTES', 32*1024*1024)))
+preview_cache = RenderCache(max_bytes=int(os.getenv('PREVIEW_CACHE_MAX_BYTES', 16*1024*1024)))
+# and on disk, where every worker can see them, with old and rarely used files cleaned up in the background
+# (gunicorn.conf.py renders the most popular boxes into it when the server starts)
+render_store = store_from_env()
+# and if several requests for the same box come in at once, only render it once
+render_flights = SingleFlight()
+
+# render in a separate pool of processes, turning requests away once too many are waiting
+render_pool = RenderPool(workers=int(os.environ['RENDER_WORKERS']) if 'RENDER_WORKERS' in os.environ else None,
+                         queue_depth=int(os.getenv('RENDER_QUEUE_DEPTH', 8)),
+                         timeout=float(os.getenv('RENDER_TIMEOUT', 30)))
+RETRY_AFTER_SECONDS = 5
+
+# time every render so we can see where the time goes under load (see /metrics)
+render_metrics = PrometheusMetrics()
+add_listener(render_metrics)
 
 # setup logging
 logging.basicConfig(level=logging.INFO)
@@ -30,22 +58,20 @@ def index():
             notched_top = request.form['notched_top'] == '1'
             box_name = _box_name(file_type)
             logger.debug('Creating box '+box_name+"...")
-            # convert it to millimeters
-            measurements = ['width', 'height', 'depth', 'material_thickness', 'cut_width', 'notch_length']
-            conversion = 1.0
-            if request.form['units'] == 'in':
-                conversion = 25.4
-            elif request.form['units'] == 'cm':
-                conversion = 10.0
-            params = {}
-            for key in measurements:
-                params[key] = float(request.form[key])*conversion
-            # and add bounding box option
-            params['bounding_box'] = True if 'bounding_box' in request.form else False
+            params = _form_box_params()
+            compressed = 'compressed' in request.form
             # now render it
             logger.info(request.remote_addr + " - " + box_name)
-            _render_box(box_name, file_type, params, notched_top)
-            return send_from_directory(BOX_TMP_DIR, box_name, as_attachment=True)
+            try:
+                box_data = _cached_render_box(file_type, params, notched_top)
+            except RenderPoolFull:
+                logger.warning("Render pool full, turning away "+box_name)
+                return render_template('home.html', error="The server is busy right now, please try again."), \
+                    503, {'Retry-After': str(RETRY_AFTER_SECONDS)}
+            except RenderTimeout:
+                logger.warning("Render timed out for "+box_name)
+                return render_template('home.html', error="It took too long to draw that box."), 503
+            return _box_response(box_data, file_type, box_name, compressed)
     else:
         return render_template("home.html",
                                boxmaker_version=boxmaker.APP_VERSION,
@@ -55,17 +81,276 @@ def index():
                                )
 
 
-def _render_box(file_name, file_type, params, notched_top):
-    out_file_path = os.path.join(BOX_TMP_DIR, file_name)
-    boxmaker.render(out_file_path,
-                    params['width'], params['height'], params['depth'],
-                    params['material_thickness'], params['cut_width'], params['notch_length'],
-                    params['bounding_box'], file_type, not notched_top
-                    )
+MIME_TYPES = {
+    'pdf': 'application/pdf',
+    'svg': 'image/svg+xml',
+    # an svgz file is gzip through and through, so it's sent as plain bytes; sending it as SVG with a gzip
+    # Content-Encoding would have clients that decode transparently save plain SVG under the .svgz name
+    'svgz': 'application/octet-stream',
+    'dxf': 'application/dxf',
+}
+
+# the file types that are worth compressing for transfer (pdf and svgz are compressed already)
+COMPRESSIBLE = ['svg', 'dxf']
+
+RESPONSE_CHUNK_BYTES = 64*1024
+
+
+@app.route("/api/v1/render", methods=['POST'])
+def api_render():
+    """
+    Render a box described by a JSON object with the same fields as the form (width, height, depth,
+    material_thickness, cut_width, notch_length, units, file_type, bounding_box, tray, common_line and order_paths).
+    Responds with the file and a strong ETag of its contents, or just the JSON description of the file if "response" is
+    "hash". If "compressed" is true an SVG or DXF file comes gzipped, as a .gz download. Boxes that can't be cut are
+    turned away with a 400; "check_cuts": true also draws the box first and turns it away if any of its cuts cross.
+    """
+    spec = request.get_json(silent=True)
+    if not isinstance(spec, dict):
+        return jsonify(errors=["Expected a JSON object describing the box"]), 400
+    try:
+        params = spec_params(spec)
+    except ValueError as e:
+        return jsonify(errors=[str(e)]), 400
+    file_type = params['file_type']
+    try:
+        errors = _box_errors(params, params['tray'], flag(spec.get('check_cuts')))
+        if errors:
+            return jsonify(errors=errors), 400
+        box_data = _cached_render_box(file_type, params, not params['tray'])
+    except RenderPoolFull:
+        return jsonify(errors=["The server is busy right now, please try again."]), 503, \
+            {'Retry-After': str(RETRY_AFTER_SECONDS)}
+    except RenderTimeout:
+        return jsonify(errors=["It took too long to draw that box."]), 503
+    etag = hashlib.sha256(box_data).hexdigest()
+    if spec.get('response') == 'hash':
+        return jsonify(sha256=etag, bytes=len(box_data), file_type=file_type)
+    download_name = 'box-{}.{}'.format(etag[:12], FILE_EXTENSIONS[file_type])
+    return _box_response(box_data, file_type, download_name, flag(spec.get('compressed')), etag)
+
+
+@app.route("/api/v1/preview", methods=['POST'])
+def api_preview():
+    """
+    Work out the cut paths, notch counts and notch lengths of a box described the same way as for /api/v1/render,
+    without making a file, for drawing a preview. Responds with JSON, or with a flat array of 32-bit floats if
+    "format" is "floats" (see boxmaker.preview for the layout).
+    """
+    spec = request.get_json(silent=True)
+    if not isinstance(spec, dict):
+        return jsonify(errors=["Expected a JSON object describing the box"]), 400
+    preview_format = spec.get('format') or 'json'
+    if not isinstance(preview_format, str) or preview_format not in preview.MEDIA_TYPES:
+        return jsonify(errors=["Unknown format '{}'".format(preview_format)]), 400
+    try:
+        params = spec_params(spec)
+    except ValueError as e:
+        return jsonify(errors=[str(e)]), 400
+    # cached like renders (though not with them), and worked out in the render pool since a box with many notches
+    # takes a while
+    key = _render_key('preview.' + preview_format, params, not params['tray'])
+    try:
+        errors = _box_errors(params, params['tray'], flag(spec.get('check_cuts')))
+        if errors:
+            return jsonify(errors=errors), 400
+        body = preview_cache.get(key)
+        if body is None:
+            body = render_flights.do(key, lambda: _preview_and_cache_box(key, params, preview_format))
+    except RenderPoolFull:
+        return jsonify(errors=["The server is busy right now, please try again."]), 503, \
+            {'Retry-After': str(RETRY_AFTER_SECONDS)}
+    except RenderTimeout:
+        return jsonify(errors=["It took too long to work out that box."]), 503
+    return Response(body, mimetype=preview.MEDIA_TYPES[preview_format])
+
+
+@app.route("/cache-stats")
+def cache_stats():
+    stats = render_cache.stats()
+    stats.update(compressed=compressed_cache.stats(), previews=preview_cache.stats())
+    return jsonify(stats)
+
+
+@app.route("/store-stats")
+def store_stats():
+    return jsonify(render_store.stats())
+
+
+@app.route("/pool-stats")
+def pool_stats():
+    return jsonify(render_pool.stats())
+
+
+@app.route("/metrics")
+def metrics():
+    cache = render_cache.stats()
+    compressed = compressed_cache.stats()
+    previews = preview_cache.stats()
+    store = render_store.stats()
+    lines = [
+        '# HELP boxmaker_render_cache_lookups_total Render cache lookups, by result.',
+        '# TYPE boxmaker_render_cache_lookups_total counter',
+        'boxmaker_render_cache_lookups_total{{result="hit"}} {}'.format(cache['hits']),
+        'boxmaker_render_cache_lookups_total{{result="miss"}} {}'.format(cache['misses']),
+        '# HELP boxmaker_render_cache_bytes Size of the rendered files held in the cache.',
+        '# TYPE boxmaker_render_cache_bytes gauge',
+        'boxmaker_render_cache_bytes {}'.format(cache['bytes']),
+        '# HELP boxmaker_compressed_cache_lookups_total Lookups of compressed copies of rendered files, by result.',
+        '# TYPE boxmaker_compressed_cache_lookups_total counter',
+        'boxmaker_compressed_cache_lookups_total{{result="hit"}} {}'.format(compressed['hits']),
+        'boxmaker_compressed_cache_lookups_total{{result="miss"}} {}'.format(compressed['misses']),
+        '# HELP boxmaker_preview_cache_lookups_total Preview cache lookups, by result.',
+        '# TYPE boxmaker_preview_cache_lookups_total counter',
+        'boxmaker_preview_cache_lookups_total{{result="hit"}} {}'.format(previews['hits']),
+        'boxmaker_preview_cache_lookups_total{{result="miss"}} {}'.format(previews['misses']),
+        '# HELP boxmaker_box_store_lookups_total On-disk store lookups, by result.',
+        '# TYPE boxmaker_box_store_lookups_total counter',
+        'boxmaker_box_store_lookups_total{{result="hit"}} {}'.format(store['hits']),
+        'boxmaker_box_store_lookups_total{{result="miss"}} {}'.format(store['misses']),
+        '# HELP boxmaker_box_store_bytes Size of the files in the on-disk store, as of its last sweep.',
+        '# TYPE boxmaker_box_store_bytes gauge',
+        'boxmaker_box_store_bytes {}'.format(store['bytes']),
+        '# HELP boxmaker_box_store_evictions_total Files this worker deleted from the on-disk store.',
+        '# TYPE boxmaker_box_store_evictions_total counter',
+        'boxmaker_box_store_evictions_total {}'.format(store['evictions']),
+        '# HELP boxmaker_render_coalesced_total Requests that waited on an identical render already in progress.',
+        '# TYPE boxmaker_render_coalesced_total counter',
+        'boxmaker_render_coalesced_total {}'.format(render_flights.coalesced),
+    ]
+    return Response(render_metrics.exposition() + '\n'.join(lines) + '\n', mimetype='text/plain; version=0.0.4')
+
+
+def _box_response(box_data, file_type, download_name, compressed=False, etag=None):
+    # send the file as an attachment, compressed if it was asked for or the client accepts it, in chunks; pdf and svgz
+    # files are compressed already, so they are always sent as they are
+    extension = FILE_EXTENSIONS[file_type]
+    compressed = compressed and extension in COMPRESSIBLE
+    encoding = None
+    body = box_data
+    if compressed:
+        body = _encoded_box(box_data, 'gzip')
+        mimetype = 'application/gzip'
+        download_name += '.gz'
+        if etag:
+            etag += '-gzip'
+    else:
+        mimetype = MIME_TYPES[extension]
+        if extension in COMPRESSIBLE:
+            encoding = request.accept_encodings.best_match(compression.available_encodings())
+            if encoding:
+                body = _encoded_box(box_data, encoding)
+                if etag:
+                    # each encoding of the file is a different representation, so it needs its own strong ETag
+                    etag += '-' + encoding
+    if etag and request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = Response(_chunks(body), mimetype=mimetype, direct_passthrough=True)
+        response.headers['Content-Length'] = str(len(body))
+        response.headers['Content-Disposition'] = 'attachment; filename=' + download_name
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+    if extension in COMPRESSIBLE and not compressed:
+        response.vary.add('Accept-Encoding')
+    if etag:
+        response.set_etag(etag)
+    return response
+
+
+def _chunks(data):
+    for start in range(0, len(data), RESPONSE_CHUNK_BYTES):
+        yield data[start:start+RESPONSE_CHUNK_BYTES]
+
+
+def _encoded_box(box_data, encoding):
+    # compressed copies are cached, so each one is only ever compressed once; they are keyed on the digest of what was
+    # compressed, so a copy can never outlive the file it was made from
+    encoded_key = hashlib.sha256(box_data).hexdigest() + '.' + encoding
+    encoded = compressed_cache.get(encoded_key)
+    if encoded is None:
+        encoded = render_flights.do(encoded_key, lambda: _encode_and_cache_box(encoded_key, box_data, encoding))
+    return encoded
+
+
+def _encode_and_cache_box(encoded_key, box_data, encoding):
+    if encoded_key in compressed_cache:
+        return compressed_cache.get(encoded_key)
+    encoded = compression.encode(box_data, encoding)
+    compressed_cache.put(encoded_key, encoded)
+    return encoded
+
+
+def _render_key(file_type, params, notched_top):
+    return render_key(params['width'], params['height'], params['depth'],
+                      params['material_thickness'], params['cut_width'], params['notch_length'],
+                      params['bounding_box'], file_type, not notched_top, params['common_line'],
+                      params.get('order_paths', False))
+
+
+def _cached_render_box(file_type, params, notched_top):
+    key = _render_key(file_type, params, notched_top)
+    box_data = render_cache.get(key)
+    if box_data is None:
+        box_data = render_flights.do(key, lambda: _render_and_cache_box(key, file_type, params, notched_top))
+    else:
+        logger.debug("Serving cached render "+key)
+    return box_data
+
+
+def _render_and_cache_box(key, file_type, params, notched_top):
+    # another request may have finished rendering this between our cache lookup and getting here
+    if key in render_cache:
+        return render_cache.get(key)
+    box_data = render_store.get(key)
+    if box_data is None:
+        box_data = _render_box(file_type, params, notched_top)
+        try:
+            render_store.put(key, box_data)
+        except OSError as e:
+            logger.warning("Couldn't save {} to the box store: {}".format(key, e))
+    render_cache.put(key, box_data)
+    return box_data
+
+
+def _preview_and_cache_box(key, params, preview_format):
+    if key in preview_cache:
+        return preview_cache.get(key)
+    body = render_pool.call(preview.preview_bytes, params['width'], params['height'], params['depth'],
+                            params['material_thickness'], params['cut_width'], params['notch_length'],
+                            params['bounding_box'], params['tray'], params['common_line'], params['order_paths'],
+                            preview_format)
+    preview_cache.put(key, body)
+    return body
+
+
+def _render_box(file_type, params, notched_top):
+    # the result is cached and shared, so leave the time out of it; that way the same box always has the same bytes
+    return render_pool.render(params['width'], params['height'], params['depth'],
+                              params['material_thickness'], params['cut_width'], params['notch_length'],
+                              params['bounding_box'], file_type, not notched_top, timestamp=False,
+                              common_line=params['common_line'], order_paths=params.get('order_paths', False))
 
 
 def _box_name(file_type):
-    return 'box-'+datetime.datetime.now().strftime("%Y%m%d_%H%M%S_%f")+'.'+file_type
+    return 'box-'+datetime.datetime.now().strftime("%Y%m%d_%H%M%S_%f")+'.'+FILE_EXTENSIONS[file_type]
+
+
+def _form_box_params():
+    # convert the measurements to millimeters
+    measurements = ['width', 'height', 'depth', 'material_thickness', 'cut_width', 'notch_length']
+    conversion = 1.0
+    if request.form['units'] == 'in':
+        conversion = 25.4
+    elif request.form['units'] == 'cm':
+        conversion = 10.0
+    params = {}
+    for key in measurements:
+        params[key] = float(request.form[key])*conversion
+    # and add bounding box and common-line cutting options
+    params['bounding_box'] = True if 'bounding_box' in request.form else False
+    params['common_line'] = True if 'common_line' in request.form else False
+    return params
 
 
 def _validate_box_params():
@@ -76,6 +361,21 @@ def _validate_box_params():
     errors += _numeric_errors(request.form['material_thickness'], 'Material thickness')
     errors += _numeric_errors(request.form['cut_width'], 'Cut width')
     errors += _numeric_errors(request.form['notch_length'], 'Notch length')
+    if not errors:
+        # they're all numbers, but make sure they describe a box that can actually be cut
+        params = _form_box_params()
+        errors += _box_errors(params, request.form['notched_top'] != '1')
+    return errors
+
+
+def _box_errors(params, tray, check_cuts=False):
+    args = (params['width'], params['height'], params['depth'], params['material_thickness'], params['cut_width'],
+            params['notch_length'], tray, params['common_line'])
+    errors = validation.box_errors(*args)
+    if check_cuts and not errors:
+        # checking the cuts means drawing the whole box, which takes as long as rendering it, so it goes to the
+        # render pool too (and can raise RenderPoolFull or RenderTimeout the same way)
+        errors = render_pool.call(validation.box_errors, *args, check_cuts=True)
     return errors
 
 
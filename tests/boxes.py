@@ -0,0 +1,23 @@
+# Boxes for the tests to draw, covering a spread of sizes, materials, cut widths and the tray option
+
+from itertools import product
+
+from boxmaker.box import Box
+
+SIZES = [(50.0, 40.0, 30.0), (60.0, 90.0, 75.0), (76.2, 76.2, 95.25)]
+MATERIALS = [(3.0, 8.0), (4.7625, 11.90625), (3.048, 7.62)]  # thickness, notch length
+CUT_WIDTHS = [0.0, 0.2]
+
+# width, height, depth, thickness, cut_width, notch_length, tray
+BOX_PARAMS = [size + (thickness, cut_width, notch_length, tray)
+              for size, (thickness, notch_length), cut_width, tray in product(SIZES, MATERIALS, CUT_WIDTHS,
+                                                                               [False, True])]
+
+
+def box_segments(width, height, depth, thickness, cut_width, notch_length, tray):
+    """ The segments (as a flat list of x0, y0, x1, y1 values, in points) of every face of a box, in drawing order. """
+    box = Box(None, width, height, depth, thickness, cut_width, notch_length, False, None, tray)
+    segments = []
+    for face_segments in box.face_segments().values():
+        segments += face_segments
+    return segments
@@ -0,0 +1,20 @@
+import pytest
+
+from boxmaker.cache import RenderCache, SingleFlight
+from boxmaker.pool import RenderPool
+from boxmaker.store import BoxStore
+
+
+@pytest.fixture
+def server_app(tmp_path, monkeypatch):
+    """ The web app with empty caches, a box store in a temporary directory, and renders done in the test's thread. """
+    import server
+    store = BoxStore(str(tmp_path / 'boxes'), sweep_interval=3600)
+    monkeypatch.setattr(server, 'render_cache', RenderCache())
+    monkeypatch.setattr(server, 'compressed_cache', RenderCache())
+    monkeypatch.setattr(server, 'preview_cache', RenderCache())
+    monkeypatch.setattr(server, 'render_store', store)
+    monkeypatch.setattr(server, 'render_flights', SingleFlight())
+    monkeypatch.setattr(server, 'render_pool', RenderPool(workers=0))
+    yield server
+    store.stop()
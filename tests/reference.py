@@ -0,0 +1,239 @@
+# The original implementations that have since been rewritten for speed, kept so the tests can check the new code
+# still gives the same results. They are copied from the baseline version of boxmaker as they were, apart from the
+# drawing code taking its inputs directly rather than through a Box.
+
+from string import Template
+
+
+class Point(object):
+    """
+    Point is a class that keeps an x-y pair of possibly-floating-point values and allows approximate comparison of those
+    points by rounding them to only two decimal places without actually affecting their full precision.
+    """
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+
+    def __hash__(self):
+        return hash("{:.2f}{:.2f}".format(self.x, self.y))
+
+    def __eq__(self, other):
+        return self.__hash__() == other.__hash__()
+
+
+class PathBuilder(object):
+    """ The original PathBuilder, which joins paths by repeatedly searching the whole list for a match. """
+
+    def __init__(self):
+        self.paths = []
+        self.firsts = set()
+
+    def add_segment(self, x0, y0, x1, y1):
+        p1 = Point(x0, y0)
+        p2 = Point(x1, y1)
+        # make a line segment
+        seg = [p1, p2]
+        # but if two segments are known to start with the same value, reverse the new one
+        if p1 in self.firsts:
+            seg = [p2, p1]
+        self.paths.append(seg)
+        # We may still have overlapping firsts but that's OK; we're just using this to
+        # accelerate some decision-making
+        self.firsts.add(seg[0])
+
+    def join_paths(self):
+        """ Call _join_paths_1 repeatedly until it doesn't change any more. """
+        while True:
+            count = len(self.paths)
+            paths = self._join_paths_1()
+            self.paths = paths
+            if len(paths) == count:
+                break
+
+    def _join_paths_1(self):
+        oldpaths = self.paths[:]
+        newpaths = []
+        while len(oldpaths):
+            start = -1
+            it = oldpaths.pop()
+            for pi in range(len(oldpaths)):
+                if oldpaths[pi][-1] == it[0]:
+                    start = pi
+                    break
+                if oldpaths[pi][-1] == it[-1]:
+                    start = pi
+                    it.reverse()
+                    break
+            if start == -1:
+                newpaths.append(it)
+            else:
+                newpaths.append(oldpaths[start] + it[1:])
+                del oldpaths[start]
+        return newpaths
+
+
+def horizontal_line(x0, y0, notch_width, notch_count, notch_height, cut_width, flip, smallside):
+    """ The segments the original Box._draw_horizontal_line drew, as a flat list of x0, y0, x1, y1 values. """
+    segments = []
+
+    def _draw_line(from_x, from_y, to_x, to_y):
+        segments.extend((from_x, from_y, to_x, to_y))
+
+    x = x0
+    for step in range(0, int(notch_count)):
+        y = y0 if (((step % 2) == 0) ^ flip) else y0+notch_height
+        if step == 0:  # start first edge in the right place
+            if smallside:
+                _draw_line(x+notch_height, y, x+notch_width+cut_width, y)
+            else:
+                _draw_line(x, y, x+notch_width+cut_width, y)
+        elif step == (notch_count-1):  # shorter last edge
+            _draw_line(x-cut_width, y, x+notch_width-notch_height, y)
+        elif step % 2 == 0:
+            _draw_line(x-cut_width, y, x+notch_width+cut_width, y)
+        else:
+            _draw_line(x+cut_width, y, x+notch_width-cut_width, y)
+        if step < (notch_count-1):
+            if step % 2 == 0:
+                _draw_line(x+notch_width+cut_width, y0+notch_height, x+notch_width+cut_width, y0)
+            else:
+                _draw_line(x+notch_width-cut_width, y0+notch_height, x+notch_width-cut_width, y0)
+        x = x + notch_width
+    return segments
+
+
+def vertical_line(x0, y0, notch_width, notch_count, notch_height, cut_width, flip, smallside):
+    """ The segments the original Box._draw_vertical_line drew, as a flat list of x0, y0, x1, y1 values. """
+    segments = []
+
+    def _draw_line(from_x, from_y, to_x, to_y):
+        segments.extend((from_x, from_y, to_x, to_y))
+
+    y = y0
+    for step in range(0, int(notch_count)):
+        x = x0 if (((step % 2) == 0) ^ flip) else x0+notch_height
+        if step == 0:
+            if smallside:
+                _draw_line(x, y+notch_height, x, y+notch_width+cut_width)
+            else:
+                _draw_line(x, y, x, y+notch_width+cut_width)
+        elif step == (notch_count-1):
+            if smallside:
+                _draw_line(x, y-cut_width, x, y+notch_width-notch_height)
+            else:
+                _draw_line(x, y-cut_width, x, y+notch_width)
+        elif step % 2 == 0:
+            _draw_line(x, y-cut_width, x, y+notch_width+cut_width)
+        else:
+            _draw_line(x, y+cut_width, x, y+notch_width-cut_width)
+        if step < (notch_count-1):
+            if step % 2 == 0:
+                _draw_line(x0+notch_height, y+notch_width+cut_width, x0, y+notch_width+cut_width)
+            else:
+                _draw_line(x0+notch_height, y+notch_width-cut_width, x0, y+notch_width-cut_width)
+        y = y+notch_width
+    return segments
+
+
+# the original SVG writer, which holds every element in memory and writes the whole file in save()
+tmpl_svg = Template("""<?xml version="1.0" encoding="UTF-8" standalone="no"?>
+<!DOCTYPE svg PUBLIC "-//W3C//DTD SVG 1.1//EN" "http://www.w3.org/Graphics/SVG/1.1/DTD/svg11.dtd">
+<svg width="${point_width}pt" height="${point_height}pt" version="1.1"
+    viewBox="0 0 ${point_width} ${point_height}"
+    xmlns="http://www.w3.org/2000/svg"
+    xmlns:xlink="http://www.w3.org/1999/xlink"
+    xml:space="preserve"
+    xmlns:serif="http://www.serif.com/"
+    style="fill-rule:evenodd;clip-rule:evenodd;stroke-linecap:round;stroke-linejoin:round;stroke-miterlimit:1.5;">
+${contents}
+</svg>
+""")
+
+tmpl_path = Template("""        <path d="${path}" style="fill:none;stroke:${stroke_color};stroke-width:${stroke_pixels}px;"/>
+""")
+
+tmpl_rect = Template("""        <rect x="${x}" y="${y}" width="${w}" height="${h}"/>
+""")
+
+PIXEL_TO_POINT = 0.75
+
+
+class SVGDoc(object):
+
+    def __init__(self, filename):
+        self.comments = []
+        self.elements = []
+        self.paths = []
+        self.firsts = set()
+        self.filename = filename
+        self.stroke_color = "black"
+        self.line_width = 0.5  # default is mm so we need to convert
+        self.page_size = [0, 0]
+        self.author = ''
+
+    def setPageSize(self, page_size):
+        self.page_size = page_size
+
+    def setAuthor(self, author):
+        self.author = author
+
+    def setStrokeColor(self, col):
+        self.stroke_color = col
+
+    def setLineWidth(self, lw):
+        self.line_width = lw
+
+    def drawString(self, x, y, st):
+        # String must be free of metacharacters
+        self.comments.append((x, y, st))
+
+    def rect(self, x, y, w, h):
+        self.elements.append(tmpl_rect.substitute(dict(x=self._sc(x), y=self._sc(y), w=self._sc(w), h=self._sc(h))))
+
+    def drawClosedPath(self, p):
+        s = "M{},{}".format(self._sc(p[0][0]), self._sc(p[0][1]))
+        s += ''.join(["L{},{}".format(self._sc(pt[0]), self._sc(pt[1])) for pt in p[1:-1]])
+        s += 'Z'
+        self.elements.append(tmpl_path.substitute(dict(
+            path=s,
+            stroke_color=self._col(self.stroke_color),
+            stroke_pixels=self._sc(self.line_width)
+            )))
+
+    def drawOpenPath(self, p):
+        s = "M{},{}".format(self._sc(p[0][0]), self._sc(p[0][1]))
+        s += ''.join(["L{},{}".format(self._sc(pt[0]), self._sc(pt[1])) for pt in p[1:]])
+        self.elements.append(tmpl_path.substitute(dict(
+            path=s,
+            stroke_color=self._col(self.stroke_color),
+            stroke_pixels=self._sc(self.line_width)
+            )))
+
+    def save(self):
+        s = ''.join([e for e in self.elements])
+        pgw, pgh = self._sc(self.page_size[0]), self._sc(self.page_size[1])
+        # To support different DPI viewers, we shoudl encode the page size in points, not pixels.  This makes it work
+        #  in both InkScape and Illustrator.
+        svg = tmpl_svg.substitute(dict(
+            point_width=self._pixel_to_point(pgw),
+            point_height=self._pixel_to_point(pgh),
+            contents=s))
+        ofh = open(self.filename, 'w')
+        ofh.write(svg)
+        ofh.close()
+
+    # end public API
+
+    @staticmethod
+    def _sc(v):
+        # converts from mm to pixels as a numeric string
+        return "{:.2f}".format(v)  # * 96 / 25.4)
+
+    @staticmethod
+    def _col(color):
+        # generates a CSS color from a reportlab color
+        return '#'+color.hexval()[2:]
+
+    @staticmethod
+    def _pixel_to_point(pixels):
+        return "{:.2f}".format(float(pixels) * PIXEL_TO_POINT)
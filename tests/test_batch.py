@@ -0,0 +1,34 @@
+import os
+
+from boxmaker.batch import render_batch
+
+SPEC = {'width': '50', 'height': '40', 'depth': '30', 'material_thickness': '3', 'cut_width': '0',
+        'notch_length': '8', 'file_type': 'svg'}
+
+
+def test_names_stay_inside_the_output_directory(tmp_path):
+    output_dir = tmp_path / 'out'
+    specs = [dict(SPEC, name='../escaped'), dict(SPEC, name='/tmp/absolute'), dict(SPEC, name='..'),
+             dict(SPEC, name='a box: big')]
+    results = list(render_batch(specs, str(output_dir), workers=1))
+    assert [r.error for r in results] == [None] * 4
+    assert [os.path.basename(r.file_path) for r in results] == ['escaped.svg', 'absolute.svg', 'box-00002.svg',
+                                                                'a-box-big.svg']
+    assert sorted(os.listdir(str(output_dir))) == ['a-box-big.svg', 'absolute.svg', 'box-00002.svg', 'escaped.svg']
+    assert not (tmp_path / 'escaped.svg').exists()
+
+
+def test_duplicate_names_are_rejected(tmp_path):
+    specs = [dict(SPEC, name='box'), dict(SPEC, name='Box'), dict(SPEC, name='box', file_type='dxf'),
+             dict(SPEC, name='../box')]
+    results = list(render_batch(specs, str(tmp_path), workers=1))
+    assert [r.error is None for r in results] == [True, False, True, False]
+    assert 'Box.svg' in results[1].error
+
+
+def test_specs_with_the_wrong_kind_of_value_fail_on_their_own(tmp_path):
+    specs = [dict(SPEC, file_type=['svg']), dict(SPEC, units={'in': 1}), SPEC]
+    results = list(render_batch(specs, str(tmp_path), workers=1))
+    assert results[0].error == "ValueError: Unknown file type '['svg']'"
+    assert results[1].error == "ValueError: Unknown units '{'in': 1}'"
+    assert results[2].error is None
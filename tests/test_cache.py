@@ -0,0 +1,53 @@
+import threading
+import time
+
+import pytest
+
+from boxmaker import cache
+from boxmaker.cache import CallInterrupted, SingleFlight, render_key
+
+BOX = (101.6, 152.4, 127.0, 4.7625, 0.0, 11.90625)
+
+
+def test_key_ignores_unit_conversion_noise():
+    assert render_key(*BOX) == render_key(4 * 25.4, 6 * 25.4, 5 * 25.4, 0.1875 * 25.4, 0.0, 0.46875 * 25.4)
+
+
+def test_key_changes_with_the_app_and_render_format_versions(monkeypatch):
+    key = render_key(*BOX)
+    monkeypatch.setattr(cache.boxmaker, 'APP_VERSION', '99.0.0')
+    app_key = render_key(*BOX)
+    monkeypatch.setattr(cache, 'RENDER_FORMAT_VERSION', cache.RENDER_FORMAT_VERSION + 1)
+    assert len(set([key, app_key, render_key(*BOX)])) == 3
+
+
+def _wait_for_leader(flights, key, started, results):
+    started.wait()
+    try:
+        results.append(flights.do(key, lambda: 'not the leader'))
+    except Exception as e:
+        results.append(e)
+
+
+@pytest.mark.parametrize('error', [ValueError('bad box'), KeyboardInterrupt(), SystemExit(1)])
+def test_waiters_are_told_when_the_leader_fails(error):
+    flights = SingleFlight()
+    started = threading.Event()
+    results = []
+    waiter = threading.Thread(target=_wait_for_leader, args=(flights, 'key', started, results))
+    waiter.start()
+
+    def fail():
+        started.set()
+        while flights.coalesced == 0:
+            time.sleep(0.01)
+        raise error
+    with pytest.raises(type(error)):
+        flights.do('key', fail)
+    waiter.join()
+    if isinstance(error, Exception):
+        assert results == [error]
+    else:
+        assert isinstance(results[0], CallInterrupted)
+    # and the next call starts afresh
+    assert flights.do('key', lambda: 'again') == 'again'
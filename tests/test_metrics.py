@@ -0,0 +1,66 @@
+import re
+
+import pytest
+
+import boxmaker
+from boxmaker import metrics
+from boxmaker.metrics import BYTES_BUCKETS, SECONDS_BUCKETS, STAGES, PrometheusMetrics
+
+# a sample line of the Prometheus text format: a name, optional labels and a value
+SAMPLE = re.compile(r'^([a-z_]+)(?:\{((?:[a-z_]+="[^"]*",?)*)\})? (\S+)$')
+
+
+@pytest.fixture
+def prometheus():
+    listener = PrometheusMetrics()
+    metrics.add_listener(listener)
+    yield listener
+    metrics.remove_listener(listener)
+
+
+def _samples(exposition):
+    samples = {}
+    for line in exposition.splitlines():
+        if line.startswith('#'):
+            assert re.match(r'^# (HELP [a-z_]+ .+|TYPE [a-z_]+ (histogram|counter))$', line)
+            continue
+        name, labels, value = SAMPLE.match(line).groups()
+        samples[(name, labels)] = float(value)
+    return samples
+
+
+def _histogram(samples, name, labels, buckets):
+    counts = [samples[(name + '_bucket', '{},le="{}"'.format(labels, bound))] for bound in buckets]
+    counts.append(samples[(name + '_bucket', '{},le="+Inf"'.format(labels))])
+    assert counts == sorted(counts)
+    assert counts[-1] == samples[(name + '_count', labels)]
+    return counts[-1], samples[(name + '_sum', labels)]
+
+
+def test_one_render_is_exposed_as_histograms(prometheus):
+    box_data = boxmaker.render_bytes(50, 40, 30, 3, 0, 8, file_type='svg')
+    exposition = prometheus.exposition()
+    samples = _samples(exposition)
+    assert '# TYPE boxmaker_render_seconds histogram' in exposition
+    count, total = _histogram(samples, 'boxmaker_render_seconds', 'file_type="svg"', SECONDS_BUCKETS)
+    assert count == 1 and total > 0
+    stage_total = 0.0
+    for stage in STAGES:
+        count, seconds = _histogram(samples, 'boxmaker_render_stage_seconds',
+                                    'file_type="svg",stage="{}"'.format(stage), SECONDS_BUCKETS)
+        assert count == 1
+        stage_total += seconds
+    assert stage_total == pytest.approx(total)
+    assert _histogram(samples, 'boxmaker_render_output_bytes', 'file_type="svg"', BYTES_BUCKETS) == \
+        (1, len(box_data))
+    assert samples[('boxmaker_render_segments_total', 'file_type="svg"')] > 0
+    assert samples[('boxmaker_render_paths_total', 'file_type="svg"')] > 0
+
+
+def test_file_types_are_kept_apart(prometheus):
+    boxmaker.render_bytes(50, 40, 30, 3, 0, 8, file_type='svg')
+    boxmaker.render_bytes(50, 40, 30, 3, 0, 8, file_type='svg')
+    boxmaker.render_bytes(50, 40, 30, 3, 0, 8, file_type='dxf')
+    samples = _samples(prometheus.exposition())
+    assert samples[('boxmaker_render_seconds_count', 'file_type="svg"')] == 2
+    assert samples[('boxmaker_render_seconds_count', 'file_type="dxf"')] == 1
@@ -0,0 +1,100 @@
+import io
+import re
+import time
+import zlib
+
+import pytest
+
+import boxmaker
+from boxmaker.box import Box
+from boxmaker.native_pdf import NativePDFDoc
+from boxmaker.units import mm
+
+BOX = (50.0, 40.0, 30.0, 3.0, 0.0, 8.0)
+TIMESTAMP = time.struct_time((2024, 3, 5, 14, 7, 9, 1, 65, -1))
+
+
+def _render(timestamp=TIMESTAMP, **kwargs):
+    return boxmaker.render_bytes(*BOX, file_type='pdf_native', timestamp=timestamp, **kwargs)
+
+
+def _objects(pdf):
+    """ Check the cross-reference table points at each object, and return the objects' bodies by number. """
+    startxref = int(re.search(rb'startxref\n(\d+)\n%%EOF\n$', pdf).group(1))
+    match = re.compile(rb'xref\n0 (\d+)\n').match(pdf, startxref)
+    count = int(match.group(1))
+    entries = re.findall(rb'(\d{10}) (\d{5}) ([fn]) \n', pdf[match.end():match.end() + 20*count])
+    assert len(entries) == count
+    objects = {}
+    for number, (offset, _, kind) in enumerate(entries):
+        if kind == b'n':
+            body = re.compile(rb'%d 0 obj\n(.*?)\nendobj\n' % number, re.S).match(pdf, int(offset))
+            objects[number] = body.group(1)
+    return objects
+
+
+def _content(objects):
+    stream = objects[5]
+    data = stream[stream.index(b'stream\n') + 7:stream.rindex(b'\nendstream')]
+    assert int(re.search(rb'/Length (\d+)', stream).group(1)) == len(data)
+    return zlib.decompress(data).decode('latin-1') if b'/FlateDecode' in stream else data.decode('latin-1')
+
+
+def test_structure_and_page_size():
+    pdf = _render()
+    assert pdf.startswith(b'%PDF-1.4\n')
+    objects = _objects(pdf)
+    assert sorted(objects) == [1, 2, 3, 4, 5, 6]
+    assert b'/Type /Catalog' in objects[1] and b'/Count 1' in objects[2]
+    box = Box(None, *(BOX + (False, None, False)))
+    geometry = box.geometry()
+    width, height = [float(v) for v in re.search(rb'/MediaBox \[0 0 (\S+) (\S+)\]', objects[3]).groups()]
+    assert width == pytest.approx(geometry['page_size'][0] * mm, abs=1e-4)
+    assert height == pytest.approx(geometry['page_size'][1] * mm, abs=1e-4)
+
+
+def test_paths_are_drawn_and_stroked():
+    content = _content(_objects(_render()))
+    box = Box(None, *(BOX + (False, None, False)))
+    paths = box.geometry()['paths']
+    assert content.count(' m\n') == len(paths)
+    closed = [path for path in paths if path[0] == path[-1]]
+    assert content.count('h\n') == len(closed)
+    assert content.count(' l\n') == sum([len(path) - (2 if path in closed else 1) for path in paths])
+    assert content.rstrip().endswith('S')
+    assert re.search(r'BT /F1 12 Tf [\d.]+ [\d.]+ Td \(Produced by .* on 03/05/2024 at 14:07:09\) Tj ET', content)
+    # every coordinate is written to hundredths
+    first = paths[0][0]
+    assert '%.2f %.2f m\n' % (first[0] * mm, first[1] * mm) in content
+
+
+def test_uncompressed_text_is_escaped():
+    output = io.BytesIO()
+    doc = NativePDFDoc(output, compress=False)
+    doc.drawString(10, 20, 'a (b) \\ c')
+    doc.save()
+    objects = _objects(output.getvalue())
+    assert b'/FlateDecode' not in objects[5]
+    assert _content(objects) == 'BT /F1 12 Tf 10.00 20.00 Td (a \\(b\\) \\\\ c) Tj ET\n'
+
+
+def test_creation_date_comes_from_the_timestamp():
+    pdf = _render()
+    info = _objects(pdf)[6]
+    assert b'/CreationDate (D:20240305140709)' in info
+    assert _render() == pdf
+    undated = _render(timestamp=False)
+    assert b'/CreationDate' not in _objects(undated)[6]
+    assert _render(timestamp=False) == undated
+
+
+def test_pypdf_can_read_it():
+    pypdf = pytest.importorskip('pypdf')
+    reader = pypdf.PdfReader(io.BytesIO(_render()))
+    assert len(reader.pages) == 1
+    box = Box(None, *(BOX + (False, None, False)))
+    page_width, page_height = box.geometry()['page_size']
+    assert float(reader.pages[0].mediabox.width) == pytest.approx(page_width * mm, abs=1e-3)
+    assert float(reader.pages[0].mediabox.height) == pytest.approx(page_height * mm, abs=1e-3)
+    assert reader.metadata['/CreationDate'] == 'D:20240305140709'
+    assert '03/05/2024' in reader.pages[0].extract_text()
@@ -0,0 +1,45 @@
+import random
+
+import pytest
+
+from boxmaker import nesting
+from boxmaker.nesting import Sheet, box_panels, pack
+
+
+def _panels(box_count, seed):
+    rng = random.Random(seed)
+    panels = []
+    for i in range(box_count):
+        panels += box_panels(rng.uniform(30, 200), rng.uniform(30, 150), rng.uniform(30, 150), 3.0, 0.1, 8.0,
+                             rng.random() < 0.25, 'box-{}'.format(i))
+    return panels
+
+
+def _first_fit(panels, sheet_width, sheet_height, rotate):
+    # pack without the sheet index, trying every sheet in turn
+    sheets = []
+    for panel in sorted(panels, key=lambda panel: nesting._packing_order(panel, rotate), reverse=True):
+        for sheet in sheets:
+            if nesting._place(sheet, panel, rotate):
+                break
+        else:
+            sheet = Sheet(sheet_width, sheet_height)
+            assert nesting._place(sheet, panel, rotate)
+            sheets.append(sheet)
+    return sheets
+
+
+def _layout(sheets):
+    return [[(p.panel.name, p.x, p.y, p.rotated) for p in sheet.placements] for sheet in sheets]
+
+
+@pytest.mark.parametrize('seed', [1, 2, 3])
+@pytest.mark.parametrize('rotate', [True, False])
+def test_pack_matches_first_fit(seed, rotate):
+    panels = _panels(60, seed)
+    assert _layout(pack(panels, 600.0, 400.0, rotate=rotate)) == _layout(_first_fit(panels, 600.0, 400.0, rotate))
+
+
+def test_panel_too_big_for_a_sheet():
+    with pytest.raises(ValueError):
+        pack(box_panels(500.0, 400.0, 300.0, 3.0, 0.0, 8.0), 100.0, 100.0)
@@ -0,0 +1,41 @@
+import random
+from itertools import product
+
+import pytest
+
+from boxmaker.notches import notched_edge
+from boxmaker.units import mm
+from tests import reference
+
+
+def _random_edges(count, seed):
+    rng = random.Random(seed)
+    return [(rng.uniform(-50, 500), rng.uniform(-50, 500), rng.uniform(1, 20), float(rng.choice([1, 2, 3, 5, 9, 31])),
+             rng.uniform(1, 10), rng.choice([0.0, rng.uniform(-0.5, 0.5)]), rng.random() < 0.5, rng.random() < 0.5)
+            for _ in range(count)]
+
+
+EDGES = [(10.0, 20.0, 11.288888888888888, 9.0, 4.7625, cut_width, flip, smallside)
+         for cut_width, flip, smallside in product([0.0, 0.1, -0.1], [False, True], [False, True])]
+EDGES += _random_edges(200, 1)
+
+
+@pytest.mark.parametrize('edge', EDGES)
+def test_horizontal_edge_matches_original(edge):
+    assert notched_edge(*edge) == reference.horizontal_line(*edge)
+
+
+@pytest.mark.parametrize('edge', EDGES)
+def test_vertical_edge_matches_original(edge):
+    assert notched_edge(*edge, vertical=True) == reference.vertical_line(*edge)
+
+
+@pytest.mark.parametrize('edge', EDGES)
+@pytest.mark.parametrize('vertical', [False, True])
+def test_scaled_edge_matches_scaling_afterwards(edge, vertical):
+    expected = [c*mm for c in notched_edge(*edge, vertical=vertical)]
+    assert notched_edge(*edge, vertical=vertical, scale=mm) == expected
+
+
+def test_no_notches_means_no_segments():
+    assert notched_edge(0.0, 0.0, 10.0, 0, 3.0, 0.0, False, False) == []
@@ -0,0 +1,76 @@
+import random
+from collections import Counter
+
+import pytest
+
+from boxmaker.box import Box
+from boxmaker.ordering import _nesting_levels, order_paths, travel_distance
+from tests.boxes import BOX_PARAMS
+
+
+def _segments(paths):
+    # every segment of every path, without direction, with how often it appears
+    return Counter([tuple(sorted([a, b])) for path in paths for a, b in zip(path, path[1:])])
+
+
+def _inside_first(paths):
+    # the paths in the order given, except that paths inside others come first, as they must be cut
+    return [path for level in _nesting_levels(paths) for path in level]
+
+
+def _random_paths(seed):
+    r = random.Random(seed)
+    paths = []
+    for _ in range(r.randint(0, 12)):
+        x, y = r.uniform(0, 100), r.uniform(0, 100)
+        if r.random() < 0.3:
+            w, h = r.uniform(1, 30), r.uniform(1, 30)
+            paths.append([(x, y), (x + w, y), (x + w, y + h), (x, y + h), (x, y)])
+        else:
+            paths.append([(x, y)] + [(r.uniform(0, 100), r.uniform(0, 100)) for _ in range(r.randint(1, 3))])
+    return paths
+
+
+def _box_paths(params):
+    box = Box(None, *(params[:6] + (False, None, params[6])))
+    box._compute_dimensions()
+    box._draw_faces()
+    box.paths.join_paths()
+    return box.paths.paths
+
+
+def _check(paths, start=(0.0, 0.0)):
+    ordered = order_paths(paths, start)
+    assert _segments(ordered) == _segments(paths)
+    assert travel_distance(ordered, start) <= travel_distance(_inside_first(paths), start) + 1e-9
+    return ordered
+
+
+@pytest.mark.parametrize('paths', [
+    [],
+    [[(5.0, 5.0), (10.0, 5.0)]],
+    [[(0.0, 0.0), (10.0, 0.0), (10.0, 10.0), (0.0, 10.0), (0.0, 0.0)]],
+    [[(50.0, 50.0), (60.0, 50.0)], [(1.0, 1.0), (2.0, 2.0)]],
+    [[(10.0, 0.0), (0.0, 0.0)], [(10.0, 1.0), (20.0, 1.0)]],
+    [[(0.0, 0.0), (10.0, 0.0), (10.0, 10.0), (0.0, 10.0), (0.0, 0.0)], [(2.0, 2.0), (3.0, 3.0)]],
+])
+def test_few_paths(paths):
+    _check(paths, (1.0, 1.0))
+
+
+def test_paths_inside_others_come_first():
+    outer = [(0.0, 0.0), (10.0, 0.0), (10.0, 10.0), (0.0, 10.0), (0.0, 0.0)]
+    inner = [(4.0, 4.0), (6.0, 4.0)]
+    assert _check([outer, inner])[0] in (inner, inner[::-1])
+
+
+@pytest.mark.parametrize('seed', range(200))
+def test_random_paths(seed):
+    _check(_random_paths(seed))
+
+
+@pytest.mark.parametrize('params', BOX_PARAMS[::3])
+def test_box_paths(params):
+    paths = _box_paths(params)
+    ordered = _check(paths)
+    assert travel_distance(ordered) < travel_distance(paths)
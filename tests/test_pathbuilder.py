@@ -0,0 +1,205 @@
+import random
+
+import pytest
+
+from boxmaker.box import Box
+from boxmaker.pathbuilder import PathBuilder, quantize
+from tests import reference
+from tests.boxes import BOX_PARAMS, box_segments
+
+
+def _edges(paths):
+    # every segment of every path, rounded to hundredths and without direction, with how often it appears
+    edges = {}
+    for path in paths:
+        for (x0, y0), (x1, y1) in zip(path, path[1:]):
+            edge = tuple(sorted([(round(x0, 2), round(y0, 2)), (round(x1, 2), round(y1, 2))]))
+            edges[edge] = edges.get(edge, 0) + 1
+    return edges
+
+
+def _closed_count(paths):
+    return len([path for path in paths if (round(path[0][0], 2), round(path[0][1], 2)) ==
+                (round(path[-1][0], 2), round(path[-1][1], 2))])
+
+
+@pytest.mark.parametrize('params', BOX_PARAMS)
+def test_join_paths_matches_original(params):
+    segments = box_segments(*params)
+    new = PathBuilder()
+    new.add_segments(segments)
+    new.join_paths()
+    old = reference.PathBuilder()
+    for i in range(0, len(segments), 4):
+        old.add_segment(*segments[i:i+4])
+    old.join_paths()
+    old_paths = [[(pt.x, pt.y) for pt in path] for path in old.paths]
+    assert len(new.paths) == len(old_paths)
+    assert _closed_count(new.paths) == _closed_count(old_paths)
+    assert _edges(new.paths) == _edges(old_paths)
+
+
+def test_join_paths_closes_a_square():
+    paths = PathBuilder()
+    paths.add_segments([0, 0, 10, 0, 10, 10, 10, 0, 10, 10, 0, 10, 0, 0, 0, 10])
+    paths.join_paths()
+    assert len(paths.paths) == 1
+    assert paths.paths[0][0] == paths.paths[0][-1]
+    assert len(paths.paths[0]) == 5
+
+
+def _formatted_hundredths(v):
+    # what the writers put in the file, as a number of hundredths
+    return int(round(float("{:.2f}".format(v)) * 100))
+
+
+@pytest.mark.parametrize('v', [0.005, 0.015, 0.025, 0.125, 0.135, 1.005, 1.115, 2.675, 10.235, 100.005, 1234.565,
+                               -0.005, -0.015, -1.005, -2.675, -10.235, -0.004, 0.0, -0.0])
+def test_quantize_matches_formatting_at_boundaries(v):
+    assert quantize(v) == _formatted_hundredths(v)
+
+
+@pytest.mark.parametrize('inches', [0.1875, 0.46875, 0.125, 0.25, 1.0, 3.3, 4.0, 5.005, 6.125])
+def test_quantize_matches_formatting_of_converted_values(inches):
+    # sizes entered in inches are converted to mm, and the writers draw in points
+    mm = inches * 25.4
+    for v in (mm, mm * 72 / 25.4, -mm, mm / 2.0, mm * 3 + 0.005):
+        assert quantize(v) == _formatted_hundredths(v)
+
+
+def test_quantize_matches_formatting_across_a_range():
+    for i in range(-20000, 20000):
+        v = i / 1000.0
+        assert quantize(v) == _formatted_hundredths(v)
+        assert quantize(v * 25.4) == _formatted_hundredths(v * 25.4)
+
+
+def _coverage(segments):
+    """ The stretches of each horizontal or vertical line the segments cover, merged, in hundredths. """
+    lines = {}
+    for i in range(0, len(segments), 4):
+        x0, y0, x1, y1 = [quantize(v) for v in segments[i:i+4]]
+        key, span = (('h', y0), (x0, x1)) if y0 == y1 else (('v', x0), (y0, y1))
+        lines.setdefault(key, []).append(tuple(sorted(span)))
+    coverage = {}
+    for key, spans in lines.items():
+        merged = []
+        for start, end in sorted(spans):
+            if merged and start <= merged[-1][1]:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+            else:
+                merged.append((start, end))
+        coverage[key] = merged
+    return coverage
+
+
+def _total_length(segments):
+    return sum([abs(segments[i+2] - segments[i]) + abs(segments[i+3] - segments[i+1])
+                for i in range(0, len(segments), 4)])
+
+
+def _remove_overlaps(*segments):
+    paths = PathBuilder()
+    paths.add_segments(segments)
+    removed = paths.remove_overlaps()
+    return sorted([tuple(paths.segments[i:i+4]) for i in range(0, len(paths.segments), 4)]), removed
+
+
+def test_remove_overlaps_merges_a_partial_overlap():
+    segments, removed = _remove_overlaps(0, 0, 10, 0, 5, 0, 15, 0)
+    assert _coverage([v for s in segments for v in s]) == {('h', 0): [(0, 1500)]}
+    assert _total_length([v for s in segments for v in s]) == 15
+    assert removed == 5
+
+
+def test_remove_overlaps_keeps_one_of_exact_duplicates():
+    assert _remove_overlaps(0, 0, 0, 10, 0, 0, 0, 10) == ([(0, 0, 0, 10)], 10)
+    assert _remove_overlaps(0, 0, 3, 4, 0, 0, 3, 4) == ([(0, 0, 3, 4)], 5)
+
+
+def test_remove_overlaps_keeps_one_of_opposite_duplicates():
+    segments, removed = _remove_overlaps(0, 0, 10, 0, 10, 0, 0, 0)
+    assert len(segments) == 1 and sorted([segments[0][0], segments[0][2]]) == [0, 10]
+    assert removed == 10
+    assert _remove_overlaps(0, 0, 3, 4, 3, 4, 0, 0) == ([(0, 0, 3, 4)], 5)
+
+
+def test_remove_overlaps_leaves_segments_that_only_touch():
+    assert _remove_overlaps(0, 0, 10, 0, 10, 0, 20, 0, 0, 1, 10, 1) == \
+        ([(0, 0, 10, 0), (0, 1, 10, 1), (10, 0, 20, 0)], 0.0)
+
+
+@pytest.mark.parametrize('params', BOX_PARAMS[::5])
+def test_common_line_cuts_everything_once(params):
+    width, height, depth, thickness, cut_width, notch_length, tray = params
+    box = Box(None, width, height, depth, thickness, cut_width, notch_length, False, None, tray, common_line=True)
+    box._compute_dimensions()
+    box._draw_faces()
+    drawn = box.paths.segments
+    removed = box.paths.remove_overlaps()
+    kept = box.paths.segments
+    assert _coverage(kept) == _coverage(drawn)
+    assert removed > 0
+    assert _total_length(kept) == pytest.approx(_total_length(drawn) - removed)
+    # with nothing cut twice, the kept segments are exactly as long as the lines they cover
+    covered = sum([end - start for spans in _coverage(kept).values() for start, end in spans])
+    assert _total_length(kept) == pytest.approx(covered / 100.0, abs=0.01 * len(kept) / 4)
+    assert box.paths.crossings() == 0
+
+
+def _crossings(*segments):
+    paths = PathBuilder()
+    paths.add_segments(segments)
+    return paths.crossings()
+
+
+@pytest.mark.parametrize('segments, crossings', [
+    # a plus sign
+    ((0, 5, 10, 5, 5, 0, 5, 10), 1),
+    # a T, with one segment ending on the other, either way round and from either side
+    ((0, 5, 10, 5, 5, 5, 5, 10), 0),
+    ((0, 5, 10, 5, 5, 0, 5, 5), 0),
+    ((5, 0, 5, 10, 5, 5, 10, 5), 0),
+    ((5, 0, 5, 10, 0, 5, 5, 5), 0),
+    # corners, and segments meeting end to end
+    ((0, 0, 10, 0, 10, 0, 10, 10, 10, 10, 0, 10, 0, 10, 0, 0), 0),
+    ((0, 0, 10, 0, 10, 0, 20, 0), 0),
+    # collinear segments overlapping, partly, exactly, backwards, or one inside the other
+    ((0, 0, 10, 0, 5, 0, 15, 0), 1),
+    ((0, 0, 0, 10, 0, 0, 0, 10), 1),
+    ((0, 0, 10, 0, 10, 0, 0, 0), 1),
+    ((0, 0, 30, 0, 10, 0, 20, 0), 1),
+    ((0, 0, 30, 0, 10, 0, 20, 0, 12, 0, 18, 0), 2),
+    # parallel lines and lines that would cross if they were longer
+    ((0, 0, 10, 0, 0, 1, 10, 1), 0),
+    ((0, 5, 4, 5, 5, 0, 5, 10), 0),
+    # a tic-tac-toe grid
+    ((0, 3, 9, 3, 0, 6, 9, 6, 3, 0, 3, 9, 6, 0, 6, 9), 4),
+    # differences under a hundredth don't count
+    ((0, 5, 10, 5, 5, 5.001, 5, 10), 0),
+])
+def test_crossings(segments, crossings):
+    assert _crossings(*segments) == crossings
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_crossings_match_checking_every_pair(seed):
+    # horizontal and vertical segments, each on a line of its own, so the only way they meet is by crossing
+    rng = random.Random(seed)
+    ys, xs = rng.sample(range(1000), 60), rng.sample(range(1000), 60)
+    horizontal = [tuple(sorted(rng.sample(range(1000), 2))) + (y,) for y in ys]
+    vertical = [(x,) + tuple(sorted(rng.sample(range(1000), 2))) for x in xs]
+    segments = []
+    for x0, x1, y in horizontal:
+        segments += rng.choice([(x0, y, x1, y), (x1, y, x0, y)])
+    for x, y0, y1 in vertical:
+        segments += rng.choice([(x, y0, x, y1), (x, y1, x, y0)])
+    expected = len([1 for x0, x1, y in horizontal for x, y0, y1 in vertical if x0 < x < x1 and y0 < y < y1])
+    assert _crossings(*segments) == expected
+
+
+@pytest.mark.parametrize('params', BOX_PARAMS)
+def test_boxes_have_no_crossings(params):
+    paths = PathBuilder()
+    paths.add_segments(box_segments(*params))
+    assert paths.crossings() == 0
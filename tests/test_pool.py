@@ -0,0 +1,82 @@
+import os
+import signal
+import threading
+import time
+
+import pytest
+
+import boxmaker
+from boxmaker.pool import RenderPool, RenderPoolFull
+
+BOX = (50.0, 40.0, 30.0, 3.0, 0.0, 8.0, False, 'svg')
+
+
+@pytest.fixture
+def pool():
+    render_pool = RenderPool(workers=1, timeout=60.0)
+    yield render_pool
+    render_pool.shutdown()
+
+
+def test_renders_the_same_as_render_bytes(pool):
+    assert pool.render(*BOX, timestamp=False) == boxmaker.render_bytes(*BOX, timestamp=False)
+
+
+def test_recovers_when_a_worker_dies(pool):
+    expected = pool.render(*BOX, timestamp=False)
+    for pid in list(pool._executor._processes):
+        os.kill(pid, signal.SIGKILL)
+    assert pool.render(*BOX, timestamp=False) == expected
+    assert pool.render(*BOX, timestamp=False) == expected
+    assert pool.stats()['restarted'] == 1
+    assert pool.stats()['in_flight'] == 0
+
+
+def test_call_runs_a_function_in_the_pool(pool):
+    assert pool.call(os.getpid) != os.getpid()
+    assert pool.stats()['in_flight'] == 0
+
+
+def _call_or_full(pool, results, barrier):
+    barrier.wait()
+    try:
+        results.append(pool.call(time.sleep, 1.0))
+    except RenderPoolFull:
+        results.append('full')
+
+
+def test_turns_away_what_doesnt_fit():
+    pool = RenderPool(workers=1, queue_depth=0, timeout=60.0)
+    try:
+        results = []
+        barrier = threading.Barrier(4)
+        threads = [threading.Thread(target=_call_or_full, args=(pool, results, barrier)) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert sorted(results, key=str) == [None, 'full', 'full', 'full']
+        assert pool.stats()['rejected'] == 3
+        assert pool.stats()['in_flight'] == 0
+    finally:
+        pool.shutdown()
+
+
+def test_server_answers_503_when_the_pool_is_full(server_app, monkeypatch):
+    pool = RenderPool(workers=1, queue_depth=0, timeout=60.0)
+    monkeypatch.setattr(server_app, 'render_pool', pool)
+    busy = threading.Thread(target=pool.call, args=(time.sleep, 1.0))
+    busy.start()
+    while pool.stats()['in_flight'] == 0:
+        time.sleep(0.01)
+    try:
+        client = server_app.app.test_client()
+        spec = {'width': 50, 'height': 40, 'depth': 30, 'material_thickness': 3, 'cut_width': 0, 'notch_length': 8,
+                'file_type': 'svg'}
+        response = client.post('/api/v1/render', json=spec)
+        assert response.status_code == 503
+        assert response.headers['Retry-After'] == str(server_app.RETRY_AFTER_SECONDS)
+        busy.join()
+        assert client.post('/api/v1/render', json=spec).status_code == 200
+    finally:
+        pool.shutdown()
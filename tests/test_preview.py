@@ -0,0 +1,54 @@
+import json
+import struct
+
+import pytest
+
+from boxmaker import preview
+
+BOXES = [((50.0, 40.0, 30.0, 3.0, 0.0, 8.0), {}),
+         ((101.6, 127.0, 152.4, 4.7625, 0.1, 11.90625), {'bounding_box': True}),
+         ((60.0, 90.0, 75.0, 3.048, 0.2, 7.62), {'tray': True, 'common_line': True, 'order_paths': True})]
+
+
+def _decode_floats(body):
+    """ Read the float32 layout back into the same shape as the JSON preview. """
+    assert len(body) % 4 == 0
+    values = list(struct.unpack('<{}f'.format(len(body) // 4), body))
+    header = dict(zip(preview.HEADER, values[:len(preview.HEADER)]))
+    path_count = int(header['path_count'])
+    start = len(preview.HEADER)
+    point_counts = [int(v) for v in values[start:start + path_count]]
+    coords = values[start + path_count:]
+    assert len(coords) == 2 * sum(point_counts)
+    paths = []
+    for count in point_counts:
+        paths.append(coords[:2*count])
+        coords = coords[2*count:]
+    return header, paths
+
+
+@pytest.mark.parametrize('args, kwargs', BOXES)
+def test_floats_match_json(args, kwargs):
+    as_json = json.loads(preview.preview_bytes(*args, **kwargs).decode('utf-8'))
+    header, paths = _decode_floats(preview.preview_bytes(*args, preview_format='floats', **kwargs))
+    f32 = dict(rel=1e-6, abs=1e-4)
+    assert [header['page_width'], header['page_height']] == pytest.approx(as_json['page_size'], **f32)
+    for side, name in [('w', 'width'), ('h', 'height'), ('d', 'depth')]:
+        assert header[name] == pytest.approx(as_json['size'][side], **f32)
+        assert header['notch_count_' + side] == as_json['notch_count'][side]
+        assert header['notch_length_' + side] == pytest.approx(as_json['notch_length'][side], **f32)
+    assert header['thickness'] == pytest.approx(as_json['thickness'], **f32)
+    bounding_box = [header['bounding_box_' + k] for k in ['x', 'y', 'width', 'height']]
+    assert bounding_box == pytest.approx(as_json['bounding_box'] or [0, 0, 0, 0], **f32)
+    assert len(paths) == len(as_json['paths'])
+    for path, json_path in zip(paths, as_json['paths']):
+        # JSON coordinates are rounded to hundredths
+        assert path == pytest.approx(json_path, abs=0.005 + 1e-4)
+
+
+def test_floats_are_the_geometry_as_float32():
+    geometry = preview.box_geometry(*BOXES[0][0])
+    _, paths = _decode_floats(preview.geometry_floats(geometry))
+    expected = [[struct.unpack('<f', struct.pack('<f', c))[0] for point in path for c in point]
+                for path in geometry['paths']]
+    assert paths == expected
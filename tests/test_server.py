@@ -0,0 +1,145 @@
+import gzip
+import hashlib
+import threading
+import time
+
+import pytest
+
+SPEC = {'width': 50, 'height': 40, 'depth': 30, 'material_thickness': 3, 'cut_width': 0, 'notch_length': 8,
+        'file_type': 'svg'}
+
+
+@pytest.fixture
+def client(server_app):
+    return server_app.app.test_client()
+
+
+def test_render_has_a_strong_etag_of_its_contents(client):
+    response = client.post('/api/v1/render', json=SPEC)
+    assert response.status_code == 200
+    assert response.headers['ETag'] == '"{}"'.format(hashlib.sha256(response.data).hexdigest())
+    assert response.headers['Content-Disposition'].endswith('.svg')
+    assert 'Content-Encoding' not in response.headers
+
+
+def test_each_encoding_has_its_own_etag(client):
+    plain = client.post('/api/v1/render', json=SPEC)
+    gzipped = client.post('/api/v1/render', json=SPEC, headers={'Accept-Encoding': 'gzip'})
+    assert gzipped.headers['Content-Encoding'] == 'gzip'
+    assert gzipped.headers['ETag'] == plain.headers['ETag'][:-1] + '-gzip"'
+    assert gzip.decompress(gzipped.data) == plain.data
+    assert 'Accept-Encoding' in gzipped.headers['Vary']
+
+
+def test_matching_etag_gets_a_304(client):
+    etag = client.post('/api/v1/render', json=SPEC).headers['ETag']
+    response = client.post('/api/v1/render', json=SPEC, headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.data == b''
+    assert response.headers['ETag'] == etag
+    other = client.post('/api/v1/render', json=SPEC, headers={'If-None-Match': '"something-else"'})
+    assert other.status_code == 200
+
+
+def test_hash_response_describes_the_file(client):
+    box_data = client.post('/api/v1/render', json=SPEC).data
+    response = client.post('/api/v1/render', json=dict(SPEC, response='hash'))
+    assert response.get_json() == {'sha256': hashlib.sha256(box_data).hexdigest(), 'bytes': len(box_data),
+                                   'file_type': 'svg'}
+
+
+@pytest.mark.parametrize('spec', [
+    [1, 2, 3],
+    dict(SPEC, width=None),
+    dict(SPEC, width='wide'),
+    dict(SPEC, width=[50]),
+    dict(SPEC, units='furlongs'),
+    dict(SPEC, units=['in']),
+    dict(SPEC, file_type='png'),
+    dict(SPEC, file_type={'svg': True}),
+    dict(SPEC, width=-50),
+    dict(SPEC, notch_length=30),
+    dict(SPEC, material_thickness=10),
+])
+def test_bad_specs_get_a_400(client, spec):
+    for url in ['/api/v1/render', '/api/v1/preview']:
+        response = client.post(url, json=spec)
+        assert response.status_code == 400
+        assert response.get_json()['errors']
+
+
+def test_unknown_preview_format_gets_a_400(client):
+    for preview_format in ['png', ['json']]:
+        assert client.post('/api/v1/preview', json=dict(SPEC, format=preview_format)).status_code == 400
+
+
+def test_flags_can_be_text(client):
+    compressed = client.post('/api/v1/render', json=dict(SPEC, compressed='true'))
+    assert compressed.headers['Content-Disposition'].endswith('.svg.gz')
+    plain = client.post('/api/v1/render', json=dict(SPEC, compressed='false', check_cuts='false'))
+    assert plain.headers['Content-Disposition'].endswith('.svg')
+    assert plain.data.startswith(b'<?xml')
+
+
+def test_identical_requests_are_rendered_once(server_app, monkeypatch):
+    requests = 4
+    renders = []
+    render_box = server_app._render_box
+
+    def slow_render_box(*args):
+        renders.append(args)
+        # hold the render until every other request is waiting on it
+        deadline = time.time() + 10
+        while server_app.render_flights.coalesced < requests - 1 and time.time() < deadline:
+            time.sleep(0.01)
+        return render_box(*args)
+    monkeypatch.setattr(server_app, '_render_box', slow_render_box)
+
+    responses = []
+
+    def post():
+        responses.append(server_app.app.test_client().post('/api/v1/render', json=SPEC))
+    threads = [threading.Thread(target=post) for _ in range(requests)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(renders) == 1
+    assert server_app.render_flights.coalesced == requests - 1
+    assert [response.status_code for response in responses] == [200] * requests
+    assert len(set([response.data for response in responses])) == 1
+
+
+@pytest.mark.parametrize('accept_encoding', [None, 'gzip'])
+def test_svgz_is_sent_compressed_with_no_content_encoding(client, accept_encoding):
+    headers = {'Accept-Encoding': accept_encoding} if accept_encoding else {}
+    response = client.post('/api/v1/render', json=dict(SPEC, file_type='svgz'), headers=headers)
+    assert response.status_code == 200
+    assert response.data.startswith(b'\x1f\x8b')
+    assert gzip.decompress(response.data).startswith(b'<?xml')
+    assert 'Content-Encoding' not in response.headers
+    assert response.headers['Content-Disposition'].endswith('.svgz')
+    assert response.mimetype == 'application/octet-stream'
+
+
+def test_form_sends_svgz_compressed(client):
+    form = {'width': '2', 'height': '3', 'depth': '4', 'material_thickness': '0.125', 'cut_width': '0',
+            'notch_length': '0.3', 'units': 'in', 'file_type': 'svgz', 'notched_top': '1'}
+    response = client.post('/', data=form, headers={'Accept-Encoding': 'gzip'})
+    assert response.status_code == 200
+    assert response.data.startswith(b'\x1f\x8b')
+    assert 'Content-Encoding' not in response.headers
+
+
+def test_compressed_copies_and_previews_have_their_own_counts(client):
+    for _ in range(2):
+        client.post('/api/v1/render', json=SPEC, headers={'Accept-Encoding': 'gzip'})
+        client.post('/api/v1/preview', json=SPEC)
+    stats = client.get('/cache-stats').get_json()
+    assert (stats['hits'], stats['misses'], stats['entries']) == (1, 1, 1)
+    assert (stats['compressed']['hits'], stats['compressed']['misses']) == (1, 1)
+    assert (stats['previews']['hits'], stats['previews']['misses']) == (1, 1)
+    metrics = client.get('/metrics').get_data(as_text=True)
+    assert 'boxmaker_render_cache_lookups_total{result="miss"} 1\n' in metrics
+    assert 'boxmaker_compressed_cache_lookups_total{result="hit"} 1\n' in metrics
+    assert 'boxmaker_preview_cache_lookups_total{result="hit"} 1\n' in metrics
@@ -0,0 +1,94 @@
+import os
+import time
+
+import pytest
+
+from boxmaker.store import STALE_TEMP_SECONDS, TEMP_PREFIX, BoxStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    box_store = BoxStore(str(tmp_path), max_bytes=25, max_age=3600, sweep_interval=3600)
+    # keep the background sweeper from running, so each test sweeps when it means to
+    box_store.stop()
+    return box_store
+
+
+def _files(directory):
+    return sorted([name for _, _, names in os.walk(directory) for name in names])
+
+
+def _age(store, key, seconds):
+    then = time.time() - seconds
+    os.utime(store.path(key), (then, then))
+
+
+def test_put_writes_atomically(store, tmp_path):
+    store.put('aa01', b'first')
+    store.put('aa01', b'second')
+    store.put('bb02', b'other')
+    assert store.get('aa01') == b'second'
+    assert _files(str(tmp_path)) == ['aa01', 'bb02']
+    assert store.stats()['writes'] == 3
+
+
+def test_failed_write_leaves_no_temp_file(store, tmp_path, monkeypatch):
+    def fail(*args):
+        raise OSError("disk full")
+    monkeypatch.setattr(os, 'replace', fail)
+    with pytest.raises(OSError):
+        store.put('aa01', b'data')
+    assert _files(str(tmp_path)) == []
+
+
+def test_sweep_evicts_old_files(store):
+    store.put('aa01', b'old')
+    store.put('bb02', b'new')
+    _age(store, 'aa01', 7200)
+    store.sweep()
+    assert store.get('aa01') is None
+    assert store.get('bb02') == b'new'
+    assert store.stats()['evictions'] == 1
+    assert store.stats()['files'] == 1
+
+
+def test_sweep_evicts_least_recently_used_files_to_fit(store):
+    for age, key in [(30, 'aa01'), (20, 'bb02'), (10, 'cc03')]:
+        store.put(key, b'0123456789')
+        _age(store, key, age)
+    # reading a file counts as using it
+    assert store.get('aa01') == b'0123456789'
+    store.sweep()
+    assert 'bb02' not in store
+    assert 'aa01' in store and 'cc03' in store
+    assert store.stats()['bytes'] == 20
+    store.max_bytes = 15
+    store.sweep()
+    assert 'cc03' not in store
+    assert 'aa01' in store
+
+
+def test_sweep_removes_stale_temp_files(store, tmp_path):
+    shard = tmp_path / 'aa'
+    shard.mkdir()
+    stale, fresh = shard / (TEMP_PREFIX + 'stale'), shard / (TEMP_PREFIX + 'fresh')
+    stale.write_bytes(b'partial')
+    fresh.write_bytes(b'in progress')
+    then = time.time() - STALE_TEMP_SECONDS - 60
+    os.utime(str(stale), (then, then))
+    store.sweep()
+    assert not stale.exists()
+    assert fresh.exists()
+    assert store.stats()['files'] == 0
+
+
+def test_reading_starts_the_sweeper(tmp_path):
+    store = BoxStore(str(tmp_path), sweep_interval=3600)
+    try:
+        assert store.get('aa01') is None
+        deadline = time.time() + 10
+        while store.stats()['last_sweep'] is None and time.time() < deadline:
+            time.sleep(0.01)
+        assert store.stats()['last_sweep'] is not None
+    finally:
+        store.stop()
@@ -0,0 +1,81 @@
+import re
+
+import pytest
+
+from boxmaker.box import Box
+from boxmaker.svg import CompactSVGDoc, SVGDoc
+from tests import reference
+from tests.boxes import BOX_PARAMS
+
+PATH_DATA = re.compile(r'<path d="([^"]*)"')
+COMMAND = re.compile(r'([MLHVZmlhvz])([^MLHVZmlhvz]*)')
+SIZE = re.compile(r'<svg width="([^"]*)" height="([^"]*)"')
+
+
+class OriginalSVGDoc(reference.SVGDoc):
+    # the original writer, with the context manager and save(timestamp) that Box now uses
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+    def save(self, timestamp=None):
+        super(OriginalSVGDoc, self).save()
+
+
+def _hundredths(number):
+    # every coordinate is written with at most two decimals, so this is exact
+    return int(round(float(number) * 100))
+
+
+def _points(data):
+    """ Resolve path data into a list of absolute points in hundredths, with None wherever the path closes. """
+    points = []
+    x = y = 0
+    for command, args in COMMAND.findall(data):
+        values = [_hundredths(v) for v in args.replace(',', ' ').split()]
+        if command in 'Zz':
+            points.append(None)
+        elif command in 'ML':
+            x, y = values
+        elif command == 'l':
+            x, y = x + values[0], y + values[1]
+        elif command in 'Hh':
+            x = values[0] + (x if command == 'h' else 0)
+        elif command in 'Vv':
+            y = values[0] + (y if command == 'v' else 0)
+        if command not in 'Zz':
+            points.append((x, y))
+    return points
+
+
+def _render(path, doc_cls, params, bounding_box=False, common_line=False):
+    width, height, depth, thickness, cut_width, notch_length, tray = params
+    box = Box(str(path), width, height, depth, thickness, cut_width, notch_length, bounding_box, 'svg', tray,
+              common_line=common_line)
+    box._doc_cls = doc_cls
+    box.render()
+    with open(str(path)) as f:
+        svg = f.read()
+    return SIZE.search(svg).groups(), [_points(data) for data in PATH_DATA.findall(svg)], svg
+
+
+@pytest.mark.parametrize('doc_cls', [SVGDoc, CompactSVGDoc])
+@pytest.mark.parametrize('params', BOX_PARAMS)
+def test_paths_match_original(tmp_path, doc_cls, params):
+    size, paths, _ = _render(tmp_path / 'new.svg', doc_cls, params)
+    original_size, original_paths, _ = _render(tmp_path / 'original.svg', OriginalSVGDoc, params)
+    assert size == original_size
+    assert paths == original_paths
+
+
+@pytest.mark.parametrize('doc_cls', [SVGDoc, CompactSVGDoc])
+def test_bounding_box_and_common_line_match_original(tmp_path, doc_cls):
+    size, paths, svg = _render(tmp_path / 'new.svg', doc_cls, BOX_PARAMS[0], True, True)
+    original_size, original_paths, original_svg = _render(tmp_path / 'original.svg', OriginalSVGDoc, BOX_PARAMS[0],
+                                                          True, True)
+    assert size == original_size
+    assert paths == original_paths
+    assert re.findall(r'<rect [^>]*>', svg) == re.findall(r'<rect [^>]*>', original_svg)
@@ -0,0 +1,116 @@
+import pytest
+
+from boxmaker import validation
+from boxmaker.box import Box
+from boxmaker.pool import RenderPool
+from boxmaker.validation import MAX_NOTCHES, MIN_NOTCHES, box_errors
+from tests.boxes import BOX_PARAMS
+
+# the form's defaults: 4 x 6 x 5 in, of 3/16in material with 15/32in notches
+DEFAULT_BOX = (101.6, 152.4, 127.0, 4.7625, 0.0, 11.90625)
+
+
+def test_default_box_can_be_made():
+    assert box_errors(*DEFAULT_BOX) == []
+    assert box_errors(*DEFAULT_BOX, check_cuts=True) == []
+
+
+@pytest.mark.parametrize('params', BOX_PARAMS)
+def test_test_boxes_can_be_made(params):
+    width, height, depth, thickness, cut_width, notch_length, tray = params
+    assert box_errors(width, height, depth, thickness, cut_width, notch_length, tray, check_cuts=True) == []
+    assert box_errors(width, height, depth, thickness, cut_width, notch_length, tray, True, check_cuts=True) == []
+
+
+@pytest.mark.parametrize('box, error', [
+    ((float('nan'), 40, 30, 3, 0, 8), "Width must be a number!"),
+    ((50, float('inf'), 30, 3, 0, 8), "Height must be a number!"),
+    ((50, 40, 0, 3, 0, 8), "Depth must be more than zero!"),
+    ((50, 40, 30, -3, 0, 8), "Material thickness must be more than zero!"),
+    ((50, 40, 30, 3, -0.1, 8), "Cut width can't be negative!"),
+    ((50, 40, 30, 3, 0, 0), "Notch length must be more than zero!"),
+])
+def test_sizes_must_be_positive_numbers(box, error):
+    assert box_errors(*box) == [error]
+
+
+def test_every_side_needs_three_notches():
+    # a 1in side with 15/32in notches only has room for one, which boxes were once rendered with
+    errors = box_errors(25.4, 50.8, 50.8, 4.7625, 0.0, 11.90625)
+    assert errors == ["The width is too short for notches that long: it only has room for 1, and every side needs at "
+                      "least {} to hold the corners together. Try shorter notches!".format(MIN_NOTCHES)]
+    assert Box(None, 25.4, 50.8, 50.8, 4.7625, 0.0, 11.90625, False, None, False).dimensions()['notch_count'] == \
+        {'w': 1, 'h': 3, 'd': 3}
+    # just long enough for three
+    assert box_errors(2.5 * 11.90625, 50.8, 50.8, 4.7625, 0.0, 11.90625) == []
+
+
+def test_sides_cant_need_too_many_notches():
+    assert box_errors(100, 30, 30, 0.001, 0, 0.005) == [
+        "The width would need more than {} notches; try longer ones!".format(MAX_NOTCHES)]
+
+
+def test_notches_must_be_longer_than_the_material_is_thick():
+    # 3 notches of 10mm along each side, in 12mm material
+    errors = box_errors(30, 30, 30, 12, 0, 8)
+    assert errors == ["The notches along the {} must be longer than the material is thick, plus half the cut "
+                      "width!".format(name) for name in ['width', 'depth', 'height']]
+
+
+def test_half_the_cut_width_counts_against_the_notches():
+    # notches of 31/3mm are longer than the 10mm material, but not once half the 1mm cut width is added
+    assert len(box_errors(30, 30, 30, 10, 1, 8)) == 3
+    # and common-line cutting doesn't offset the notches by the cut width at all
+    assert box_errors(30, 30, 30, 10, 1, 8, common_line=True) == []
+
+
+def test_notches_must_be_longer_than_the_cut_width():
+    # 3 notches of 10mm along each side, each widened by a 10mm cut width
+    errors = box_errors(20, 20, 20, 1, 10, 6.67)
+    assert errors == ["The notches along the {} would overlap with a cut width that wide!".format(name)
+                      for name in ['width', 'depth', 'height']]
+    assert box_errors(20, 20, 20, 1, 10, 6.67, common_line=True) == []
+
+
+def test_check_cuts_finds_crossing_cuts(monkeypatch):
+    draw_faces = Box._draw_faces
+
+    def draw_faces_and_a_stray_cut(self):
+        draw_faces(self)
+        # a line right across the back, through its notches
+        self._draw_line(0, 20, 500, 20)
+    monkeypatch.setattr(Box, '_draw_faces', draw_faces_and_a_stray_cut)
+    assert box_errors(*DEFAULT_BOX) == []
+    errors = box_errors(*DEFAULT_BOX, check_cuts=True)
+    assert len(errors) == 1
+    assert errors[0].startswith("The cuts would cross or overlap each other in ")
+
+
+class _RecordingPool(RenderPool):
+
+    def __init__(self):
+        super(_RecordingPool, self).__init__(workers=1, timeout=60.0)
+        self.calls = []
+
+    def call(self, fn, *args, **kwargs):
+        self.calls.append((fn, kwargs))
+        return super(_RecordingPool, self).call(fn, *args, **kwargs)
+
+
+def test_server_checks_cuts_in_the_pool(server_app, monkeypatch):
+    pool = _RecordingPool()
+    monkeypatch.setattr(server_app, 'render_pool', pool)
+    try:
+        client = server_app.app.test_client()
+        spec = {'width': 4, 'height': 6, 'depth': 5, 'material_thickness': 0.1875, 'cut_width': 0,
+                'notch_length': 0.46875, 'units': 'in', 'file_type': 'svg', 'response': 'hash'}
+        assert client.post('/api/v1/render', json=spec).status_code == 200
+        assert pool.calls == []
+        assert client.post('/api/v1/render', json=dict(spec, check_cuts=True)).status_code == 200
+        assert pool.calls == [(validation.box_errors, {'check_cuts': True})]
+        # boxes that fail the quick checks never get as far as the pool
+        response = client.post('/api/v1/render', json=dict(spec, width=1, check_cuts=True))
+        assert response.status_code == 400
+        assert len(pool.calls) == 1
+    finally:
+        pool.shutdown()
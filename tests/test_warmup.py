@@ -0,0 +1,22 @@
+from boxmaker import warmup
+from boxmaker.cache import render_key
+from boxmaker.store import BoxStore
+
+SPEC = {'width': '50', 'height': '40', 'depth': '30', 'material_thickness': '3', 'cut_width': '0',
+        'notch_length': '8'}
+
+
+def test_warm_store_renders_each_file_type_once(tmp_path):
+    store = BoxStore(str(tmp_path))
+    assert warmup.warm_store(store, [SPEC], ['svg', 'dxf']) == 2
+    assert render_key(50, 40, 30, 3, 0, 8, file_type='svg') in store
+    assert warmup.warm_store(store, [SPEC], ['svg', 'dxf']) == 0
+
+
+def test_start_from_env_skips_unreadable_specs(tmp_path, monkeypatch):
+    monkeypatch.setenv('BOX_STORE_DIR', str(tmp_path))
+    monkeypatch.setenv('BOX_WARMUP_SPECS', str(tmp_path / 'missing.csv'))
+    assert warmup.start_from_env() is None
+    monkeypatch.setenv('BOX_WARMUP', '0')
+    monkeypatch.delenv('BOX_WARMUP_SPECS')
+    assert warmup.start_from_env() is None
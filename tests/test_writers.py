@@ -0,0 +1,21 @@
+import pytest
+
+from boxmaker.box import Box
+
+
+class _Failed(Exception):
+    pass
+
+
+@pytest.mark.parametrize('file_type', ['dxf', 'dxf_polyline', 'svg', 'svgz'])
+def test_output_is_closed_when_drawing_fails(tmp_path, monkeypatch, file_type):
+    def fail(self, *args):
+        self._doc.rect(0, 0, 10, 10)
+        raise _Failed()
+    monkeypatch.setattr(Box, '_draw_face', fail)
+    box = Box(str(tmp_path / 'box'), 50, 40, 30, 3, 0, 8, False, file_type, False)
+    with pytest.raises(_Failed):
+        box.render()
+    # an .svgz writer's text stream is layered over gzip, over the file it opened
+    output = getattr(box._doc, '_file', None) or box._doc.ofh
+    assert output.closed